@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+# Script to calibrate the global scale factor
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Choose the global scale factor so each benchmark runs for a target time.
+
+The programs are built and each is run once.  A benchmark whose run is too
+short to time reliably has its scale factor increased, and is rebuilt and run
+again.  The scale factor which would make each benchmark run for the target
+time is then extrapolated from its run.  By default each benchmark gets its
+own scale factor.  Alternatively one global scale factor is chosen for all
+the benchmarks, such that the geometric mean of their times is the target.
+
+The scale factors are written as JSON to gsf.json in the build directory.
+The benchmarks are rebuilt with them (using the scons variable gsf_file) and
+their speed is measured and reported, normalized by each benchmark's scale
+factor.  The same file may be given to benchmark_speed.py with --gsf-file to
+normalize later measurements.
+
+The scale factor is a whole number, so a benchmark which takes longer than
+the target time with a scale factor of 1 can't be made any faster.
+"""
+
+import argparse
+import math
+import os
+import sys
+
+from json import dumps
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import run_scons
+from embench_build import run_median
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+
+# File of scale factors written in the build directory
+GSF_FILE = 'gsf.json'
+
+# Runs shorter than this fraction of the target time are too short to
+# extrapolate from, and are scaled up and repeated
+CALIBRATION_FRACTION = 0.1
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Calibrate the global scale factor of the benchmarks')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons, for example cflags="-O2"',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd',
+        help='Directory in which to build the binaries',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        required=True,
+        help='Python module with routines to run benchmarks',
+    )
+    parser.add_argument(
+        '--target-time',
+        type=float,
+        default=4000.0,
+        help='Time in milliseconds for which each benchmark should run '
+        + '(default 4000)',
+    )
+    parser.add_argument(
+        '--global-factor',
+        action='store_true',
+        help='Choose one scale factor for all the benchmarks, rather than '
+        + 'one for each',
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor of the first calibration run (default 1)'
+    )
+    parser.add_argument(
+        '--rounds',
+        type=int,
+        default=3,
+        help='Maximum number of calibration builds (default 3)',
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables, ('gsf', 'gsf_file'))
+
+    if (args.target_time <= 0) or (args.gsf < 1) or (args.rounds < 1):
+        log.error('ERROR: --target-time, --gsf and --rounds must be '
+                  + 'positive: exiting')
+        sys.exit(1)
+
+    gp['gsf_file'] = os.path.join(gp['bd'], GSF_FILE)
+    setup_report_args(args)
+
+    newmodule = import_target_module(args.target_module)
+    globals()['get_target_args'] = newmodule.get_target_args
+    globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def build(factors, args):
+    """Build the benchmarks with the scale factors "factors", indexed by
+       benchmark.  Return True if the build succeeded."""
+    os.makedirs(gp['bd'], exist_ok=True)
+    with open(gp['gsf_file'], 'w') as fileh:
+        fileh.write(dumps(factors, indent=2) + '\n')
+
+    if not run_scons(gp['bd'], args.config_dir,
+                     [*args.variables, f'gsf={args.gsf}',
+                      f'gsf_file={gp["gsf_file"]}'], args.scons):
+        log.error('ERROR: Build failed')
+        return False
+
+    return True
+
+
+def run_once(bench, args):
+    """Run benchmark "bench" once.  Return the time in milliseconds, or
+       None on failure."""
+    appexe = os.path.join(gp['bd'], 'src', bench,
+                          f'{bench}{gp["file_extension"]}')
+    ms = run_median(run_benchmark, bench, appexe, args)
+    if ms is None:
+        log.warning(f'Warning: Run of {bench} failed.')
+
+    return ms
+
+
+def calibrate(benchmarks, args):
+    """Run the benchmarks, scaling up and repeating any run which is too
+       short, and extrapolate the scale factor which would make each run
+       for the target time.  Return a dictionary of these scale factors,
+       unrounded, for the benchmarks which could be run."""
+    gsf = {bench: args.gsf for bench in benchmarks}
+    ideal = {}
+    failed = set()
+
+    for rnd in range(args.rounds):
+        pending = [bench for bench in benchmarks
+                   if (bench not in ideal) and (bench not in failed)]
+        if not pending:
+            break
+        if not build(gsf, args):
+            sys.exit(1)
+
+        for bench in pending:
+            ms = run_once(bench, args)
+            if ms is None:
+                failed.add(bench)
+                continue
+            log.debug(f'{bench} took {ms:.1f} ms at scale factor '
+                      + f'{gsf[bench]}')
+            if ((ms >= args.target_time * CALIBRATION_FRACTION)
+                    or (rnd == args.rounds - 1)):
+                ideal[bench] = gsf[bench] * args.target_time / ms
+            else:
+                # Aim well clear of the threshold, since the time of a very
+                # short run is mostly overhead
+                gsf[bench] = max(2 * gsf[bench], math.ceil(
+                    gsf[bench] * args.target_time * 2 * CALIBRATION_FRACTION
+                    / max(ms, 1.0)))
+
+    return ideal
+
+
+def choose_factors(ideal, args):
+    """Round the ideal scale factors to whole numbers, or if a global
+       factor is wanted, take their geometric mean.  Return the scale
+       factors indexed by benchmark."""
+    if args.global_factor and ideal:
+        geomean = math.exp(sum(math.log(factor) for factor in ideal.values())
+                           / len(ideal))
+        ideal = {bench: geomean for bench in ideal}
+
+    factors = {}
+    for bench, factor in ideal.items():
+        if factor < 1.0:
+            log.warning(f'Warning: {bench} takes longer than the target time '
+                        + 'with a scale factor of 1')
+        factors[bench] = max(1, round(factor))
+        log.debug(f'Scale factor of {bench} is {factors[bench]}')
+
+    return factors
+
+
+def measure_calibrated(benchmarks, factors, args):
+    """Measure the speed of the benchmarks built with "factors".  Return
+       dictionaries of the raw and relative speeds of those which ran."""
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    raw_data = {}
+    rel_data = {}
+    for bench in benchmarks:
+        if bench not in factors:
+            continue
+        ms = run_once(bench, args)
+        if ms is not None:
+            raw_data[bench] = ms
+            rel_data[bench] = baseline[bench] / ms * factors[bench]
+
+    return raw_data, rel_data
+
+
+def main():
+    """Main program driving calibration"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'calibrate')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    factors = choose_factors(calibrate(benchmarks, args), args)
+    if not build(factors, args):
+        sys.exit(1)
+    log.debug(f'Scale factors written to {gp["gsf_file"]}')
+
+    raw_data, rel_data = measure_calibrated(benchmarks, factors, args)
+    results = [('speed', raw_data, rel_data)]
+    stats = [embench_stats(list(raw_data), raw_data, rel_data)]
+    output_results(benchmarks, results, stats)
+
+    if len(raw_data) != len(benchmarks):
+        log.info('ERROR: Failed to calibrate all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# Script to benchmark compile time
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Compute the compile time benchmark for a set of compiled Embench programs.
+
+The programs must have been built with the scons variable compile_times=1,
+which records the time and memory used to build each object and executable
+(see pylib/embench_compile.py).  For each benchmark this reports the
+processor time to compile its own objects and to link it, and the peak
+memory used by any of those steps.  The support objects are shared by all
+the benchmarks, and are not counted.
+
+Relative results are the ratio to a baseline, so as for code size SMALL is
+good.  The baseline is either another build directory, for example built
+with a reference compiler, or the file compile.json in the baseline
+directory.
+"""
+
+import argparse
+import os
+import sys
+
+from json import dumps
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_core import output_format
+from embench_compile import COMPILE_METRICS
+from embench_compile import benchmark_compile_time
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Compute the compile time benchmark')
+
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd',
+        help='Directory holding all the binaries',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--baseline-builddir',
+        type=str,
+        default=None,
+        help='Build directory whose compile times are the baseline, rather '
+        + 'than compile.json in the baseline directory',
+    )
+    parser.add_argument(
+        '--baseline-output',
+        dest='output_format',
+        action='store_const',
+        const=output_format.BASELINE,
+        help='Specify to output in a format suitable for use as a baseline'
+    )
+    parser.add_argument(
+        '--elapsed',
+        action='store_true',
+        help='Report elapsed time, rather than processor time',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    if not os.path.isdir(gp['bd']):
+        log.error(f'ERROR: build directory {gp["bd"]} not found: exiting')
+        sys.exit(1)
+
+    if args.baseline_builddir is None:
+        gp['baseline_bd'] = None
+    elif os.path.isabs(args.baseline_builddir):
+        gp['baseline_bd'] = args.baseline_builddir
+    else:
+        gp['baseline_bd'] = os.path.join(gp['rootdir'],
+                                         args.baseline_builddir)
+
+    setup_report_args(args)
+    gp['elapsed'] = args.elapsed
+
+
+def compile_time(bd, bench):
+    """The compile time record of benchmark "bench" in build directory
+       "bd", or None if it has none."""
+    bench_dir = os.path.join(bd, 'src', bench)
+    appexe = os.path.join(bench_dir, f'{bench}{gp["file_extension"]}')
+    return benchmark_compile_time(bench_dir, appexe, gp['elapsed'])
+
+
+def get_baseline(benchmarks):
+    """Get the baseline compile times, indexed by benchmark and then
+       metric."""
+    if gp['baseline_bd'] is not None:
+        baseline = {}
+        for bench in benchmarks:
+            times = compile_time(gp['baseline_bd'], bench)
+            if times is not None:
+                baseline[bench] = times
+        return baseline
+
+    compile_baseline = os.path.join(gp['baseline_dir'], 'compile.json')
+    try:
+        with open(compile_baseline, 'r') as fileh:
+            return loads(fileh.read())
+    except OSError:
+        log.error(f'ERROR: no compile time baseline {compile_baseline}: use '
+                  + '--baseline-builddir or --absolute')
+        sys.exit(1)
+
+
+def output_baseline(benchmarks, times):
+    """Output the results in suitable as baseline data."""
+    log.info(dumps({bench: {metric: round(times[bench][metric], 1)
+                            for metric in COMPILE_METRICS}
+                    for bench in benchmarks if bench in times}, indent=2))
+
+
+def collect_data(benchmarks):
+    """Collect the compile times of the benchmarks and compute them relative
+       to the baseline if needed.  Return the compile times, and a list of
+       (metric, raw data, relative data) for each metric."""
+    if gp['absolute'] or gp['output_format'] == output_format.BASELINE:
+        baseline = None
+    else:
+        baseline = get_baseline(benchmarks)
+
+    times = {}
+    for bench in benchmarks:
+        res = compile_time(gp['bd'], bench)
+        if res is None:
+            log.warning(f'Warning: no compile time records for {bench}: '
+                        + 'build with compile_times=1')
+        elif (baseline is not None) and (bench not in baseline):
+            log.warning(f'Warning: no baseline compile time for {bench}')
+        else:
+            times[bench] = res
+
+    results = []
+    for metric in COMPILE_METRICS:
+        raw_data = {bench: times[bench][metric] for bench in times}
+        rel_data = {}
+        if baseline is not None:
+            for bench in times:
+                base = baseline[bench][metric]
+                rel_data[bench] = raw_data[bench] / base if base > 0 else 0.0
+        results.append((metric, raw_data, rel_data))
+
+    return times, results
+
+
+def main():
+    """Main program driving measurement of benchmark compile time"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'compile')
+    log_args(args)
+
+    # Check args are OK (have to have logging and build directory set up first)
+    validate_args(args)
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    times, results = collect_data(benchmarks)
+    if gp['output_format'] == output_format.BASELINE:
+        output_baseline(benchmarks, times)
+    else:
+        stats = [embench_stats(list(raw_data), raw_data, rel_data)
+                 for _, raw_data, rel_data in results]
+        output_results(benchmarks, results, stats)
+
+    if len(times) != len(benchmarks):
+        log.info('ERROR: Failed to compute compile time benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
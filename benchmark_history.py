@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+# Script to find changes in the history of results
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Report the step changes in the recorded history of results.
+
+benchmark_size.py and benchmark_speed.py record the results of every run in
+an SQLite database (see pylib/embench_history.py).  This script reads the
+results of one kind, and for each series of runs measured in the same way
+finds where the result of each benchmark stepped up or down, using change
+point detection.  A step up is a regression, since the results recorded are
+times and sizes, for which larger is worse.
+
+It is intended to be run after nightly runs, with --recent to report only
+the changes in the latest runs, and --fail-on-regression to give a non-zero
+exit status if any of those are regressions.
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import sys
+
+from json import dumps
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import output_format
+from embench_history import CHANGE_THRESHOLD
+from embench_history import HISTORY_FILE
+from embench_history import change_points
+from embench_history import load_series
+from embench_report import add_report_args
+from embench_report import setup_report_args
+
+# Default minimum number of runs either side of a change.  Sizes are exact,
+# so one run is enough, but times are noisy.
+MIN_SEGMENT = {'size': 1, 'speed': 3}
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Find changes in the history of results')
+
+    parser.add_argument(
+        '--history',
+        type=str,
+        default=None,
+        help=f'SQLite database of results (default {HISTORY_FILE} in the log '
+        + 'directory)',
+    )
+    add_report_args(parser, baselinedir=False, absolute=False,
+                    file_extension=False)
+    parser.add_argument(
+        '--size',
+        dest='kind',
+        action='store_const',
+        const='size',
+        help='Specify to examine the size results',
+    )
+    parser.add_argument(
+        '--speed',
+        dest='kind',
+        action='store_const',
+        const='speed',
+        help='Specify to examine the speed results (the default)',
+    )
+    parser.add_argument(
+        '--benchmark',
+        type=str,
+        default=[],
+        nargs='+',
+        action='extend',
+        help='Benchmarks to examine (default all)',
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=CHANGE_THRESHOLD,
+        help='Smallest change to report, as a fraction '
+        + f'(default {CHANGE_THRESHOLD})',
+    )
+    parser.add_argument(
+        '--min-segment',
+        type=int,
+        default=None,
+        help='Minimum number of runs either side of a change (default '
+        + f'{MIN_SEGMENT["size"]} for size and {MIN_SEGMENT["speed"]} for '
+        + 'speed)',
+    )
+    parser.add_argument(
+        '--recent',
+        type=int,
+        default=None,
+        help='Only report changes in the last RECENT runs of each series',
+    )
+    parser.add_argument(
+        '--regressions-only',
+        action='store_true',
+        help='Only report regressions, not improvements',
+    )
+    parser.add_argument(
+        '--fail-on-regression',
+        action='store_true',
+        help='Exit with a non-zero status if any regression is reported',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if args.history:
+        gp['history'] = args.history
+    else:
+        gp['history'] = os.path.join(os.path.abspath(args.logdir),
+                                     HISTORY_FILE)
+    if not os.path.isfile(gp['history']):
+        log.error(f'ERROR: history {gp["history"]} not found: exiting')
+        sys.exit(1)
+
+    gp['kind'] = args.kind or 'speed'
+    if args.min_segment is None:
+        gp['min_segment'] = MIN_SEGMENT[gp['kind']]
+    else:
+        gp['min_segment'] = args.min_segment
+    if (gp['min_segment'] < 1) or (args.threshold < 0):
+        log.error('ERROR: --min-segment must be positive and --threshold '
+                  + 'not negative: exiting')
+        sys.exit(1)
+    if (args.recent is not None) and (args.recent < 1):
+        log.error('ERROR: --recent must be positive: exiting')
+        sys.exit(1)
+
+    setup_report_args(args)
+
+
+def describe_series(key):
+    """A short description of the series "key", a JSON dictionary of how
+       its results were built and measured."""
+    config = loads(key)
+    config.pop('kind', None)
+    return ' '.join(f'{var}={dumps(val) if not isinstance(val, str) else val}'
+                    for var, val in config.items() if val not in ('', None))
+
+
+def find_changes(series, args):
+    """Find the changes in each benchmark of each series.  Return a list of
+       dictionaries describing each change."""
+    changes = []
+    for key, benches in series.items():
+        for bench, results in sorted(benches.items()):
+            if args.benchmark and (bench not in args.benchmark):
+                continue
+            values = [res['value'] for res in results]
+            if any(value < 0 for value in values):
+                log.warning(f'Warning: {bench} has negative results in '
+                            + f'series {describe_series(key)}, so is not '
+                            + 'searched for changes')
+                continue
+            # A result which may be zero, such as the size of an empty
+            # section, is compared by log(1 + x), so that a change from
+            # zero is found
+            offset = 1.0 if 0 in values else 0.0
+            points = change_points(values, args.threshold, gp['min_segment'],
+                                   offset)
+            bounds = [0] + points + [len(values)]
+            for i, point in enumerate(points):
+                if (args.recent is not None) and (point
+                                                  < len(values) - args.recent):
+                    continue
+                before = geomean(values[bounds[i]:point], offset)
+                after = geomean(values[point:bounds[i + 2]], offset)
+                change = after / before - 1.0 if before > 0 else math.inf
+                if args.regressions_only and (change <= 0):
+                    continue
+                changes.append({
+                    'series': describe_series(key),
+                    'benchmark': bench,
+                    'before': results[point - 1],
+                    'after': results[point],
+                    'value before': before,
+                    'value after': after,
+                    'change': change,
+                    'regression': change > 0,
+                })
+
+    return changes
+
+
+def geomean(values, offset=0.0):
+    """The geometric mean of "values", each with "offset" added, less
+       "offset"."""
+    return math.exp(sum(math.log(value + offset) for value in values)
+                    / len(values)) - offset
+
+
+def output_changes(changes):
+    """Output the changes, grouped by series."""
+    if gp['output_format'] == output_format.JSON:
+        log.info(dumps({f'{gp["kind"]} changes': [
+            {'series': change['series'],
+             'benchmark': change['benchmark'],
+             'last run before': change['before'],
+             'first run after': change['after'],
+             'before': round(change['value before'], 3),
+             'after': round(change['value after'], 3),
+             'change': (round(change['change'], 4)
+                        if math.isfinite(change['change']) else None),
+             'regression': change['regression']} for change in changes]},
+                       indent=2))
+        return
+
+    if gp['output_format'] == output_format.CSV:
+        log.info('"Series","Benchmark","Run","Time","Commit","Compiler",'
+                 + '"Before","After","Change"')
+    series = None
+    for change in changes:
+        run = change['after']
+        commit = run['commit'] or ''
+        if commit.endswith('-dirty'):
+            commit = commit[:12] + '-dirty'
+        else:
+            commit = commit[:12]
+        cells = (change['benchmark'], f'{run["id"]}', run['time'], commit,
+                 run['compiler'] or '',
+                 f'{change["value before"]:.3f}',
+                 f'{change["value after"]:.3f}',
+                 f'{change["change"] * 100:+.1f}%')
+        if gp['output_format'] == output_format.CSV:
+            quoted = [change['series'], *cells]
+            log.info(','.join('"' + cell.replace('"', '""') + '"'
+                              for cell in quoted))
+            continue
+
+        if change['series'] != series:
+            series = change['series']
+            if gp['output_format'] == output_format.MD:
+                log.info('')
+                log.info(f'`{series}`')
+                log.info('')
+                log.info('| Benchmark | Run | Time | Commit | Compiler '
+                         + '| Before | After | Change |')
+                log.info('| :-------- | --: | :--- | :----- | :------- '
+                         + '| -----: | ----: | -----: |')
+            else:
+                log.info(f'Series: {series}')
+                log.info('Benchmark          Run  Time                       '
+                         + 'Commit                  Before       After  Change')
+        if gp['output_format'] == output_format.MD:
+            log.info('| ' + ' | '.join(cells) + ' |')
+        else:
+            log.info(f'{cells[0]:15} {cells[1]:>6}  {cells[2]:25}  '
+                     + f'{cells[3]:18}  {cells[5]:>10}  {cells[6]:>10}  '
+                     + f'{cells[7]:>6}')
+
+    if (gp['output_format'] != output_format.CSV) and not changes:
+        log.info('No changes found')
+
+
+def main():
+    """Main program driving the search for changes"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'history')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    try:
+        series = load_series(gp['history'], gp['kind'])
+    except sqlite3.Error as error:
+        log.error(f'ERROR: Unable to read history {gp["history"]}: {error}')
+        sys.exit(1)
+
+    changes = find_changes(series, args)
+    output_changes(changes)
+
+    if args.fail_on_regression and any(change['regression']
+                                       for change in changes):
+        log.error('ERROR: Regressions found')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
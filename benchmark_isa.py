@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+# Script to report the static instruction mix of the benchmarks
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Report the static instruction mix of each Embench program.
+
+The functions reachable by direct calls and jumps from the "benchmark"
+function are disassembled and their instructions counted by class: loads,
+stores, branches, jumps, multiply/divide, other integer arithmetic, floating
+point, vector, bit manipulation, atomic and system instructions.  The
+number of compressed (16 bit) instructions is also reported.  This shows
+whether an ISA extension is actually used by the benchmarks.
+
+RISC-V programs can be disassembled with a built in decoder.  Otherwise
+objdump is used, and the instructions are classified for RISC-V and Arm
+only.  Instructions of other architectures are counted, but all as "other".
+"""
+
+import argparse
+import os
+import sys
+
+from json import dumps
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import output_format
+from embench_elf import is_elf
+from embench_isa import INSN_CLASSES
+from embench_isa import elf_machine
+from embench_isa import disassemble_objdump
+from embench_isa import disassemble_riscv
+from embench_isa import instruction_mix
+from embench_report import add_report_args
+from embench_report import setup_report_args
+
+# The columns reported, in order
+ISA_COLUMNS = INSN_CLASSES + ['compressed']
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Report the static instruction mix of the benchmarks')
+
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd',
+        help='Directory holding all the binaries',
+    )
+    add_report_args(parser, baselinedir=False, absolute=False)
+    parser.add_argument(
+        '--absolute',
+        action='store_true',
+        help='Report instruction counts, rather than percentages of the total',
+    )
+    parser.add_argument(
+        '--disassembler',
+        type=str,
+        default='auto',
+        choices=['auto', 'builtin', 'objdump'],
+        help='How to disassemble: the built in RISC-V decoder, objdump, or '
+        + '"auto" (the default) to use the built in decoder for RISC-V',
+    )
+    parser.add_argument(
+        '--objdump',
+        type=str,
+        default='objdump',
+        help='The objdump command to use (default "objdump")',
+    )
+    parser.add_argument(
+        '--root-function',
+        type=str,
+        default='benchmark',
+        help='Function from which reachable code is counted '
+        + '(default "benchmark")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    if not os.path.isdir(gp['bd']):
+        log.error(f'ERROR: build directory {gp["bd"]} not found: exiting')
+        sys.exit(1)
+
+    setup_report_args(args)
+    gp['disassembler'] = args.disassembler
+    gp['objdump'] = args.objdump
+    gp['root_function'] = args.root_function
+
+
+def analyse_benchmark(bench):
+    """Disassemble benchmark "bench" and count its instructions.  Return a
+       tuple of the ELF machine and a dictionary of counts by class, or None
+       if the benchmark can't be disassembled."""
+    appexe = os.path.join(gp['bd_benchdir'], bench,
+                          f'{bench}{gp["file_extension"]}')
+    if not is_elf(appexe):
+        log.warning(f'Warning: {appexe} is not an ELF executable')
+        return None
+
+    machine, xlen = elf_machine(appexe)
+    if (gp['disassembler'] == 'builtin') and (machine != 'EM_RISCV'):
+        log.warning(f'Warning: built in decoder does not support {machine}')
+        return None
+
+    if (gp['disassembler'] == 'builtin'
+            or (gp['disassembler'] == 'auto' and machine == 'EM_RISCV')):
+        functions = disassemble_riscv(appexe)
+    else:
+        functions = disassemble_objdump(gp['objdump'], appexe, machine)
+    if functions is None:
+        return None
+
+    if gp['root_function'] not in functions:
+        log.warning(f'Warning: {bench} has no function '
+                    + f'{gp["root_function"]}')
+        return None
+
+    log.debug(f'{bench}: {machine} ({xlen} bit)')
+    return machine, instruction_mix(functions, machine, gp['root_function'])
+
+
+def mix_value(counts, column):
+    """The value to report for "column" of "counts", either as a count or a
+       percentage of the total."""
+    if gp['absolute']:
+        return counts[column]
+    if counts['total'] == 0:
+        return 0.0
+
+    return round(100.0 * counts[column] / counts['total'], 1)
+
+
+def output_json(benchmarks, mix):
+    """Output the results in JSON format."""
+    res = {}
+    for bench in benchmarks:
+        res[bench] = {column: mix_value(mix[bench], column)
+                      for column in ISA_COLUMNS}
+        res[bench]['total'] = mix[bench]['total']
+
+    log.info(dumps({'instruction mix': res}, indent=2))
+
+
+def output_text(benchmarks, mix):
+    """Output the results in plain text format."""
+    hdr = ''.join(f' {column[:8]:>8}' for column in ISA_COLUMNS)
+    log.info(f'Benchmark       {hdr}    total')
+    log.info('---------       ' + ' --------' * len(ISA_COLUMNS) + ' --------')
+
+    for bench in benchmarks:
+        if gp['absolute']:
+            row = ''.join(f' {mix_value(mix[bench], c):8,}'
+                          for c in ISA_COLUMNS)
+        else:
+            row = ''.join(f' {mix_value(mix[bench], c):8.1f}'
+                          for c in ISA_COLUMNS)
+        log.info(f'{bench:15} {row} {mix[bench]["total"]:8,}')
+
+
+def output_md(benchmarks, mix):
+    """Output the results in MarkDown format."""
+    hdr = ''.join(f' {column:>10} |' for column in ISA_COLUMNS)
+    log.info(f'| Benchmark         |{hdr}      Total |')
+    log.info('| :---------------- |' + ' ---------: |' * len(ISA_COLUMNS)
+             + ' ---------: |')
+
+    for bench in benchmarks:
+        md_bench = '`' + bench + '`'
+        row = ''.join(f' {mix_value(mix[bench], c):10} |'
+                      for c in ISA_COLUMNS)
+        log.info(f'| {md_bench:17} |{row} {mix[bench]["total"]:10} |')
+
+
+def output_csv(benchmarks, mix):
+    """Output the results in CSV format."""
+    hdr = ','.join(f'"{column}"' for column in ISA_COLUMNS)
+    log.info(f'"Benchmark",{hdr},"Total"')
+
+    for bench in benchmarks:
+        row = ','.join(f'"{mix_value(mix[bench], c)}"' for c in ISA_COLUMNS)
+        log.info(f'"{bench}",{row},"{mix[bench]["total"]}"')
+
+
+def collect_data(benchmarks):
+    """Count the instructions of all the benchmarks and output the results.
+       Return True if all the benchmarks could be analysed."""
+    successful = True
+    mix = {}
+    reported = []
+    machines = set()
+
+    for bench in benchmarks:
+        res = analyse_benchmark(bench)
+        if res is None:
+            successful = False
+            continue
+        machine, mix[bench] = res
+        machines.add(machine)
+        reported.append(bench)
+
+    for machine in sorted(machines):
+        if machine not in ('EM_RISCV', 'EM_ARM', 'EM_AARCH64'):
+            log.warning(f'Warning: instructions for {machine} are not '
+                        + 'classified')
+
+    if gp['output_format'] == output_format.JSON:
+        output_json(reported, mix)
+    elif gp['output_format'] == output_format.TEXT:
+        output_text(reported, mix)
+    elif gp['output_format'] == output_format.MD:
+        output_md(reported, mix)
+    elif gp['output_format'] == output_format.CSV:
+        output_csv(reported, mix)
+
+    return successful
+
+
+def main():
+    """Main program driving instruction mix analysis"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'isa')
+    log_args(args)
+
+    # Check args are OK (have to have logging and build directory set up first)
+    validate_args(args)
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    if not collect_data(benchmarks):
+        log.info('ERROR: Failed to analyse all benchmarks')
+        sys.exit(1)
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+# Script to analyse linker map files
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Attribute the size of each Embench program to the parts of the build.
+
+The programs must have been built with map files (scons variable
+map_file=1).  The bytes of each benchmark are attributed to the benchmark's
+own objects, the generic support objects, the board support object, the C
+library, libgcc, the maths library, anything else (typically startup code)
+and padding between input sections.
+
+Input sections which were kept by the linker, but which can't be reached
+from the entry point (or from the sections the linker always keeps) are
+reported as unreferenced.  These typically indicate that -ffunction-sections,
+-fdata-sections or --gc-sections were not used, or that a library was not
+built with them.
+"""
+
+import argparse
+import os
+import sys
+
+from json import dumps
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import output_format
+from embench_elf import ALL_CATEGORIES
+from embench_elf import file_category_map
+from embench_elf import entry_address
+from embench_elf import is_elf
+from embench_map import CONTRIBUTORS
+from embench_map import parse_map_file
+from embench_map import attribute_sizes
+from embench_map import classify_input
+from embench_map import unreferenced_sections
+from embench_report import add_report_args
+from embench_report import setup_report_args
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Attribute benchmark size using linker map files')
+
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd',
+        help='Directory holding all the binaries',
+    )
+    add_report_args(parser, baselinedir=False, absolute=False)
+    parser.add_argument(
+        '--dummy-benchmark',
+        type=str,
+        default='dummy-benchmark',
+        help='Dummy benchmark to report as the library size overhead',
+    )
+    parser.add_argument(
+        '--metric',
+        type=str,
+        default=[],
+        nargs='+',
+        choices=ALL_CATEGORIES,
+        action='extend',
+        help=
+        'Section categories to include in metric: one or more of "text", '
+        + '"rodata", "data" or "bss". Default "text"',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    if not os.path.isdir(gp['bd']):
+        log.error(f'ERROR: build directory {gp["bd"]} not found: exiting')
+        sys.exit(1)
+
+    gp['bd_supportdir'] = os.path.join(gp['bd'], 'support')
+    setup_report_args(args)
+    gp['metric'] = args.metric or ['text']
+    gp['dummy_benchmark'] = args.dummy_benchmark
+
+
+def analyse_benchmark(bench, bd_path):
+    """Analyse the map file of benchmark "bench" in directory "bd_path".
+       Return a tuple of the sizes by contributor and the list of
+       unreferenced input sections, or None if there is no map file."""
+    appexe = os.path.join(bd_path, bench, f'{bench}{gp["file_extension"]}')
+    input_sections = parse_map_file(f'{appexe}.map')
+
+    if not input_sections or not is_elf(appexe):
+        log.warning(f'Warning: no map file or executable for {bench}')
+        return None
+
+    categories = file_category_map(appexe)
+    sizes = attribute_sizes(input_sections, categories, gp['metric'],
+                            gp['bd'])
+    unref = unreferenced_sections(input_sections, categories,
+                                  entry_address(appexe))
+
+    return sizes, unref
+
+
+def output_json(benchmarks, sizes, unref):
+    """Output the results in JSON format."""
+    res = {}
+    for bench in benchmarks:
+        res[bench] = {
+            'sizes': sizes[bench],
+            'unreferenced': [
+                {'section': isec.name,
+                 'file': isec.file,
+                 'member': isec.member,
+                 'contributor': classify_input(isec, gp['bd']),
+                 'size': isec.size}
+                for isec in unref[bench]
+            ],
+        }
+
+    log.info(dumps({'map results': res}, indent=2))
+
+
+def output_text(benchmarks, sizes, unref):
+    """Output the results in plain text format."""
+    hdr = ''.join(f' {contrib[:12]:>12}' for contrib in CONTRIBUTORS)
+    log.info(f'Benchmark       {hdr}        total')
+    log.info('---------       ' + ' ------------' * len(CONTRIBUTORS)
+             + ' ------------')
+
+    for bench in benchmarks:
+        row = ''.join(f' {sizes[bench][c]:12,}' for c in CONTRIBUTORS)
+        total = sum(sizes[bench].values())
+        log.info(f'{bench:15} {row} {total:12,}')
+
+    log.info('')
+    log.info('Unreferenced input sections')
+    log.info('---------------------------')
+
+    for bench in benchmarks:
+        for isec in unref[bench]:
+            where = os.path.basename(isec.file)
+            if isec.member:
+                where += f'({isec.member})'
+            log.info(f'{bench:15} {isec.name:30} {isec.size:8,}  {where}')
+
+
+def output_md(benchmarks, sizes, unref):
+    """Output the results in MarkDown format."""
+    hdr = ''.join(f' {contrib:>12} |' for contrib in CONTRIBUTORS)
+    log.info(f'| Benchmark         |{hdr}        Total |')
+    log.info('| :---------------- |' + ' -----------: |' * len(CONTRIBUTORS)
+             + ' -----------: |')
+
+    for bench in benchmarks:
+        md_bench = '`' + bench + '`'
+        row = ''.join(f' {sizes[bench][c]:12} |' for c in CONTRIBUTORS)
+        total = sum(sizes[bench].values())
+        log.info(f'| {md_bench:17} |{row} {total:12} |')
+
+    log.info('')
+    log.info('| Benchmark         | Unreferenced section           |     Size | File |')
+    log.info('| :---------------- | :----------------------------- | -------: | :--- |')
+
+    for bench in benchmarks:
+        md_bench = '`' + bench + '`'
+        for isec in unref[bench]:
+            where = os.path.basename(isec.file)
+            if isec.member:
+                where += f'({isec.member})'
+            log.info(f'| {md_bench:17} | `{isec.name}` | {isec.size:8} | `{where}` |')
+
+
+def output_csv(benchmarks, sizes, unref):
+    """Output the results in CSV format."""
+    hdr = ','.join(f'"{contrib}"' for contrib in CONTRIBUTORS)
+    log.info(f'"Benchmark",{hdr},"Total"')
+
+    for bench in benchmarks:
+        row = ','.join(f'"{sizes[bench][c]}"' for c in CONTRIBUTORS)
+        total = sum(sizes[bench].values())
+        log.info(f'"{bench}",{row},"{total}"')
+
+    log.info('')
+    log.info('"Benchmark","Unreferenced section","Size","File","Member"')
+
+    for bench in benchmarks:
+        for isec in unref[bench]:
+            log.info(f'"{bench}","{isec.name}","{isec.size}","{isec.file}",'
+                     + f'"{isec.member or ""}"')
+
+
+def collect_data(benchmarks):
+    """Analyse the map files of all the benchmarks and the dummy benchmark
+       and output the results.  Return True if all the map files could be
+       analysed."""
+    successful = True
+    sizes = {}
+    unref = {}
+    reported = []
+
+    targets = [(bench, gp['bd_benchdir']) for bench in benchmarks]
+    targets.append((gp['dummy_benchmark'], gp['bd_supportdir']))
+
+    for bench, bd_path in targets:
+        res = analyse_benchmark(bench, bd_path)
+        if res is None:
+            successful = False
+            continue
+        sizes[bench], unref[bench] = res
+        reported.append(bench)
+
+    if gp['output_format'] == output_format.JSON:
+        output_json(reported, sizes, unref)
+    elif gp['output_format'] == output_format.TEXT:
+        output_text(reported, sizes, unref)
+    elif gp['output_format'] == output_format.MD:
+        output_md(reported, sizes, unref)
+    elif gp['output_format'] == output_format.CSV:
+        output_csv(reported, sizes, unref)
+
+    return successful
+
+
+def main():
+    """Main program driving analysis of linker map files"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'map')
+    log_args(args)
+
+    # Check args are OK (have to have logging and build directory set up first)
+    validate_args(args)
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    if not collect_data(benchmarks):
+        log.info('ERROR: Failed to analyse all map files')
+        sys.exit(1)
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+# Script to measure the benefit of profile guided optimization
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Build the Embench programs with profile guided optimization (PGO) and
+report their speed before and after.
+
+The programs are built twice, in two subdirectories of the build directory.
+
+- "base" holds the programs built normally.
+- "pgo" first holds instrumented programs, built with pgo=generate.  Each is
+  run once to record its profile, and they are then rebuilt in the same
+  directory with pgo=use, applying the profiles.
+
+The speed of the programs in both directories is then measured and reported
+side by side.  The programs must be run on the host to write their
+profiles, so this is only useful with a native target module and a
+compiler which supports GCC's -fprofile-generate and -fprofile-use.
+"""
+
+import argparse
+import os
+import sys
+
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import run_scons
+from embench_build import run_median
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Report speed before and after profile guided '
+        + 'optimization')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons, for example cflags="-O2"',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd-pgo',
+        help='Directory in which to build the binaries (default "bd-pgo")',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        default='run_native',
+        help='Python module with routines to run benchmarks '
+        + '(default "run_native")',
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor for benchmarks, passed to scons'
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables, ('pgo',))
+
+    gp['base_bd'] = os.path.join(gp['bd'], 'base')
+    gp['pgo_bd'] = os.path.join(gp['bd'], 'pgo')
+    setup_report_args(args)
+
+    newmodule = import_target_module(args.target_module)
+    globals()['get_target_args'] = newmodule.get_target_args
+    globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def build(bd, pgo, args):
+    """Build the benchmarks in "bd" with the scons variable pgo set to
+       "pgo".  Return True if the build succeeded."""
+    if not run_scons(bd, args.config_dir,
+                     [*args.variables, f'gsf={args.gsf}', f'pgo={pgo}'],
+                     args.scons):
+        log.error(f'ERROR: Build with pgo={pgo} failed')
+        return False
+
+    return True
+
+
+def benchmark_exe(bd, bench):
+    """The executable of benchmark "bench" in build directory "bd"."""
+    return os.path.join(bd, 'src', bench, f'{bench}{gp["file_extension"]}')
+
+
+def remove_profiles(bd):
+    """Remove any profiles from earlier runs in "bd", which would otherwise
+       be accumulated with the new ones."""
+    for dirpath, _, files in os.walk(bd):
+        for name in files:
+            if name.endswith('.gcda'):
+                os.remove(os.path.join(dirpath, name))
+
+
+def record_profiles(benchmarks, args):
+    """Run each instrumented benchmark once to record its profile.  Return
+       True if all the runs succeeded."""
+    remove_profiles(gp['pgo_bd'])
+    successful = True
+
+    for bench in benchmarks:
+        if not run_benchmark(bench, benchmark_exe(gp['pgo_bd'], bench), args):
+            log.warning(f'Warning: Profile run of {bench} failed.')
+            successful = False
+
+    return successful
+
+
+def measure_build(benchmarks, bd, args):
+    """Measure the speed of the benchmarks in "bd".  Return dictionaries of
+       the raw and relative speeds of those which ran."""
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    raw_data = {}
+    rel_data = {}
+    for bench in benchmarks:
+        ms = run_median(run_benchmark, bench, benchmark_exe(bd, bench), args)
+        if ms is None:
+            log.warning(f'Warning: Run of {bench} failed.')
+            continue
+        raw_data[bench] = ms
+        rel_data[bench] = baseline[bench] / raw_data[bench] * args.gsf
+
+    return raw_data, rel_data
+
+
+def main():
+    """Main program driving the PGO build and measurement"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'pgo')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    if not (build(gp['base_bd'], 'none', args)
+            and build(gp['pgo_bd'], 'generate', args)):
+        sys.exit(1)
+    profiled = record_profiles(benchmarks, args)
+    if not build(gp['pgo_bd'], 'use', args):
+        sys.exit(1)
+
+    results = [
+        ('before',) + measure_build(benchmarks, gp['base_bd'], args),
+        ('after',) + measure_build(benchmarks, gp['pgo_bd'], args),
+    ]
+    stats = [embench_stats(list(raw_data), raw_data, rel_data)
+             for _, raw_data, rel_data in results]
+
+    output_results(benchmarks, results, stats)
+
+    if not profiled or any(len(raw_data) != len(benchmarks)
+                           for _, raw_data, _ in results):
+        log.info('ERROR: Failed to measure all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+
+# Script to build the benchmarks and measure them in one step
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Build the Embench programs and measure their size and speed.
+
+Rather than building everything, then measuring size, then measuring speed,
+scons is run with --report-links, and each benchmark's size is measured and
+its speed run started as soon as its executable is linked, while the rest of
+the suite is still being compiled.  Benchmarks which are already up to date
+are measured once the build has finished, and those which failed to build
+are not measured at all.
+
+Speed runs are made one at a time, but may overlap with compilation.  On a
+native host this competes for the processor, so use benchmark_speed.py after
+the build when the most reliable timings are needed.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import run_scons
+from embench_build import run_median
+from embench_elf import ALL_CATEGORIES
+from embench_elf import elf_size_breakdown
+from embench_elf import is_elf
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+from embench_trace import merge_trace
+from embench_trace import span
+from embench_trace import start_trace
+
+LINKED_RE = re.compile(r'^embench: linked (.*)$')
+FAILED_RE = re.compile(r'^scons: \*\*\* \[(.+?)\]')
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Build the benchmarks and measure their size and speed')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons, for example cflags="-O2"',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd',
+        help='Directory in which to build the binaries',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--metric',
+        type=str,
+        default=[],
+        nargs='+',
+        choices=ALL_CATEGORIES,
+        action='extend',
+        help=
+        'Section categories to include in metric: one or more of "text", '
+        + '"rodata", "data" or "bss". Default "text"',
+    )
+    parser.add_argument(
+        '--dummy-benchmark',
+        type=str,
+        default='dummy-benchmark',
+        help='Dummy benchmark to subtract from each benchmark size',
+    )
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        default=None,
+        help='Python module with routines to run benchmarks. If not '
+        + 'specified only size is measured',
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor for benchmarks, passed to scons'
+    )
+    parser.add_argument(
+        '--gsf-file',
+        type=str,
+        default=None,
+        help='JSON file of the global scale factors of individual benchmarks, '
+        + 'as written by benchmark_calibrate.py, overriding --gsf, passed '
+        + 'to scons'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Number of runs of each benchmark, of which the median is '
+        + 'reported',
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        help='File in which to write a timeline of the build and run, in '
+        + 'Chrome trace event format',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables, ('gsf', 'gsf_file'))
+
+    gp['bench_gsf'] = {}
+    if args.gsf_file:
+        args.gsf_file = os.path.abspath(args.gsf_file)
+        try:
+            with open(args.gsf_file) as fileh:
+                gp['bench_gsf'] = loads(fileh.read())
+        except (OSError, ValueError) as error:
+            log.error(f'ERROR: Unable to read scale factors {args.gsf_file}: '
+                      + f'{error}: exiting')
+            sys.exit(1)
+    if args.repeat < 1:
+        log.error('ERROR: --repeat must be positive: exiting')
+        sys.exit(1)
+
+    gp['bd_supportdir'] = os.path.join(gp['bd'], 'support')
+    setup_report_args(args)
+    gp['metric'] = args.metric or ['text']
+    gp['dummy_benchmark'] = args.dummy_benchmark
+
+    if args.target_module:
+        newmodule = import_target_module(args.target_module)
+        globals()['get_target_args'] = newmodule.get_target_args
+        globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def scons_variables(args):
+    """The scons variables with which to build the benchmarks."""
+    variables = [*args.variables, f'gsf={args.gsf}']
+    if args.gsf_file:
+        variables.append(f'gsf_file={args.gsf_file}')
+    return variables
+
+
+def failed_benchmark(target):
+    """The benchmark of the scons target "target", which failed to build, or
+       None if it is not part of a single benchmark, such as the support
+       code used by every benchmark."""
+    target = os.path.join(gp['rootdir'], target)
+    for bd_path in (gp['bd_benchdir'], gp['bd_supportdir']):
+        parts = os.path.relpath(target, bd_path).split(os.sep)
+        if (parts[0] != os.pardir) and (len(parts) > 1) and (
+                (bd_path == gp['bd_benchdir'])
+                or (parts[0] == gp['dummy_benchmark'])):
+            return parts[0]
+
+    return None
+
+
+def measure_exe_size(appexe):
+    """Measure the size of "appexe" in each category."""
+    with span('parse ELF', 'elf', file=appexe):
+        return elf_size_breakdown(appexe)['categories']
+
+
+def measure_exe_speed(bench, appexe, args):
+    """Run benchmark "bench" at "appexe" "args.repeat" times.  Return the
+       median time in milliseconds, or None on failure."""
+    ms = run_median(run_benchmark, bench, appexe, args, args.repeat)
+    if ms is None:
+        log.warning(f'Warning: Run of {bench} failed.')
+
+    return ms
+
+
+def build_and_measure(benchmarks, args):
+    """Build the benchmarks, measuring each one as soon as it is linked.
+       Return a flag indicating if the build succeeded, and dictionaries of
+       the size and speed futures indexed by benchmark."""
+    size_pool = ThreadPoolExecutor(max_workers=1)
+    speed_pool = ThreadPoolExecutor(max_workers=1)
+    sizes = {}
+    speeds = {}
+    start = time.time()
+
+    def measure(bench, appexe):
+        log.debug(f'{bench} linked after {time.time() - start:.1f}s')
+        sizes[bench] = size_pool.submit(measure_exe_size, appexe)
+        if args.target_module and (bench != gp['dummy_benchmark']):
+            speeds[bench] = speed_pool.submit(measure_exe_speed, bench,
+                                              appexe, args)
+
+    # The targets which failed, by benchmark, and whether any failure was
+    # not in a single benchmark
+    failed = set()
+    failed_all = False
+
+    def scons_output(line):
+        nonlocal failed_all
+        match = LINKED_RE.match(line)
+        if match:
+            appexe = match.group(1)
+            measure(os.path.basename(os.path.dirname(appexe)), appexe)
+            return
+        log.debug(line)
+        match = FAILED_RE.match(line)
+        if match:
+            bench = failed_benchmark(match.group(1))
+            if bench is None:
+                failed_all = True
+            else:
+                failed.add(bench)
+
+    # Keep going past any failure, so that as many benchmarks as possible
+    # are built
+    extra_opts = ['-k', '--report-links']
+    if args.trace:
+        extra_opts.append(f'--trace={os.path.abspath(args.trace)}.scons')
+    built = run_scons(gp['bd'], args.config_dir, scons_variables(args),
+                      args.scons, extra_opts, scons_output)
+    log.debug(f'Build finished after {time.time() - start:.1f}s')
+    if args.trace:
+        # The build's timeline is written separately by scons
+        merge_trace(f'{os.path.abspath(args.trace)}.scons')
+        try:
+            os.remove(f'{os.path.abspath(args.trace)}.scons')
+        except OSError:
+            pass
+    if not built:
+        log.error('ERROR: Build failed')
+        # Without knowing what failed, any executable may be out of date
+        failed_all = failed_all or not failed
+
+    # Anything else not linked was already up to date.  The executable of a
+    # benchmark which failed to build is left over from an earlier build.
+    targets = [(bench, gp['bd_benchdir']) for bench in benchmarks]
+    targets.append((gp['dummy_benchmark'], gp['bd_supportdir']))
+    for bench, bd_path in targets:
+        if bench in sizes:
+            continue
+        if failed_all or (bench in failed):
+            log.warning(f'Warning: {bench} failed to build, so is not '
+                        + 'measured')
+            continue
+        appexe = os.path.join(bd_path, bench, f'{bench}{gp["file_extension"]}')
+        if is_elf(appexe):
+            measure(bench, appexe)
+
+    size_pool.shutdown()
+    speed_pool.shutdown()
+    log.debug(f'Measurement finished after {time.time() - start:.1f}s')
+
+    return built, sizes, speeds
+
+
+def compute_size_data(benchmarks, sizes):
+    """Compute the raw and relative sizes from the size futures, subtracting
+       the size of the dummy benchmark."""
+    with open(os.path.join(gp['baseline_dir'], 'size.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    dummy = sizes[gp['dummy_benchmark']].result()
+    raw_data = {}
+    rel_data = {}
+    for bench in benchmarks:
+        if bench not in sizes:
+            continue
+        categories = sizes[bench].result()
+        raw_data[bench] = sum(categories[metric] - dummy[metric]
+                              for metric in gp['metric'])
+        base = sum(baseline[bench][metric] for metric in gp['metric'])
+        rel_data[bench] = raw_data[bench] / base if base > 0 else 0.0
+
+    return raw_data, rel_data
+
+
+def compute_speed_data(benchmarks, speeds, args):
+    """Compute the raw and relative speeds from the speed futures."""
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    raw_data = {}
+    rel_data = {}
+    for bench in benchmarks:
+        if (bench in speeds) and speeds[bench].result():
+            raw_data[bench] = speeds[bench].result()
+            gsf = gp['bench_gsf'].get(bench, args.gsf)
+            rel_data[bench] = baseline[bench] / raw_data[bench] * gsf
+
+    return raw_data, rel_data
+
+
+def main():
+    """Main program driving building and measurement"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'pipeline')
+    log_args(args)
+    if args.trace:
+        start_trace(args.trace, 'benchmark_pipeline')
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    if args.target_module:
+        args = argparse.Namespace(**vars(args),
+                                  **vars(get_target_args(remnant)))
+    elif remnant:
+        parser.error(f'unrecognized arguments: {" ".join(remnant)}')
+
+    # Find the benchmarks
+    with span('find benchmarks', 'setup'):
+        benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    built, sizes, speeds = build_and_measure(benchmarks, args)
+    if gp['dummy_benchmark'] not in sizes:
+        log.error('ERROR: dummy benchmark was not built: exiting')
+        sys.exit(1)
+
+    results = [('size',) + compute_size_data(benchmarks, sizes)]
+    if args.target_module:
+        results.append(('speed',) + compute_speed_data(benchmarks, speeds,
+                                                       args))
+    with span('statistics', 'stats'):
+        stats = [embench_stats(list(raw_data), raw_data, rel_data)
+                 for _, raw_data, rel_data in results]
+
+    output_results(benchmarks, results, stats)
+
+    if not built or any(len(raw_data) != len(benchmarks)
+                        for _, raw_data, _ in results):
+        log.info('ERROR: Failed to build and measure all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
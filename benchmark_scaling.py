@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+# Script to separate fixed overhead from the cost of each iteration
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Measure how the time of each benchmark scales with the global scale factor.
+
+The programs are built for several global scale factors, in one invocation
+of scons using a build matrix, and each is run at each scale factor.  The
+line time = a + b * gsf is fitted to the times of each benchmark by least
+squares.  The fixed cost "a" is the part of each run which does not depend
+on the scale factor: starting the program, initialise_benchmark, warming the
+caches and triggering the timer.  The marginal cost "b" is the time of one
+unit of scale factor.
+
+The speed score of each benchmark is reported both as measured at the
+largest scale factor, and from its marginal cost alone.  The difference
+between them is the part of the score due to the test harness, rather than
+the code generated for the benchmark.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+from json import dumps
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_core import output_format
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import build_matrix
+from embench_build import run_median
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_table
+
+# Build matrix written in the build directory
+SCALING_MATRIX_FILE = 'scaling-matrix.json'
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Separate fixed overhead from the cost of each iteration')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons, for example cflags="-O2"',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd-scaling',
+        help='Directory in which to build the binaries '
+        + '(default "bd-scaling")',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser, absolute=False)
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        required=True,
+        help='Python module with routines to run benchmarks',
+    )
+    parser.add_argument(
+        '--gsf-values',
+        type=str,
+        default='1,2,4,8',
+        help='Comma separated global scale factors at which to measure '
+        + '(default "1,2,4,8")',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Number of runs at each scale factor, of which the median is '
+        + 'used (default 1)',
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables, ('gsf', 'gsf_file'))
+
+    try:
+        gp['gsf_values'] = sorted(set(int(gsf)
+                                      for gsf in args.gsf_values.split(',')))
+    except ValueError:
+        gp['gsf_values'] = []
+    if (len(gp['gsf_values']) < 2) or (gp['gsf_values'][0] < 1):
+        log.error('ERROR: at least two different positive scale factors are '
+                  + 'needed: exiting')
+        sys.exit(1)
+    if args.repeat < 1:
+        log.error('ERROR: --repeat must be positive: exiting')
+        sys.exit(1)
+
+    # Scores are always relative to the baseline
+    gp['absolute'] = False
+    setup_report_args(args)
+
+    newmodule = import_target_module(args.target_module)
+    globals()['get_target_args'] = newmodule.get_target_args
+    globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def gsf_builddir(gsf):
+    """The build directory of the programs with scale factor "gsf"."""
+    return os.path.join(gp['bd'], f'gsf-{gsf}')
+
+
+def build(args):
+    """Build the benchmarks at each scale factor, as one build matrix.
+       Return True if the build succeeded."""
+    configs = {os.path.basename(gsf_builddir(gsf)): {'gsf': gsf}
+               for gsf in gp['gsf_values']}
+    if not build_matrix(configs, args.variables, SCALING_MATRIX_FILE,
+                        args.config_dir, args.scons):
+        log.error('ERROR: Build failed')
+        return False
+
+    return True
+
+
+def run_at(bench, gsf, args):
+    """Run benchmark "bench" built with scale factor "gsf".  Return the
+       median time in milliseconds, or None on failure."""
+    appexe = os.path.join(gsf_builddir(gsf), 'src', bench,
+                          f'{bench}{gp["file_extension"]}')
+    ms = run_median(run_benchmark, bench, appexe, args, args.repeat)
+    if ms is None:
+        log.warning(f'Warning: Run of {bench} at scale factor {gsf} '
+                    + 'failed.')
+
+    return ms
+
+
+def fit_line(xs, ys):
+    """Fit y = a + b * x by least squares.  Return a, b and the coefficient
+       of determination."""
+    mean_x = statistics.mean(xs)
+    mean_y = statistics.mean(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    syy = sum((y - mean_y) ** 2 for y in ys)
+
+    b = sxy / sxx
+    a = mean_y - b * mean_x
+    r2 = (sxy * sxy) / (sxx * syy) if syy > 0 else 1.0
+    return a, b, r2
+
+
+def collect_data(benchmarks, args):
+    """Measure each benchmark at each scale factor and fit its time.
+       Return a dictionary of the fit of each benchmark which could be
+       measured at every scale factor."""
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    max_gsf = gp['gsf_values'][-1]
+    fits = {}
+    for bench in benchmarks:
+        times = [run_at(bench, gsf, args) for gsf in gp['gsf_values']]
+        if None in times:
+            continue
+        a, b, r2 = fit_line(gp['gsf_values'], times)
+        log.debug(f'{bench}: ' + ', '.join(
+            f'{t:.1f} ms at {gsf}' for gsf, t in zip(gp['gsf_values'], times)))
+        if b <= 0:
+            log.warning(f'Warning: time of {bench} does not increase with '
+                        + 'scale factor')
+            continue
+        if r2 < 0.99:
+            log.warning(f'Warning: time of {bench} is not linear in scale '
+                        + f'factor (r2 = {r2:.3f})')
+        fits[bench] = {
+            'fixed': a,
+            'marginal': b,
+            'r2': r2,
+            'overhead': 100.0 * a / times[-1],
+            'score': baseline[bench] / times[-1] * max_gsf,
+            'true score': baseline[bench] / b,
+        }
+
+    return fits
+
+
+def output_json(benchmarks, fits, stats):
+    """Output the results in JSON format."""
+    res = {}
+    for bench in benchmarks:
+        if bench in fits:
+            res[bench] = {
+                'fixed ms': round(fits[bench]['fixed'], 3),
+                'per gsf ms': round(fits[bench]['marginal'], 3),
+                'overhead %': round(fits[bench]['overhead'], 1),
+                'r2': round(fits[bench]['r2'], 4),
+                'score': round(fits[bench]['score'], 2),
+                'true score': round(fits[bench]['true score'], 2),
+            }
+        else:
+            res[bench] = None
+
+    log.info(dumps({'scaling results': {
+        'detailed scaling results': res,
+        'score geometric mean': round(stats['score'][0], 2),
+        'true score geometric mean': round(stats['true score'][0], 2),
+    }}, indent=2))
+
+
+def output_fits(benchmarks, fits, stats):
+    """Output the results as plain text, MarkDown or CSV."""
+    names = ['fixed ms', 'per gsf ms', 'overhead %', 'score', 'true score']
+    rows = []
+    for bench in benchmarks:
+        if bench in fits:
+            fit = fits[bench]
+            rows.append((bench, [f'{fit["fixed"]:.2f}',
+                                 f'{fit["marginal"]:.3f}',
+                                 f'{fit["overhead"]:.1f}',
+                                 f'{fit["score"]:.2f}',
+                                 f'{fit["true score"]:.2f}']))
+        else:
+            rows.append((bench, ['n/a'] * len(names)))
+    summary = [('Geometric mean', ['', '', '',
+                                   f'{stats["score"][0]:.2f}',
+                                   f'{stats["true score"][0]:.2f}'])]
+
+    output_table(names, rows, summary)
+
+
+def main():
+    """Main program driving the scaling study"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'scaling')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    if not build(args):
+        sys.exit(1)
+
+    fits = collect_data(benchmarks, args)
+    stats = {}
+    for score in ('score', 'true score'):
+        rel_data = {bench: fit[score] for bench, fit in fits.items()}
+        stats[score] = embench_stats(list(rel_data), rel_data, rel_data)
+
+    if gp['output_format'] == output_format.JSON:
+        output_json(benchmarks, fits, stats)
+    else:
+        output_fits(benchmarks, fits, stats)
+
+    if len(fits) != len(benchmarks):
+        log.info('ERROR: Failed to fit all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+# Script to measure the size and speed of one or more builds together
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Measure the size and speed of the Embench programs in one or more build
+directories, and report them together.
+
+The benchmarks are found once, and each build directory is measured with
+measure_size () from benchmark_size.py and measure_speed () from
+benchmark_speed.py, so the results are exactly those the two scripts give.
+The report has a column for each measurement of each build directory: the
+speed and size of each benchmark, the speed per MHz, and the speed per
+byte, which is the relative speed divided by the relative size.  With
+--absolute only the times and sizes are reported, since the ratios only
+have meaning relative to the reference platform.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_elf import ALL_CATEGORIES
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+from embench_trace import span
+from embench_trace import start_trace
+
+from benchmark_size import measure_size
+from benchmark_speed import measure_speed
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Measure the size and speed of one or more builds')
+
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default=['bd'],
+        nargs='+',
+        help='One or more directories holding all the binaries, to be '
+        + 'compared (default "bd")',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--metric',
+        type=str,
+        default=[],
+        nargs='+',
+        choices=ALL_CATEGORIES,
+        action='extend',
+        help=
+        'Section categories to include in metric: one or more of "text", '
+        + '"rodata", "data" or "bss". Default "text"',
+    )
+    parser.add_argument(
+        '--dummy-benchmark',
+        type=str,
+        default='dummy-benchmark',
+        help='Dummy benchmark to subtract from each benchmark size',
+    )
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        required=True,
+        help='Python module with routines to run benchmarks',
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=30,
+        help='Timeout used for running each benchmark program'
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor for benchmarks'
+    )
+    parser.add_argument(
+        '--cpu-mhz',
+        type=int,
+        default=16,
+        help='Processor clock speed in MHz'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Number of runs of each benchmark, of which the median is '
+        + 'reported',
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        help='File in which to write a timeline of the run, in Chrome trace '
+        + 'event format',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    for bd in args.builddir:
+        bd = bd if os.path.isabs(bd) else os.path.join(gp['rootdir'], bd)
+        if not os.path.isdir(bd):
+            log.error(f'ERROR: build directory {bd} not found: exiting')
+            sys.exit(1)
+    gp['bd'] = args.builddir[0]
+    if args.repeat < 1:
+        log.error('ERROR: --repeat must be positive: exiting')
+        sys.exit(1)
+
+
+def column_names(builddirs):
+    """The name of each build directory in the column headings: nothing if
+       there is only one, otherwise its last component, or its whole name if
+       that is ambiguous."""
+    if len(builddirs) == 1:
+        return ['']
+    names = [os.path.basename(os.path.normpath(bd)) for bd in builddirs]
+    if len(set(names)) < len(names):
+        names = builddirs
+    return [f' {name}' for name in names]
+
+
+def measure_builddir(bd, benchmarks, remnant, args):
+    """Measure the size and speed of "benchmarks" in build directory "bd",
+       passing "remnant" to the target module.  Return the size and speed
+       Results objects, or exit if the arguments are not valid."""
+    try:
+        size = measure_size(
+            bd, benchmarks, baselinedir=args.baselinedir,
+            absolute=args.absolute, metric=args.metric,
+            dummy_benchmark=args.dummy_benchmark,
+            file_extension=args.file_extension)
+        speed = measure_speed(
+            bd, args.target_module, remnant, benchmarks,
+            baselinedir=args.baselinedir, absolute=args.absolute,
+            timeout=args.timeout, gsf=args.gsf, cpu_mhz=args.cpu_mhz,
+            repeat=args.repeat, file_extension=args.file_extension)
+    except (ValueError, RuntimeError) as error:
+        log.error(f'ERROR: {bd}: {error}: exiting')
+        sys.exit(1)
+
+    return size, speed
+
+
+def ratio_data(numerator, denominator, scale=1.0):
+    """The relative results of the Results object "numerator" divided by
+       those of "denominator" and by "scale", for the benchmarks in both."""
+    data = {}
+    for bench in numerator.relative:
+        if denominator is None:
+            data[bench] = numerator.relative[bench] / scale
+        elif denominator.relative.get(bench, 0.0) > 0.0:
+            data[bench] = (numerator.relative[bench]
+                           / denominator.relative[bench] / scale)
+    return data
+
+
+def unified_results(measured, builddirs, args):
+    """The results to report, as a list of (name, raw data, relative data)
+       for each measurement of each build directory.  "measured" is a list
+       of the size and speed Results of each build directory."""
+    names = column_names(builddirs)
+    results = []
+    if args.absolute:
+        results.extend((f'time{name}', speed.raw, speed.raw)
+                       for name, (_, speed) in zip(names, measured))
+        results.extend((f'size{name}', size.raw, size.raw)
+                       for name, (size, _) in zip(names, measured))
+        return results
+
+    for name, (size, speed) in zip(names, measured):
+        results.append((f'speed{name}', speed.raw, speed.relative))
+    for name, (size, speed) in zip(names, measured):
+        per_mhz = ratio_data(speed, None, args.cpu_mhz)
+        results.append((f'speed/MHz{name}', per_mhz, per_mhz))
+    for name, (size, speed) in zip(names, measured):
+        results.append((f'size{name}', size.raw, size.relative))
+    for name, (size, speed) in zip(names, measured):
+        per_byte = ratio_data(speed, size)
+        results.append((f'speed/size{name}', per_byte, per_byte))
+
+    return results
+
+
+def main():
+    """Main program driving measurement of benchmark size and speed"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    args, remnant = build_parser().parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'score')
+    log_args(args)
+    if args.trace:
+        start_trace(args.trace, 'benchmark_score')
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Find the benchmarks, once for all the build directories
+    with span('find benchmarks', 'setup'):
+        benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    measured = []
+    for bd in args.builddir:
+        with span(bd, 'builddir'):
+            measured.append(measure_builddir(bd, benchmarks, remnant, args))
+
+    # The measurement functions leave the format of their own output unset
+    setup_report_args(args)
+
+    results = unified_results(measured, args.builddir, args)
+    with span('statistics', 'stats'):
+        stats = [embench_stats(list(raw_data), raw_data, rel_data)
+                 for _, raw_data, rel_data in results]
+
+    output_results(benchmarks, results, stats)
+
+    if not all(size.successful and speed.successful
+               for size, speed in measured):
+        log.info('ERROR: Failed to measure all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,16 +30,18 @@ associated by their ELF flags and ELF type. The default associations are:
     read only data                        A          PROGBITS
     zero initialized writable data (BSS)  AW or AWX  NOBITS
 
+The script may also be imported, and measure_size () called to measure the
+size of a build directory and return the results, without any output.
 """
 
 import argparse
+import glob
 import os
 import sys
 import platform
 
+from json import dumps
 from json import loads
-from elftools.elf import elffile as elf
-from elftools.elf.constants import SH_FLAGS as FLAGS
 
 sys.path.append(
     os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
@@ -50,24 +52,24 @@ from embench_core import gp
 from embench_core import setup_logging
 from embench_core import log_args
 from embench_core import find_benchmarks
+from embench_core import setup_benchmark_dirs
 from embench_core import log_benchmarks
 from embench_core import embench_stats
+from embench_core import embench_sub_scores
+from embench_core import read_benchmark_info
 from embench_core import output_format
-
-# the default section flags and types are used both in validate_args and in
-# collect_data.
-DEFAULT_FLAGS_ELF = {
-    'text': ({int(FLAGS.SHF_ALLOC | FLAGS.SHF_EXECINSTR)}, 'SHT_PROGBITS'),
-    'rodata': ({int(FLAGS.SHF_ALLOC)}, 'SHT_PROGBITS'),
-    'data': ({
-        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE),
-        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE | FLAGS.SHF_EXECINSTR)
-    }, 'SHT_PROGBITS'),
-    'bss': ({
-        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE),
-        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE | FLAGS.SHF_EXECINSTR)
-    }, 'SHT_NOBITS'),
-}
+from embench_core import Results
+from embench_elf import DEFAULT_FLAGS_ELF
+from embench_elf import elf_size_breakdown
+from embench_cache import FileResultCache
+from embench_checkpoint import Checkpoint
+from embench_stack import read_stack_objects
+from embench_stack import worst_case_stack
+from embench_history import HISTORY_FILE
+from embench_history import record_run
+from embench_report import output_jsonl
+from embench_trace import span
+from embench_trace import start_trace
 
 DEFAULT_SECNAMELIST_DICT = {
     'elf': DEFAULT_FLAGS_ELF,
@@ -84,6 +86,14 @@ separated list of categories to be included in the metric.
 ALL_CATEGORIES = ['text', 'rodata', 'data', 'bss']
 ALL_METRICS = ['text', 'rodata', 'data', 'bss']
 
+# The size breakdown of each binary is cached in the build directory.  The
+# version must be changed whenever the form of the breakdown changes.
+SIZE_CACHE_FILE = '.embench-size-cache.json'
+SIZE_CACHE_VERSION = 1
+
+# The default journal of completed results in the build directory
+SIZE_CHECKPOINT_FILE = '.embench-size-checkpoint.jsonl'
+
 
 def build_parser():
     """Build a parser for all the arguments"""
@@ -152,6 +162,14 @@ def build_parser():
         action='store_const',
         const=output_format.BASELINE,
         help='Specify to output in a format suitable for use as a baseline')
+    parser.add_argument(
+        '--jsonl',
+        dest='output_format',
+        action='store_const',
+        const=output_format.JSONL,
+        help='Specify to output a line of JSON for each benchmark as soon as '
+        + 'it has been measured, followed by a summary',
+    )
     parser.add_argument(
         '--json-comma',
         action='store_true',
@@ -188,6 +206,71 @@ def build_parser():
         help=
         'Optional file extension to append to bench mark names when searching for binaries.'
     )
+    parser.add_argument(
+        '--stack-usage',
+        action='store_true',
+        help='Specify to report the worst case stack depth of each benchmark',
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='Specify to ignore and not update the cache of size results',
+    )
+    parser.add_argument(
+        '--history',
+        type=str,
+        default=None,
+        help='SQLite database in which to record the results (default '
+        + f'{HISTORY_FILE} in the log directory)',
+    )
+    parser.add_argument(
+        '--no-history',
+        dest='history',
+        action='store_false',
+        help='Specify to not record the results',
+    )
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        default=None,
+        help='File in which to journal the result of each benchmark as it '
+        + f'completes (default {SIZE_CHECKPOINT_FILE} in the build '
+        + 'directory)',
+    )
+    parser.add_argument(
+        '--no-checkpoint',
+        dest='checkpoint',
+        action='store_false',
+        help='Specify to not journal the results',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Specify to reuse the journalled results of an interrupted run '
+        + 'with the same arguments, and only measure the remaining benchmarks',
+    )
+    parser.add_argument(
+        '--sub-scores',
+        action='store_true',
+        help='Specify to also report the weighted geometric mean and the '
+        + 'geometric mean of each category of benchmark',
+    )
+    parser.add_argument(
+        '--benchmark-info',
+        type=str,
+        default=None,
+        help='JSON file of the category and weight of each benchmark for '
+        + '--sub-scores, which it implies (default benchmarks.json in the '
+        + 'baseline directory)',
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        help='File in which to write a timeline of the run, in Chrome trace '
+        + 'event format',
+    )
 
     return parser
 
@@ -268,6 +351,71 @@ def validate_args(args):
     validate_metric(args)
     validate_dummy_bm(args)
     validate_file_ext(args)
+    validate_cache(args)
+    validate_history(args)
+    gp['stack_usage'] = args.stack_usage
+    validate_checkpoint(args)
+    validate_benchmark_info(args)
+
+
+def validate_cache(args):
+    """Set up the cache of size results held in the build directory, unless
+    it has been disabled."""
+    if args.cache:
+        gp['size_cache'] = FileResultCache(
+            os.path.join(gp['bd'], SIZE_CACHE_FILE), SIZE_CACHE_VERSION)
+    else:
+        gp['size_cache'] = None
+
+
+def validate_history(args):
+    """Set up the database in which to record the results, unless
+    recording has been disabled."""
+    if args.history is False:
+        gp['history'] = None
+    elif args.history:
+        gp['history'] = args.history
+    else:
+        gp['history'] = os.path.join(os.path.abspath(args.logdir),
+                                     HISTORY_FILE)
+
+
+def validate_checkpoint(args):
+    """Set up the journal of results, unless it has been disabled.  The
+    fingerprint is everything else the results depend on."""
+    if args.checkpoint is False:
+        if args.resume:
+            log.error('ERROR: --resume needs a checkpoint: exiting')
+            sys.exit(1)
+        gp['checkpoint'] = None
+        return
+
+    journal = args.checkpoint or os.path.join(gp['bd'], SIZE_CHECKPOINT_FILE)
+    metric = (ALL_METRICS if gp['output_format'] == output_format.BASELINE
+              else gp['metric'])
+    fingerprint = dumps({'builddir': os.path.abspath(gp['bd']),
+                         'metric': metric,
+                         'dummy_benchmark': gp['dummy_benchmark'],
+                         'file_extension': gp['file_extension'],
+                         'stack_usage': gp['stack_usage']})
+    gp['checkpoint'] = Checkpoint(journal, fingerprint, args.resume)
+
+
+def validate_benchmark_info(args):
+    """Read the categories and weights of the benchmarks, if sub-scores are
+    wanted."""
+    gp['benchmark_info'] = None
+    if not (args.sub_scores or args.benchmark_info):
+        return
+
+    info_file = args.benchmark_info or os.path.join(gp['baseline_dir'],
+                                                    'benchmarks.json')
+    try:
+        gp['benchmark_info'] = read_benchmark_info(info_file)
+    except (OSError, ValueError) as error:
+        log.error(f'ERROR: Unable to read benchmark information {info_file}: '
+                  + f'{error}: exiting')
+        sys.exit(1)
 
 
 def check_for_elf(appexe):
@@ -282,6 +430,30 @@ def check_for_elf(appexe):
         sys.exit(1)
 
 
+def size_breakdown(appexe):
+    """Get the size breakdown of the ELF file "appexe", from the cache if the
+       file has not changed since it was last measured."""
+    cache = gp['size_cache']
+    if cache is not None:
+        breakdown = cache.lookup(appexe)
+        if breakdown is not None:
+            log.debug(f'Using cached sizes for {appexe}')
+            return breakdown
+
+    with span('parse ELF', 'elf', file=appexe):
+        # read format from file and check it is as expected
+        check_for_elf(appexe)
+
+        # TODO: We should insert the lief based anaysis here for use on Apple kit.
+        #binary = lief.parse(appexe)
+
+        breakdown = elf_size_breakdown(appexe)
+    if cache is not None:
+        cache.store(appexe, breakdown)
+
+    return breakdown
+
+
 def benchmark_size(bench, bd_path, metrics, dummy_sec_sizes):
     """Compute the total size of the desired sections in a benchmark.  Returns
        the size in bytes, which may be zero if the section wasn't found."""
@@ -293,32 +465,49 @@ def benchmark_size(bench, bd_path, metrics, dummy_sec_sizes):
     if not os.path.exists(appexe):
         return {}
 
-    # read format from file and check it is as expected
-    check_for_elf(appexe)
-
-    # TODO: We should insert the lief based anaysis here for use on Apple kit.
-    #binary = lief.parse(appexe)
-
-    with open(appexe, 'rb') as fileh:
-        binary = elf.ELFFile(fileh)
-        for metric in metrics:
-            sec_sizes[metric] = 0
-            sections = binary.iter_sections()
-            for section in sections:
-                metric_sh_flags_list = DEFAULT_FLAGS_ELF[metric][0]
-                metric_sh_type = DEFAULT_FLAGS_ELF[metric][1]
-                for metric_sh_flags in metric_sh_flags_list:
-                    if ((section['sh_flags'] == metric_sh_flags)
-                            and (section['sh_type'] == metric_sh_type)):
-                        sec_sizes[metric] += section['sh_size']
-        for metric, size in dummy_sec_sizes.items():
-            if metric in metrics:
-                sec_sizes[metric] -= size
+    breakdown = size_breakdown(appexe)
+    for metric in metrics:
+        sec_sizes[metric] = breakdown['categories'][metric]
+    for metric, size in dummy_sec_sizes.items():
+        if metric in metrics:
+            sec_sizes[metric] -= size
 
     # Return the section (group) size
     return sec_sizes
 
 
+def benchmark_stack(bench, bd_path):
+    """Compute the worst case stack depth from main through benchmark () of
+       a benchmark, using the stack usage files written alongside its objects
+       and those of the support code.  Returns a tuple of the depth in bytes
+       (None if it can't be computed) and the set of reasons the depth is
+       only a lower bound."""
+    objfiles = sorted(glob.glob(os.path.join(bd_path, bench, '*.o')))
+    objfiles += sorted(glob.glob(os.path.join(gp['bd_supportdir'], '*.o')))
+    objfiles += sorted(glob.glob(os.path.join(gp['bd'], 'config', '*.o')))
+
+    with span('stack usage', 'stack', benchmark=bench):
+        frames, calls, partial = read_stack_objects(objfiles)
+        depth, flags = worst_case_stack(frames, calls, partial)
+    if depth is None:
+        log.warning(f'Warning: no stack usage information for {bench}')
+    elif flags:
+        log.debug(f'Stack depth of {bench} is a lower bound: '
+                  + ', '.join(sorted(flags)))
+
+    return depth, flags
+
+
+def stack_output(bench):
+    """Format the stack depth of a benchmark for output.  A trailing "+"
+       means the depth is a lower bound."""
+    depth, flags = gp['stack_data'][bench]
+    if depth is None:
+        return 'n/a'
+
+    return f'{depth}' + ('+' if flags else '')
+
+
 def get_dummy_data():
     """Get the ELF section size data for the dummy benchmark and return it."""
     if isinstance(gp['dummy_benchmark'], str):
@@ -356,6 +545,9 @@ def output_json(benchmarks, raw_totals, rel_data):
         else:
             log.info(f'      "{bench}" : {res_output},')
 
+    if gp['stack_usage']:
+        output_stack_json(benchmarks)
+
     if gp['absolute']:
         log.info('    }')
         log.info('  }')
@@ -365,10 +557,34 @@ def output_json(benchmarks, raw_totals, rel_data):
         log.info('  },')
 
 
+def output_stack_json(benchmarks):
+    """Output the stack depths in JSON format, following the detailed size
+       results."""
+    log.info('    },')
+    log.info('    "detailed stack usage" :')
+
+    for bench in benchmarks:
+        depth, flags = gp['stack_data'][bench]
+        depth_op = 'null' if depth is None else f'{depth}'
+        bounded_op = 'false' if flags else 'true'
+        res_output = f'{{ "bytes" : {depth_op}, "exact" : {bounded_op} }}'
+
+        if bench == benchmarks[0]:
+            log.info('    { ' + f'"{bench}" : {res_output},')
+        elif bench == benchmarks[-1]:
+            log.info(f'      "{bench}" : {res_output}')
+        else:
+            log.info(f'      "{bench}" : {res_output},')
+
+
 def output_text(benchmarks, raw_totals, rel_data):
     """Output the results in plain text format."""
-    log.info('Benchmark            size')
-    log.info('---------            ----')
+    if gp['stack_usage']:
+        log.info('Benchmark            size     stack')
+        log.info('---------            ----     -----')
+    else:
+        log.info('Benchmark            size')
+        log.info('---------            ----')
 
     for bench in benchmarks:
         res_output = ''
@@ -376,13 +592,20 @@ def output_text(benchmarks, raw_totals, rel_data):
             res_output = f' {raw_totals[bench]:8,}'
         else:
             res_output = f'   {rel_data[bench]:6.2f}'
-        log.info(f'{bench:15} {res_output:8}')
+        if gp['stack_usage']:
+            log.info(f'{bench:15} {res_output:8}  {stack_output(bench):>8}')
+        else:
+            log.info(f'{bench:15} {res_output:8}')
 
 
 def output_md(benchmarks, raw_totals, rel_data):
     """Output the results in MarkDown format."""
-    log.info('| Benchmark         |     Size |')
-    log.info('| :---------------- | -------: |')
+    if gp['stack_usage']:
+        log.info('| Benchmark         |     Size |    Stack |')
+        log.info('| :---------------- | -------: | -------: |')
+    else:
+        log.info('| Benchmark         |     Size |')
+        log.info('| :---------------- | -------: |')
 
     for bench in benchmarks:
         res_output = ''
@@ -391,12 +614,18 @@ def output_md(benchmarks, raw_totals, rel_data):
             res_output = f'{raw_totals[bench]:8}'
         else:
             res_output = f'{rel_data[bench]:8.2f}'
-        log.info(f'| {md_bench:17} | {res_output:8} |')
+        if gp['stack_usage']:
+            log.info(f'| {md_bench:17} | {res_output:8} | {stack_output(bench):>8} |')
+        else:
+            log.info(f'| {md_bench:17} | {res_output:8} |')
 
 
 def output_csv(benchmarks, raw_totals, rel_data):
     """Output the results in CSV format."""
-    log.info('"Benchmark","Size"')
+    if gp['stack_usage']:
+        log.info('"Benchmark","Size","Stack"')
+    else:
+        log.info('"Benchmark","Size"')
 
     for bench in benchmarks:
         res_output = ''
@@ -404,7 +633,10 @@ def output_csv(benchmarks, raw_totals, rel_data):
             res_output = f'{raw_totals[bench]:0}'
         else:
             res_output = f'{rel_data[bench]:.2f}'
-        log.info(f'"{bench}","{res_output}"')
+        if gp['stack_usage']:
+            log.info(f'"{bench}","{res_output}","{stack_output(bench)}"')
+        else:
+            log.info(f'"{bench}","{res_output}"')
 
 
 def output_baseline(benchmarks, raw_section_data):
@@ -429,6 +661,40 @@ def output_baseline(benchmarks, raw_section_data):
     log.info('}')
 
 
+def measure_benchmark(bench, dummy_section_data):
+    """Measure the sizes of the sections of a benchmark, and its stack
+       depth if wanted, reusing the journalled results if resuming.  Return
+       the section sizes, and record the stack depth in gp['stack_data']."""
+    appexe = os.path.join(gp['bd_benchdir'], bench,
+                          f"{bench}{gp['file_extension']}")
+    checkpoint = gp['checkpoint']
+    if checkpoint is not None:
+        res = checkpoint.lookup(bench, appexe)
+        if res is not None:
+            log.debug(f'Using checkpointed sizes for {bench}')
+            if gp['stack_usage']:
+                gp['stack_data'][bench] = (res['stack'][0],
+                                           set(res['stack'][1]))
+            return res['sections']
+
+    if gp['output_format'] == output_format.BASELINE:
+        sections = benchmark_size(bench, gp['bd_benchdir'], ALL_METRICS,
+                                  dummy_section_data)
+    else:
+        sections = benchmark_size(bench, gp['bd_benchdir'], gp['metric'],
+                                  dummy_section_data)
+    res = {'sections': sections}
+    if gp['stack_usage']:
+        depth, flags = benchmark_stack(bench, gp['bd_benchdir'])
+        gp['stack_data'][bench] = (depth, flags)
+        res['stack'] = [depth, sorted(flags)]
+
+    if (checkpoint is not None) and sections:
+        checkpoint.record(bench, appexe, res)
+
+    return sections
+
+
 def collect_data(benchmarks):
     """Collect and log all the raw and optionally relative data associated with
        the list of benchmarks supplied in the "benchmarks" argument. Return
@@ -455,24 +721,26 @@ def collect_data(benchmarks):
 
     successful = True
     raw_section_data = {}
+    gp['section_data'] = raw_section_data
     raw_totals = {}
     rel_data = {}
+    gp['stack_data'] = {}
 
     # Collect dummy section sizes
     dummy_section_data = get_dummy_data()
 
     # Measure each benchmark, subtracting the dummy section sizes
     for bench in benchmarks:
-        if gp['output_format'] == output_format.BASELINE:
-            raw_section_data[bench] = benchmark_size(bench, gp['bd_benchdir'],
-                                                     ALL_METRICS,
-                                                     dummy_section_data)
-        else:
-            raw_section_data[bench] = benchmark_size(bench, gp['bd_benchdir'],
-                                                     gp['metric'],
-                                                     dummy_section_data)
+        with span(f'measure {bench}', 'benchmark'):
+            raw_section_data[bench] = measure_benchmark(bench,
+                                                        dummy_section_data)
         raw_totals[bench] = sum(raw_section_data[bench].values())
 
+        # A benchmark with no sections could not be read
+        if not raw_section_data[bench]:
+            log.warning(f'Warning: unable to read {bench}, so it has no size')
+            successful = False
+
         # Calculate data relative to the baseline if needed
         if gp['absolute'] or gp['output_format'] == output_format.BASELINE:
             rel_data[bench] = {}
@@ -485,6 +753,10 @@ def collect_data(benchmarks):
             else:
                 rel_data[bench] = 0.0
 
+        if gp['output_format'] == output_format.JSONL:
+            output_result_jsonl(bench, raw_section_data[bench],
+                                raw_totals[bench], rel_data[bench])
+
     # Output it
     if gp['output_format'] == output_format.JSON:
         output_json(benchmarks, raw_totals, rel_data)
@@ -504,37 +776,164 @@ def collect_data(benchmarks):
     return [], []
 
 
-def output_stats_json(geomean, geosd, georange):
+def output_result_jsonl(bench, sections, total, rel):
+    """Output the size of benchmark "bench" as a line of JSON, or that it
+       failed if there are no "sections"."""
+    if not sections:
+        output_jsonl('result', 'size', benchmark=bench, successful=False)
+        return
+
+    fields = {'size': total, 'sections': sections}
+    if not gp['absolute']:
+        fields['relative'] = rel
+    if gp['stack_usage']:
+        depth, flags = gp['stack_data'][bench]
+        fields['stack'] = {'depth': depth, 'lower bound': sorted(flags)}
+    output_jsonl('result', 'size', benchmark=bench, successful=True,
+                 **fields)
+
+
+def sub_score_rows(sub_scores):
+    """The sub-scores as a list of (label, value) rows for output."""
+    if sub_scores is None:
+        return []
+
+    rows = []
+    if sub_scores['weighted'] is not None:
+        rows.append(('Weighted mean', sub_scores['weighted']))
+    for category, score in sub_scores['categories'].items():
+        rows.append((f'Mean of {category}', score))
+
+    return rows
+
+
+def output_stats_json(geomean, geosd, georange, sub_scores):
     """Output the stats in JSON format."""
     log.info(f'  "geomean" : {geomean:.2f},')
+    if sub_scores is not None:
+        if sub_scores['weighted'] is not None:
+            log.info(f'  "weighted geomean" : {sub_scores["weighted"]:.2f},')
+        categories = ', '.join(f'"{category}" : {score:.2f}' for category, score
+                               in sub_scores['categories'].items())
+        log.info(f'  "category geomeans" : {{ {categories} }},')
     log.info(f'  "geosd" : {geosd:.2f},')
     log.info(f'  "georange" : {georange:.2f}')
 
     log.info('}')
 
 
-def output_stats_text(geomean, geosd, georange):
+def output_stats_text(geomean, geosd, georange, sub_scores):
     """Output the stats in plain text format."""
     log.info('---------------  --------')
     log.info(f'Geometric mean   {geomean:8.2f}')
     log.info(f'Geometric s.d.   {geosd:8.2f}')
     log.info(f'Geometric range  {georange:8.2f}')
+    for label, value in sub_score_rows(sub_scores):
+        log.info(f'{label:15}  {value:8.2f}')
 
 
-def output_stats_md(geomean, geosd, georange):
+def output_stats_md(geomean, geosd, georange, sub_scores):
     """Output the stats in MarkDown format."""
     log.info('|                   |          |')
     log.info(f'| Geometric mean    | {geomean:8.2f} |')
     log.info(f'| Geometric s.d.    | {geosd:8.2f} |')
     log.info(f'| Geometric range   | {georange:8.2f} |')
+    for label, value in sub_score_rows(sub_scores):
+        log.info(f'| {label:17} | {value:8.2f} |')
 
 
-def output_stats_csv(geomean, geosd, georange):
+def output_stats_csv(geomean, geosd, georange, sub_scores):
     """Output the stats in CSV format."""
     log.info('"",""')
     log.info(f'"Geometric mean","{geomean:.2f}"')
     log.info(f'"Geometric s.d.","{geosd:.2f}"')
     log.info(f'"Geometric range","{georange:.2f}"')
+    for label, value in sub_score_rows(sub_scores):
+        log.info(f'"{label}","{value:.2f}"')
+
+
+def measure(benchmarks, args):
+    """Measure the size of "benchmarks", given the validated arguments
+       "args", outputting the results of the benchmarks in
+       gp['output_format'], if any.  Return a Results object."""
+    raw_data, rel_data = collect_data(benchmarks)
+    if gp['size_cache'] is not None:
+        gp['size_cache'].save()
+
+    details = {}
+    for bench in raw_data:
+        details[bench] = {'sections': gp['section_data'][bench]}
+        if gp['stack_usage']:
+            depth, flags = gp['stack_data'][bench]
+            details[bench]['stack'] = {'depth': depth,
+                                       'lower bound': sorted(flags)}
+    results = Results('size', list(raw_data), raw_data or {},
+                      rel_data if not gp['absolute'] else {}, details,
+                      bool(raw_data))
+
+    # We can't compute geometric SD on the fly, so we need to collect all the
+    # data and then process it in two passes. We could do the first processing
+    # as we collect the data, but it is clearer to do the three things
+    # separately. Given the size of datasets with which we are concerned the
+    # compute overhead is not significant.
+    if raw_data:
+        if gp['history']:
+            metric = (ALL_METRICS if gp['output_format'] == output_format.BASELINE
+                      else gp['metric'])
+            with span('record history', 'history'):
+                record_run(gp['history'], 'size', gp['bd'], {'metric': metric},
+                           {bench: (raw_data[bench], rel_data[bench] or None)
+                            for bench in benchmarks},
+                           arguments=args)
+        if gp['output_format'] != output_format.BASELINE:
+            with span('statistics', 'stats'):
+                results.geomean, results.geosd, results.georange = (
+                    embench_stats(benchmarks, raw_data, rel_data))
+                if gp['benchmark_info'] is not None:
+                    results.extra['sub scores'] = embench_sub_scores(
+                        benchmarks, raw_data, rel_data, gp['benchmark_info'])
+
+    return results
+
+
+def measure_size(builddir, benchmarks=None, **options):
+    """Measure the size of the benchmarks in "builddir", for use from other
+       Python programs.  "benchmarks" lists the benchmarks to measure, by
+       default all of them.  "options" gives the value of any other argument,
+       named as in the namespace of arguments (for example
+       metric=['text', 'data'] or absolute=True).  Unspecified arguments take
+       their usual defaults, except that nothing is output, recorded in the
+       history or journalled unless "output_format", "history" or
+       "checkpoint" is given.  Logging is left as the caller has set it up.
+       Return a Results object.  Raise ValueError if the arguments are not
+       valid, or RuntimeError if the binaries can't be measured."""
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    args = build_parser().parse_args([])
+    args.builddir = builddir
+    args.history = False
+    args.checkpoint = False
+    for name, value in options.items():
+        if name not in vars(args):
+            raise TypeError(f'measure_size () got an unexpected option {name}')
+        setattr(args, name, value)
+
+    try:
+        validate_args(args)
+    except SystemExit:
+        raise ValueError('Invalid arguments to measure_size (): see the log '
+                         + 'for details') from None
+    gp['output_format'] = args.output_format
+
+    try:
+        if benchmarks is None:
+            benchmarks = find_benchmarks()
+        else:
+            setup_benchmark_dirs()
+        return measure(benchmarks, args)
+    except SystemExit:
+        raise RuntimeError('Unable to measure size: see the log for '
+                           + 'details') from None
 
 
 def main():
@@ -550,35 +949,48 @@ def main():
     # Establish logging
     setup_logging(args.logdir, 'size')
     log_args(args)
+    if args.trace:
+        start_trace(args.trace, 'benchmark_size')
 
     # Check args are OK (have to have logging and build directory set up first)
     validate_args(args)
 
     # Find the benchmarks
-    benchmarks = find_benchmarks()
+    with span('find benchmarks', 'setup'):
+        benchmarks = find_benchmarks()
     log_benchmarks(benchmarks)
 
     # Collect the size data for the benchmarks
-    raw_data, rel_data = collect_data(benchmarks)
+    results = measure(benchmarks, args)
 
-    # We can't compute geometric SD on the fly, so we need to collect all the
-    # data and then process it in two passes. We could do the first processing
-    # as we collect the data, but it is clearer to do the three things
-    # separately. Given the size of datasets with which we are concerned the
-    # compute overhead is not significant.
-    if raw_data:
+    if results.successful:
+        geomean = results.geomean
+        geosd = results.geosd
+        georange = results.georange
+        sub_scores = results.extra.get('sub scores')
         if not gp['absolute']:
-            geomean, geosd, georange = embench_stats(benchmarks, raw_data,
-                                                     rel_data)
             if gp['output_format'] == output_format.JSON:
-                output_stats_json(geomean, geosd, georange)
+                output_stats_json(geomean, geosd, georange, sub_scores)
             elif gp['output_format'] == output_format.TEXT:
-                output_stats_text(geomean, geosd, georange)
+                output_stats_text(geomean, geosd, georange, sub_scores)
             elif gp['output_format'] == output_format.MD:
-                output_stats_md(geomean, geosd, georange)
+                output_stats_md(geomean, geosd, georange, sub_scores)
             elif gp['output_format'] == output_format.CSV:
-                output_stats_csv(geomean, geosd, georange)
+                output_stats_csv(geomean, geosd, georange, sub_scores)
+            elif gp['output_format'] == output_format.JSONL:
+                fields = {'geometric mean': geomean,
+                          'geometric standard deviation': geosd,
+                          'geometric range': georange}
+                if sub_scores is not None:
+                    fields['weighted geometric mean'] = sub_scores['weighted']
+                    fields['category geometric means'] = (
+                        sub_scores['categories'])
+                output_jsonl('summary', 'size', successful=True, **fields)
+        elif gp['output_format'] == output_format.JSONL:
+            output_jsonl('summary', 'size', successful=True)
     else:
+        if gp['output_format'] == output_format.JSONL:
+            output_jsonl('summary', 'size', successful=False)
         log.info('ERROR: Failed to compute size benchmarks')
         sys.exit(1)
 
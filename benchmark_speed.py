@@ -17,14 +17,21 @@ Benchmark speed.
 
 This version is suitable when using a version of GDB which can launch a GDB
 server to use as a target.
+
+The script may also be imported, and measure_speed () called to measure the
+speed of a build directory and return the results, without any output.
 """
 
 import argparse
 import importlib
+import math
 import os
 import sys
 import platform
+import random
+import statistics
 
+from json import dumps
 from json import loads
 
 sys.path.append(
@@ -37,13 +44,41 @@ from embench_core import gp
 from embench_core import setup_logging
 from embench_core import log_args
 from embench_core import find_benchmarks
+from embench_core import setup_benchmark_dirs
 from embench_core import log_benchmarks
 from embench_core import embench_stats
+from embench_core import embench_sub_scores
+from embench_core import read_benchmark_info
 from embench_core import output_format
-
-
-def get_common_args():
-    """Build a parser for all the arguments"""
+from embench_core import Results
+from embench_cache import FileResultCache
+from embench_checkpoint import Checkpoint
+from embench_bootstrap import BOOTSTRAP_CONFIDENCE
+from embench_bootstrap import BOOTSTRAP_RESAMPLES
+from embench_bootstrap import geomean_interval
+from embench_bootstrap import ratio_interval
+from embench_bootstrap import rank_sum_test
+from embench_history import HISTORY_FILE
+from embench_history import record_run
+from embench_report import output_jsonl
+from embench_trace import span
+from embench_trace import start_trace
+
+# The file in the build directory holding previous speed results, and the
+# version of its format.
+SPEED_CACHE_FILE = '.embench-speed-cache.json'
+SPEED_CACHE_VERSION = 1
+
+# The default journal of completed results in the build directory
+SPEED_CHECKPOINT_FILE = '.embench-speed-checkpoint.jsonl'
+
+# The default number of runs of each build in an A/B comparison
+AB_REPEAT = 10
+
+
+def get_common_args(argv=None):
+    """Build a parser for all the arguments and parse "argv" (by default
+       the command line)"""
     parser = argparse.ArgumentParser(description='Compute the size benchmark')
 
     parser.add_argument(
@@ -110,6 +145,14 @@ def get_common_args():
         const=output_format.BASELINE,
         help='Specify to output in a format suitable for use as a baseline'
     )
+    parser.add_argument(
+        '--jsonl',
+        dest='output_format',
+        action='store_const',
+        const=output_format.JSONL,
+        help='Specify to output a line of JSON for each benchmark as soon as '
+        + 'it has run, followed by a summary',
+    )
     parser.add_argument(
         '--json-comma',
         action='store_true',
@@ -145,14 +188,130 @@ def get_common_args():
         default=1,
         help='Global scale factor for benchmarks'
     )
+    parser.add_argument(
+        '--gsf-file',
+        type=str,
+        default=None,
+        help='JSON file of the global scale factors of individual benchmarks, '
+        + 'as written by benchmark_calibrate.py, overriding --gsf'
+    )
     parser.add_argument(
         '--cpu-mhz',
         type=int,
         default=16,
         help='Processor clock speed in MHz'
     )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Specify to reuse the results of previous runs for executables '
+        + 'which have not changed, and only run the rest',
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='Specify to run every benchmark (the default)',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=None,
+        help='Number of runs of each benchmark, of which the median is '
+        + f'reported (default 1, or {AB_REPEAT} with --ab)',
+    )
+    parser.add_argument(
+        '--confidence',
+        type=float,
+        default=BOOTSTRAP_CONFIDENCE,
+        help='Confidence level of the intervals estimated from repeated '
+        + f'runs (default {BOOTSTRAP_CONFIDENCE})',
+    )
+    parser.add_argument(
+        '--resamples',
+        type=int,
+        default=BOOTSTRAP_RESAMPLES,
+        help='Number of bootstrap resamples used to estimate confidence '
+        + f'intervals (default {BOOTSTRAP_RESAMPLES})',
+    )
+    parser.add_argument(
+        '--save-samples',
+        type=str,
+        default=None,
+        help='JSON file in which to save the time of every run',
+    )
+    parser.add_argument(
+        '--compare-samples',
+        type=str,
+        default=None,
+        help='JSON file of the times of an earlier run, saved with '
+        + '--save-samples, against which to compare speed',
+    )
+    parser.add_argument(
+        '--ab',
+        type=str,
+        nargs=2,
+        default=None,
+        metavar=('BUILD_A', 'BUILD_B'),
+        help='Compare the speed of two build directories, alternating runs '
+        + 'of each benchmark from them in random order',
+    )
+    parser.add_argument(
+        '--history',
+        type=str,
+        default=None,
+        help='SQLite database in which to record the results (default '
+        + f'{HISTORY_FILE} in the log directory)',
+    )
+    parser.add_argument(
+        '--no-history',
+        dest='history',
+        action='store_false',
+        help='Specify to not record the results',
+    )
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        default=None,
+        help='File in which to journal the result of each benchmark as it '
+        + f'completes (default {SPEED_CHECKPOINT_FILE} in the build '
+        + 'directory)',
+    )
+    parser.add_argument(
+        '--no-checkpoint',
+        dest='checkpoint',
+        action='store_false',
+        help='Specify to not journal the results',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Specify to reuse the journalled results of an interrupted run '
+        + 'with the same arguments, and only run the remaining benchmarks',
+    )
+    parser.add_argument(
+        '--sub-scores',
+        action='store_true',
+        help='Specify to also report the weighted geometric mean and the '
+        + 'geometric mean of each category of benchmark',
+    )
+    parser.add_argument(
+        '--benchmark-info',
+        type=str,
+        default=None,
+        help='JSON file of the category and weight of each benchmark for '
+        + '--sub-scores, which it implies (default benchmarks.json in the '
+        + 'baseline directory)',
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        help='File in which to write a timeline of the run, in Chrome trace '
+        + 'event format',
+    )
 
-    return parser.parse_known_args()
+    return parser.parse_known_args(argv)
 
 
 def validate_args(args):
@@ -162,13 +321,22 @@ def validate_args(args):
        Update the gp dictionary with all the useful info"""
     gp['bd'] = args.builddir if os.path.isabs(args.builddir) else os.path.join(gp['rootdir'], args.builddir)
 
-    if not os.path.isdir(gp['bd']):
-        log.error(f'ERROR: build directory {gp["bd"]} not found: exiting')
-        sys.exit(1)
+    if args.ab:
+        gp['ab_dirs'] = [bd if os.path.isabs(bd)
+                         else os.path.join(gp['rootdir'], bd)
+                         for bd in args.ab]
+        gp['bd'] = gp['ab_dirs'][0]
+    else:
+        gp['ab_dirs'] = None
 
-    if not os.access(gp['bd'], os.R_OK):
-        log.error(f'ERROR: Unable to read build directory {gp["bd"]}: exiting')
-        sys.exit(1)
+    for bd in gp['ab_dirs'] or [gp['bd']]:
+        if not os.path.isdir(bd):
+            log.error(f'ERROR: build directory {bd} not found: exiting')
+            sys.exit(1)
+
+        if not os.access(bd, os.R_OK):
+            log.error(f'ERROR: Unable to read build directory {bd}: exiting')
+            sys.exit(1)
 
     gp['baseline_dir'] = args.baselinedir if os.path.isabs(args.baselinedir) else os.path.join(gp['rootdir'], args.baselinedir)
 
@@ -180,6 +348,64 @@ def validate_args(args):
 
     gp['timeout'] = args.timeout
 
+    gp['bench_gsf'] = {}
+    if args.gsf_file:
+        try:
+            with open(args.gsf_file) as fileh:
+                gp['bench_gsf'] = loads(fileh.read())
+        except (OSError, ValueError) as error:
+            log.error(f'ERROR: Unable to read scale factors {args.gsf_file}: '
+                      + f'{error}: exiting')
+            sys.exit(1)
+
+    if args.repeat is None:
+        args.repeat = AB_REPEAT if args.ab else 1
+    if (args.repeat < 1) or (args.resamples < 1):
+        log.error('ERROR: --repeat and --resamples must be positive: exiting')
+        sys.exit(1)
+    if not 0.0 < args.confidence < 1.0:
+        log.error('ERROR: --confidence must be between 0 and 1: exiting')
+        sys.exit(1)
+
+    gp['compare_samples'] = None
+    if args.compare_samples:
+        try:
+            with open(args.compare_samples) as fileh:
+                gp['compare_samples'] = loads(fileh.read())['speed samples']
+        except (OSError, ValueError, KeyError) as error:
+            log.error(f'ERROR: Unable to read samples {args.compare_samples}: '
+                      + f'{error}: exiting')
+            sys.exit(1)
+
+    if args.history is False:
+        gp['history'] = None
+    elif args.history:
+        gp['history'] = args.history
+    else:
+        gp['history'] = os.path.join(os.path.abspath(args.logdir),
+                                     HISTORY_FILE)
+
+    if args.checkpoint is False:
+        if args.resume:
+            log.error('ERROR: --resume needs a checkpoint: exiting')
+            sys.exit(1)
+        gp['checkpoint_file'] = None
+    elif args.checkpoint:
+        gp['checkpoint_file'] = args.checkpoint
+    else:
+        gp['checkpoint_file'] = os.path.join(gp['bd'], SPEED_CHECKPOINT_FILE)
+
+    gp['benchmark_info'] = None
+    if args.sub_scores or args.benchmark_info:
+        info_file = args.benchmark_info or os.path.join(gp['baseline_dir'],
+                                                        'benchmarks.json')
+        try:
+            gp['benchmark_info'] = read_benchmark_info(info_file)
+        except (OSError, ValueError) as error:
+            log.error('ERROR: Unable to read benchmark information '
+                      + f'{info_file}: {error}: exiting')
+            sys.exit(1)
+
     if args.file_extension is None:
         gp['file_extension'] = '.exe' if platform.system() == 'Windows' else ''
     else:
@@ -196,25 +422,103 @@ def validate_args(args):
     globals()['get_target_args'] = newmodule.get_target_args
     globals()['run_benchmark'] = newmodule.run_benchmark
 
+    if args.cache:
+        gp['speed_cache'] = FileResultCache(
+            os.path.join(gp['bd'], SPEED_CACHE_FILE), SPEED_CACHE_VERSION)
+    else:
+        gp['speed_cache'] = None
+
+
+def speed_cache_key(args):
+    """The arguments on which a speed result depends: the target module
+       and its arguments, the global scale factor, the clock speed and the
+       number of runs."""
+    key = {arg: val for arg, val in sorted(vars(args).items())
+           if arg not in ('builddir', 'logdir', 'baselinedir', 'absolute',
+                          'output_format', 'json_comma', 'timeout',
+                          'file_extension', 'cache', 'confidence',
+                          'resamples', 'save_samples', 'compare_samples',
+                          'history', 'checkpoint', 'resume', 'trace',
+                          'sub_scores', 'benchmark_info')}
+    return dumps(key, default=str)
+
+
+def run_repeated(bench, appexe, args):
+    """Run the benchmark "args.repeat" times.  Return a dictionary with the
+       median time as "time", the times of all the runs as "samples", any
+       heap usage statistics as "heap" and any multi-copy results as "rate",
+       or None if any run failed."""
+    samples = []
+    heap = None
+    rate = None
+    for run in range(args.repeat):
+        with span(f'run {run + 1}', 'speed', benchmark=bench) as fields:
+            res = run_benchmark(bench, appexe, args)
+            fields['result'] = res
+        if not res:
+            return None
+        if isinstance(res, dict):
+            heap = res.get('heap')
+            rate = res.get('rate')
+            res = res['time']
+        samples.append(float(res))
+
+    res = {'time': statistics.median(samples), 'samples': samples}
+    if heap is not None:
+        res['heap'] = heap
+    if rate is not None:
+        res['rate'] = rate
+    return res
+
 
 def benchmark_speed(bench, args):
     """Time the benchmark.  "args" is a namespace of arguments, including
        those specific to the target.  Result is a time in milliseconds, or
-       zero on failure."""
+       zero on failure.
+
+       The target's run_benchmark may return a dictionary instead of a time,
+       with the time as "time", any heap usage statistics as "heap", which
+       are recorded in gp['heap_data'], and the results of running several
+       copies at once as "rate", which are recorded in gp['rate_data'].  The
+       times of all the runs are recorded in gp['speed_samples']."""
     appdir = os.path.join(gp['bd_benchdir'], bench)
     appexe = os.path.join(appdir,f"{bench}{gp['file_extension']}")
 
     res = None
+    cache = gp['speed_cache']
+    checkpoint = gp['checkpoint']
     if os.path.isfile(appexe):
-        res = run_benchmark(bench, appexe, args)
+        if checkpoint is not None:
+            res = checkpoint.lookup(bench, appexe)
+            if res is not None:
+                log.debug(f'Using checkpointed speed for {bench}')
+                checkpoint = None
+        if (res is None) and (cache is not None):
+            res = cache.lookup(appexe, speed_cache_key(args))
+            if res is not None:
+                log.debug(f'Using cached speed for {bench}')
         if res is None:
-            log.warning(f'Warning: Run of {bench} failed.')
+            res = run_repeated(bench, appexe, args)
+            if res is None:
+                log.warning(f'Warning: Run of {bench} failed.')
+            elif cache is not None:
+                cache.store(appexe, res, speed_cache_key(args))
+        if (res is not None) and (checkpoint is not None):
+            checkpoint.record(bench, appexe, res)
     else:
         log.warning(f'Warning: {bench} executable not found.')
 
     if res is None:
         print ('failed')
         return 0
+    if isinstance(res, dict):
+        if 'heap' in res:
+            gp['heap_data'][bench] = res['heap']
+        if 'rate' in res:
+            gp['rate_data'][bench] = res['rate']
+        gp['speed_samples'][bench] = res.get('samples', [res['time']])
+        return res['time']
+    gp['speed_samples'][bench] = [res]
     return res
 
 def run_benchmarks(benchmarks, args):
@@ -228,8 +532,14 @@ def run_benchmarks(benchmarks, args):
     raw_data = {}
 
     # Run the benchmarks
+    gp['heap_data'] = {}
+    gp['rate_data'] = {}
+    gp['speed_samples'] = {}
     for bench in benchmarks:
-        raw_data[bench] = float(benchmark_speed(bench, args))
+        with span(f'measure {bench}', 'benchmark'):
+            raw_data[bench] = float(benchmark_speed(bench, args))
+        if gp['output_format'] == output_format.JSONL:
+            output_result_jsonl(bench, raw_data[bench], args)
 
     # Delete the benchmark if it didn't succeed, record it if it did.
     for bench in benchmarks:
@@ -242,10 +552,32 @@ def run_benchmarks(benchmarks, args):
 
     return successful, benchmarks_run, raw_data
 
+def output_result_jsonl(bench, ms, args):
+    """Output the result of benchmark "bench", which took "ms"
+       milliseconds or zero if it failed, as a line of JSON."""
+    if ms == 0.0:
+        output_jsonl('result', 'speed', benchmark=bench, successful=False)
+        return
+
+    fields = {'time': ms}
+    if not gp['absolute']:
+        rel = compute_rel([bench], {bench: ms}, args)[bench]
+        fields['relative'] = rel
+        fields['relative per MHz'] = rel / args.cpu_mhz
+    if args.repeat > 1:
+        fields['samples'] = gp['speed_samples'][bench]
+    if bench in gp['heap_data']:
+        fields['heap'] = gp['heap_data'][bench]
+    if bench in gp['rate_data']:
+        fields['rate'] = gp['rate_data'][bench]
+    output_jsonl('result', 'speed', benchmark=bench, successful=True,
+                 **fields)
+
+
 def compute_rel(benchmarks_run, raw_data, args):
     """Generate relative speed data.  Return a dictionary of relative
        scores.  In this case, we need to scale the raw scores by the scaling
-       factor"""
+       factor, which may differ for each benchmark"""
     rel_data = {}
 
     # Get the baseline data
@@ -255,7 +587,8 @@ def compute_rel(benchmarks_run, raw_data, args):
 
     # We know there must be data
     for bench in benchmarks_run:
-        rel_data[bench] = baseline[bench] / raw_data[bench] * args.gsf
+        gsf = gp['bench_gsf'].get(bench, args.gsf)
+        rel_data[bench] = baseline[bench] / raw_data[bench] * gsf
 
     return rel_data
 
@@ -276,60 +609,159 @@ def output_json(benchmarks_run, raw_data, rel_data, args):
             log.info(f'      "{bench}" : {output},')
     log.info('    },')
 
+    if gp['heap_data']:
+        output_heap_json(benchmarks_run)
+    if gp['rate_data']:
+        output_rate_json(benchmarks_run)
+
+def heap_output(bench):
+    """Format the peak heap usage and number of allocations of a benchmark
+       for output, as a tuple of strings."""
+    heap = gp['heap_data'].get(bench)
+    if heap is None:
+        return 'n/a', 'n/a'
+    return f'{heap["peak"]}', f'{heap["allocs"]}'
+
+def output_heap_json(benchmarks_run):
+    """Output the heap usage in JSON format, following the detailed speed
+       results."""
+    log.info('    "detailed heap usage" :')
+
+    for bench in benchmarks_run:
+        heap = gp['heap_data'].get(bench)
+        if heap is None:
+            output = 'null'
+        else:
+            histogram = ', '.join(f'{n}' for n in heap['histogram'])
+            output = (f'{{ "peak" : {heap["peak"]}, '
+                      + f'"allocs" : {heap["allocs"]}, '
+                      + f'"failed" : {heap["failed"]}, '
+                      + f'"histogram" : [ {histogram} ] }}')
+
+        if bench == benchmarks_run[0]:
+            log.info(f'    {{ "{bench}" : {output},')
+        elif bench == benchmarks_run[-1]:
+            log.info(f'      "{bench}" : {output}')
+        else:
+            log.info(f'      "{bench}" : {output},')
+    log.info('    },')
+
+def rate_output(bench):
+    """Format the scaling efficiency of a benchmark run as several copies
+       at once for output."""
+    rate = gp['rate_data'].get(bench)
+    if rate is None:
+        return 'n/a'
+    return f'{rate["efficiency"]:.2f}'
+
+def output_rate_json(benchmarks_run):
+    """Output the results of running several copies at once in JSON
+       format, following the detailed speed results."""
+    log.info('    "detailed rate results" :')
+
+    for bench in benchmarks_run:
+        rate = gp['rate_data'].get(bench)
+        if rate is None:
+            output = 'null'
+        else:
+            output = (f'{{ "copies" : {rate["copies"]}, '
+                      + f'"single time" : {rate["single time"]:.3f}, '
+                      + f'"time" : {rate["time"]:.3f}, '
+                      + f'"efficiency" : {rate["efficiency"]:.2f} }}')
+
+        if bench == benchmarks_run[0]:
+            log.info(f'    {{ "{bench}" : {output},')
+        elif bench == benchmarks_run[-1]:
+            log.info(f'      "{bench}" : {output}')
+        else:
+            log.info(f'      "{bench}" : {output},')
+    log.info('    },')
+
 def output_text (benchmarks_run, raw_data, rel_data, args):
     """Output the data table in plain text format.  We are given a list of
        benchmarks for which we have data"""
+    heap_hdr = '      Heap    Allocs' if gp['heap_data'] else ''
+    heap_sep = '      ----    ------' if gp['heap_data'] else ''
+    if gp['rate_data']:
+        heap_hdr += '   Scaling'
+        heap_sep += '   -------'
     if gp['absolute']:
-        log.info('Benchmark           Speed')
-        log.info('---------           -----')
+        log.info('Benchmark           Speed' + heap_hdr)
+        log.info('---------           -----' + heap_sep)
     else:
-        log.info('Benchmark           Speed Speed/MHz')
-        log.info('---------           ----- ---------')
+        log.info('Benchmark           Speed Speed/MHz' + heap_hdr)
+        log.info('---------           ----- ---------' + heap_sep)
 
     for bench in benchmarks_run:
+        heap_op = ''
+        if gp['heap_data']:
+            peak, allocs = heap_output(bench)
+            heap_op = f'  {peak:>8}  {allocs:>8}'
+        if gp['rate_data']:
+            heap_op += f'  {rate_output(bench):>8}'
         if gp['absolute']:
             output = f'{round(raw_data[bench]):8,}'
-            log.info(f'{bench:15}  {output:8}')
+            log.info(f'{bench:15}  {output:8}{heap_op}')
         else:
             rel_per_mhz = rel_data[bench] / args.cpu_mhz
             output1 = f'  {rel_data[bench]:6.2f}'
             output2 = f'  {rel_per_mhz:6.2f}'
-            log.info(f'{bench:15}  {output1:8}  {output2:8}')
+            log.info(f'{bench:15}  {output1:8}  {output2:8}{heap_op}')
 
 def output_md (benchmarks_run, raw_data, rel_data, args):
     """Output the data table in Markdown format.  We are given a list of
        benchmarks for which we have data"""
+    heap_hdr = '       Heap |     Allocs |' if gp['heap_data'] else ''
+    heap_sep = ' ---------: | ---------: |' if gp['heap_data'] else ''
+    if gp['rate_data']:
+        heap_hdr += '    Scaling |'
+        heap_sep += ' ---------: |'
     if gp['absolute']:
-        log.info('| Benchmark       |      Speed |')
-        log.info('| :-------------- | ---------: |')
+        log.info('| Benchmark       |      Speed |' + heap_hdr)
+        log.info('| :-------------- | ---------: |' + heap_sep)
     else:
-        log.info('| Benchmark       |      Speed |  Speed/MHz |')
-        log.info('| :-------------- | ---------: | ---------: |')
+        log.info('| Benchmark       |      Speed |  Speed/MHz |' + heap_hdr)
+        log.info('| :-------------- | ---------: | ---------: |' + heap_sep)
 
     for bench in benchmarks_run:
+        heap_op = ''
+        if gp['heap_data']:
+            peak, allocs = heap_output(bench)
+            heap_op = f'   {peak:>8} |   {allocs:>8} |'
+        if gp['rate_data']:
+            heap_op += f'   {rate_output(bench):>8} |'
         if gp['absolute']:
             output = f'{round(raw_data[bench]):8,}'
-            log.info(f'| {bench:15} |   {output:8} |')
+            log.info(f'| {bench:15} |   {output:8} |{heap_op}')
         else:
             rel_per_mhz = rel_data[bench] / args.cpu_mhz
             output1 = f'  {rel_data[bench]:6.2f}'
             output2 = f'  {rel_per_mhz:6.2f}'
-            log.info(f'| {bench:15} |   {output1:8} |   {output2:8} |')
+            log.info(f'| {bench:15} |   {output1:8} |   {output2:8} |{heap_op}')
 
 def output_csv (benchmarks_run, raw_data, rel_data, args):
     """Output the data table in CSV format.  We are given a list of
        benchmarks for which we have data"""
+    heap_hdr = ',"Heap","Allocs"' if gp['heap_data'] else ''
+    if gp['rate_data']:
+        heap_hdr += ',"Scaling"'
     if gp['absolute']:
-        log.info('"Benchmark","Speed"')
+        log.info('"Benchmark","Speed"' + heap_hdr)
     else:
-        log.info('"Benchmark","Speed","Speed/MHz"')
+        log.info('"Benchmark","Speed","Speed/MHz"' + heap_hdr)
 
     for bench in benchmarks_run:
+        heap_op = ''
+        if gp['heap_data']:
+            peak, allocs = heap_output(bench)
+            heap_op = f',"{peak}","{allocs}"'
+        if gp['rate_data']:
+            heap_op += f',"{rate_output(bench)}"'
         if gp['absolute']:
-            log.info(f'"{bench}","{round(raw_data[bench])}"')
+            log.info(f'"{bench}","{round(raw_data[bench])}"{heap_op}')
         else:
             rel_per_mhz = rel_data[bench] / args.cpu_mhz
-            log.info(f'"{bench}","{rel_data[bench]:.2f}","{rel_per_mhz:.2f}"')
+            log.info(f'"{bench}","{rel_data[bench]:.2f}","{rel_per_mhz:.2f}"{heap_op}')
 
 def output_baseline(benchmarks_run, raw_data):
     """Output the data table in a JSON format for use as the baseline table.
@@ -359,7 +791,7 @@ def collect_data(benchmarks, args):
     # Baseline data is held external to the script. Import it here if we are
     # doing relative output and then generate the relative data
     if not gp['absolute']:
-        rel_data = compute_rel(benchmarks, raw_data, args)
+        rel_data = compute_rel(benchmarks_run, raw_data, args)
     else:
         rel_data = {}
 
@@ -382,7 +814,131 @@ def collect_data(benchmarks, args):
     return [], []
 
 
-def output_stats_json(geomean, geosd, georange, args):
+def normalized_samples(benchmarks, args):
+    """The times of the runs of each benchmark, divided by its scale factor
+       so that runs with different scale factors can be compared."""
+    return {bench: [ms / gp['bench_gsf'].get(bench, args.gsf)
+                    for ms in gp['speed_samples'][bench]]
+            for bench in benchmarks}
+
+
+def save_samples(benchmarks, args):
+    """Save the normalized times of all the runs to "args.save_samples", for
+       comparison with a later run."""
+    try:
+        with open(args.save_samples, 'w') as fileh:
+            fileh.write(dumps(
+                {'speed samples': normalized_samples(benchmarks, args)},
+                indent=2) + '\n')
+    except OSError as error:
+        log.warning(f'Warning: Unable to save samples to {args.save_samples}: '
+                    + f'{error}')
+
+
+def history_config(args):
+    """How the speed was measured, for the history: the target module and
+       its arguments.  The results recorded are normalized by the scale
+       factor, so it and the clock speed do not matter."""
+    config = loads(speed_cache_key(args))
+    for arg in ('gsf', 'gsf_file', 'cpu_mhz', 'repeat', 'ab'):
+        config.pop(arg, None)
+    return config
+
+
+def record_history(benchmarks, rel_data, args):
+    """Record the results in the history database."""
+    samples = normalized_samples(benchmarks, args)
+    record_run(gp['history'], 'speed', gp['bd'], history_config(args),
+               {bench: (statistics.median(samples[bench]), rel_data.get(bench))
+                for bench in benchmarks},
+               samples if args.repeat > 1 else None, args)
+
+
+def compute_intervals(benchmarks, raw_data, rel_data, args):
+    """Estimate confidence intervals by bootstrapping.  Return a dictionary
+       with the interval of the geometric mean as "mean" if each benchmark
+       was run more than once, and the ratio of the speed to that of the
+       samples being compared against, with its interval, as "ratio"."""
+    intervals = {}
+
+    if args.repeat > 1:
+        if gp['absolute']:
+            values = {bench: gp['speed_samples'][bench] for bench in benchmarks}
+        else:
+            # Relative speed is inversely proportional to the time
+            values = {bench: [rel_data[bench] * raw_data[bench] / ms
+                              for ms in gp['speed_samples'][bench]]
+                      for bench in benchmarks}
+        intervals['mean'] = geomean_interval(values, args.confidence,
+                                             args.resamples)
+
+    if gp['compare_samples'] is not None:
+        if any(bench in gp['compare_samples'] for bench in benchmarks):
+            # The earlier times over the current times is the speed ratio
+            intervals['ratio'] = ratio_interval(
+                gp['compare_samples'], normalized_samples(benchmarks, args),
+                args.confidence, args.resamples)
+        else:
+            log.warning('Warning: No benchmarks in common with the samples '
+                        + 'being compared against')
+
+    return intervals
+
+
+def interval_rows(intervals, args):
+    """The confidence intervals as a list of (label, value) rows for
+       output."""
+    rows = []
+    level = f'{args.confidence * 100:g}%'
+
+    if 'mean' in intervals:
+        low, high = intervals['mean']
+        if gp['absolute']:
+            rows.append((f'{level} CI of mean', f'{int(low):,} - {int(high):,}'))
+        else:
+            rows.append((f'{level} CI of mean', f'{low:.2f} - {high:.2f}'))
+    if 'ratio' in intervals:
+        ratio, low, high = intervals['ratio']
+        rows.append(('Speed ratio', f'{ratio:.3f}'))
+        rows.append((f'{level} CI of ratio', f'{low:.3f} - {high:.3f}'))
+
+    return rows
+
+
+def scaling_efficiency():
+    """The geometric mean of the scaling efficiency of the benchmarks run
+       as several copies at once, or None if they were not."""
+    if not gp['rate_data']:
+        return None
+    lnsum = sum(math.log(rate['efficiency'])
+                for rate in gp['rate_data'].values())
+    return math.exp(lnsum / len(gp['rate_data']))
+
+
+def rate_rows():
+    """The scaling efficiency as a list of (label, value) rows for
+       output."""
+    efficiency = scaling_efficiency()
+    if efficiency is None:
+        return []
+    return [('Scaling efficiency', f'{efficiency:.2f}')]
+
+
+def sub_score_rows(sub_scores):
+    """The sub-scores as a list of (label, value) rows for output."""
+    if sub_scores is None:
+        return []
+
+    rows = []
+    if sub_scores['weighted'] is not None:
+        rows.append(('Weighted mean', sub_scores['weighted']))
+    for category, score in sub_scores['categories'].items():
+        rows.append((f'Mean of {category}', score))
+
+    return rows
+
+
+def output_stats_json(geomean, geosd, georange, intervals, sub_scores, args):
     """Output the statistical summary in JSON format.
 
        Note that we manually generate the JSON output, rather than using the
@@ -401,12 +957,37 @@ def output_stats_json(geomean, geosd, georange, args):
 
     # Output the results
     log.info(f'    "speed geometric mean" : {geomean_op},')
+    if 'mean' in intervals:
+        low, high = intervals['mean']
+        if gp['absolute']:
+            log.info('    "speed geometric mean confidence interval" : '
+                     + f'[ {round(low)}, {round(high)} ],')
+        else:
+            log.info('    "speed geometric mean confidence interval" : '
+                     + f'[ {low:.2f}, {high:.2f} ],')
+    if 'ratio' in intervals:
+        ratio, low, high = intervals['ratio']
+        log.info(f'    "speed ratio" : {ratio:.3f},')
+        log.info('    "speed ratio confidence interval" : '
+                 + f'[ {low:.3f}, {high:.3f} ],')
+    if sub_scores is not None:
+        fmt = '{:.0f}' if gp['absolute'] else '{:.2f}'
+        if sub_scores['weighted'] is not None:
+            log.info('    "speed weighted geometric mean" : '
+                     + fmt.format(sub_scores['weighted']) + ',')
+        categories = ', '.join(f'"{category}" : ' + fmt.format(score)
+                               for category, score
+                               in sub_scores['categories'].items())
+        log.info(f'    "speed category geometric means" : {{ {categories} }},')
+    if gp['rate_data']:
+        log.info('    "speed scaling efficiency" : '
+                 + f'{scaling_efficiency():.2f},')
     log.info(f'    "speed geometric standard deviation" : {geosd_op}')
     log.info(f'    "speed geometric range" : {georange_op}')
     log.info('  }' + f'{opt_comma}')
 
 
-def output_stats_text(geomean, geosd, georange, args):
+def output_stats_text(geomean, geosd, georange, intervals, sub_scores, args):
     """Output the statistical summary in plain text format."""
 
     if gp['absolute']:
@@ -435,9 +1016,18 @@ def output_stats_text(geomean, geosd, georange, args):
         log.info(f'Geometric SD     {geosd_op}  {geosd_mhz_op}')
         log.info(f'Geometric range  {georange_op}  {georange_mhz_op}')
 
+    for label, value in sub_score_rows(sub_scores):
+        if gp['absolute']:
+            log.info(f'{label:15}  {int(value):8,}')
+        else:
+            log.info(f'{label:15}    {value:6.2f}    {value / args.cpu_mhz:6.2f}')
+
+    for label, value in interval_rows(intervals, args) + rate_rows():
+        log.info(f'{label:17}  {value}')
+
     log.info('All benchmarks run successfully')
 
-def output_stats_md(geomean, geosd, georange, args):
+def output_stats_md(geomean, geosd, georange, intervals, sub_scores, args):
     """Output the statistical summary in Markdown format."""
 
     if gp['absolute']:
@@ -466,7 +1056,17 @@ def output_stats_md(geomean, geosd, georange, args):
         log.info(f'| Geometric SD    |   {geosd_op} |   {geosd_mhz_op} |')
         log.info(f'| Geometric range |   {georange_op} |   {georange_mhz_op} |')
 
-def output_stats_csv(geomean, geosd, georange, args):
+    for label, value in sub_score_rows(sub_scores):
+        if gp['absolute']:
+            log.info(f'| {label:15} |   {int(value):8,} |')
+        else:
+            log.info(f'| {label:15} |     {value:6.2f} |     '
+                     + f'{value / args.cpu_mhz:6.2f} |')
+
+    for label, value in interval_rows(intervals, args) + rate_rows():
+        log.info(f'| {label:15} |   {value} |')
+
+def output_stats_csv(geomean, geosd, georange, intervals, sub_scores, args):
     """Output the statistical summary in CSV format."""
 
     if gp['absolute']:
@@ -493,20 +1093,307 @@ def output_stats_csv(geomean, geosd, georange, args):
         log.info(f'"Geometric SD","{geosd_op}","{geosd_mhz_op}"')
         log.info(f'"Geometric range","{georange_op}","{georange_mhz_op}"')
 
-def generate_stats(benchmarks, raw_data, rel_data, args):
-    """Generate the summary statistics at the end.  This is only computed when
+    for label, value in sub_score_rows(sub_scores):
+        if gp['absolute']:
+            log.info(f'"{label}","{int(value)}"')
+        else:
+            log.info(f'"{label}","{value:.2f}","{value / args.cpu_mhz:.2f}"')
+
+    for label, value in interval_rows(intervals, args) + rate_rows():
+        log.info(f'"{label}","{value}"')
+
+def output_summary_jsonl(geomean, geosd, georange, intervals, sub_scores,
+                         args):
+    """Output the statistical summary as a line of JSON."""
+    fields = {'geometric mean': geomean,
+              'geometric standard deviation': geosd,
+              'geometric range': georange}
+    if not gp['absolute']:
+        fields['geometric mean per MHz'] = geomean / args.cpu_mhz
+    if 'mean' in intervals:
+        fields['geometric mean confidence interval'] = list(intervals['mean'])
+    if 'ratio' in intervals:
+        fields['speed ratio'] = intervals['ratio'][0]
+        fields['speed ratio confidence interval'] = list(
+            intervals['ratio'][1:])
+    if sub_scores is not None:
+        fields['weighted geometric mean'] = sub_scores['weighted']
+        fields['category geometric means'] = sub_scores['categories']
+        if not gp['absolute']:
+            if sub_scores['weighted'] is not None:
+                fields['weighted geometric mean per MHz'] = (
+                    sub_scores['weighted'] / args.cpu_mhz)
+            fields['category geometric means per MHz'] = {
+                category: score / args.cpu_mhz
+                for category, score in sub_scores['categories'].items()}
+    if gp['rate_data']:
+        fields['scaling efficiency'] = scaling_efficiency()
+    output_jsonl('summary', 'speed', successful=True, **fields)
+
+
+def generate_stats(results, args):
+    """Output the summary statistics at the end.  This is only done when
        we have a successful run, so we know all benchmarks are represented."""
-    if gp['output_format'] != output_format.BASELINE:
-        geomean, geosd, georange = embench_stats(benchmarks, raw_data, rel_data)
+    geomean = results.geomean
+    geosd = results.geosd
+    georange = results.georange
+    intervals = results.extra['intervals']
+    sub_scores = results.extra.get('sub scores')
 
     if gp['output_format'] == output_format.JSON:
-        output_stats_json (geomean, geosd, georange, args)
+        output_stats_json (geomean, geosd, georange, intervals, sub_scores,
+                           args)
+    elif gp['output_format'] == output_format.JSONL:
+        output_summary_jsonl (geomean, geosd, georange, intervals, sub_scores,
+                              args)
     elif gp['output_format'] == output_format.TEXT:
-        output_stats_text (geomean, geosd, georange, args)
+        output_stats_text (geomean, geosd, georange, intervals, sub_scores,
+                           args)
     elif gp['output_format'] == output_format.MD:
-        output_stats_md (geomean, geosd, georange, args)
+        output_stats_md (geomean, geosd, georange, intervals, sub_scores, args)
+    elif gp['output_format'] == output_format.CSV:
+        output_stats_csv (geomean, geosd, georange, intervals, sub_scores,
+                          args)
+
+def ab_run(bench, args):
+    """Run benchmark "bench" from both builds of an A/B comparison,
+       "args.repeat" times each.  In each round the two builds are run in a
+       random order, so that drift in the speed of the machine, for example
+       as it heats up, affects both equally.  Return a list of the times of
+       the runs of each build, or None if any run failed."""
+    appexes = [os.path.join(bd, 'src', bench, f'{bench}{gp["file_extension"]}')
+               for bd in gp['ab_dirs']]
+    for appexe in appexes:
+        if not os.path.isfile(appexe):
+            log.warning(f'Warning: {appexe} not found.')
+            return None
+
+    times = [[], []]
+    order = [0, 1]
+    for _ in range(args.repeat):
+        random.shuffle(order)
+        for side in order:
+            res = run_benchmark(bench, appexes[side], args)
+            if not res:
+                log.warning(f'Warning: Run of {appexes[side]} failed.')
+                return None
+            if isinstance(res, dict):
+                res = res['time']
+            times[side].append(float(res))
+
+    return times
+
+
+def ab_compare(benchmarks, args):
+    """Run an A/B comparison of the benchmarks.  Return a dictionary of the
+       speedup of build B over build A for each benchmark which ran, as a
+       tuple of the speedup, its confidence interval and the p-value of a
+       rank sum test, and a tuple of the geometric mean speedup and its
+       confidence interval, or None if no benchmark ran."""
+    samples_a = {}
+    samples_b = {}
+    speedups = {}
+    for bench in benchmarks:
+        times = ab_run(bench, args)
+        if times is None:
+            if gp['output_format'] == output_format.JSONL:
+                output_jsonl('result', 'ab', benchmark=bench,
+                             successful=False)
+            continue
+        samples_a[bench], samples_b[bench] = times
+
+        # The ratio of the times of A to the times of B is the speedup of B
+        speedup, low, high = ratio_interval(
+            {bench: samples_a[bench]}, {bench: samples_b[bench]},
+            args.confidence, args.resamples)
+        speedups[bench] = (speedup, low, high,
+                           rank_sum_test(samples_a[bench], samples_b[bench]))
+        if gp['output_format'] == output_format.JSONL:
+            output_jsonl('result', 'ab', benchmark=bench, successful=True,
+                         speedup=speedup, **{
+                             'confidence interval': [low, high],
+                             'p value': speedups[bench][3],
+                             'significant': (speedups[bench][3]
+                                             < 1.0 - args.confidence),
+                             'samples A': samples_a[bench],
+                             'samples B': samples_b[bench]})
+
+    if not samples_a:
+        return speedups, None
+    return speedups, ratio_interval(samples_a, samples_b, args.confidence,
+                                    args.resamples)
+
+
+def output_ab(speedups, overall, args):
+    """Output the results of an A/B comparison.  A benchmark's speedup is
+       significant if its p-value is below one minus the confidence
+       level."""
+    alpha = 1.0 - args.confidence
+    level = f'{args.confidence * 100:g}% CI'
+
+    if gp['output_format'] == output_format.JSONL:
+        # The result of each benchmark has been output already
+        fields = {'build A': gp['ab_dirs'][0], 'build B': gp['ab_dirs'][1]}
+        if overall is not None:
+            fields['speedup geometric mean'] = overall[0]
+            fields['speedup confidence interval'] = list(overall[1:])
+        output_jsonl('summary', 'ab', successful=len(speedups) > 0,
+                     **fields)
+        return
+
+    if gp['output_format'] == output_format.JSON:
+        results = {
+            'build A': gp['ab_dirs'][0],
+            'build B': gp['ab_dirs'][1],
+            'detailed speedups': {
+                bench: {'speedup': round(speedup, 3),
+                        'confidence interval': [round(low, 3),
+                                                round(high, 3)],
+                        'p value': round(pvalue, 4),
+                        'significant': pvalue < alpha}
+                for bench, (speedup, low, high, pvalue) in speedups.items()},
+        }
+        if overall is not None:
+            results['speedup geometric mean'] = round(overall[0], 3)
+            results['speedup confidence interval'] = [round(overall[1], 3),
+                                                      round(overall[2], 3)]
+        log.info(dumps({'ab results': results}, indent=2))
+        return
+
+    rows = [(bench, f'{speedup:.3f}', f'{low:.3f} - {high:.3f}',
+             f'{pvalue:.4f}', '*' if pvalue < alpha else '')
+            for bench, (speedup, low, high, pvalue) in speedups.items()]
+    if overall is not None:
+        summary = ('Geometric mean', f'{overall[0]:.3f}',
+                   f'{overall[1]:.3f} - {overall[2]:.3f}')
+
+    if gp['output_format'] == output_format.MD:
+        log.info(f'| Benchmark       |    Speedup | {level:15} |    p-value |')
+        log.info('| :-------------- | ---------: | :-------------- | ---------: |')
+        for bench, speedup, interval, pvalue, sig in rows:
+            log.info(f'| {bench:15} | {speedup:>10} | {interval:15} | '
+                     + f'{pvalue + sig:>10} |')
+        if overall is not None:
+            log.info(f'| {summary[0]:15} | {summary[1]:>10} | '
+                     + f'{summary[2]:15} |            |')
     elif gp['output_format'] == output_format.CSV:
-        output_stats_csv (geomean, geosd, georange, args)
+        log.info(f'"Benchmark","Speedup","{level}","p-value","Significant"')
+        for bench, speedup, interval, pvalue, sig in rows:
+            log.info(f'"{bench}","{speedup}","{interval}","{pvalue}","{sig}"')
+        if overall is not None:
+            log.info(f'"{summary[0]}","{summary[1]}","{summary[2]}","",""')
+    else:
+        log.info(f'Speedup of B ({gp["ab_dirs"][1]}) over A '
+                 + f'({gp["ab_dirs"][0]})')
+        log.info(f'Benchmark          Speedup  {level:15}  p-value')
+        log.info('---------          -------  '
+                 + f'{"-" * len(level):15}  -------')
+        for bench, speedup, interval, pvalue, sig in rows:
+            log.info(f'{bench:15}  {speedup:>9}  {interval:15}  {pvalue}{sig}')
+        if overall is not None:
+            log.info(f'---------          -------  {"-" * len(level)}')
+            log.info(f'{summary[0]:15}  {summary[1]:>9}  {summary[2]}')
+
+
+def measure(benchmarks, args):
+    """Measure the speed of "benchmarks", given the validated arguments
+       "args" including those of the target, outputting the results of the
+       benchmarks in gp['output_format'], if any.  Return a Results object."""
+    # Journal the results as they complete, so an interrupted run can be
+    # resumed.  The target arguments are part of the fingerprint.
+    if gp['checkpoint_file']:
+        gp['checkpoint'] = Checkpoint(
+            gp['checkpoint_file'],
+            dumps({'builddir': os.path.abspath(gp['bd']),
+                   'arguments': loads(speed_cache_key(args))}),
+            args.resume)
+    else:
+        gp['checkpoint'] = None
+
+    # Collect the speed data for the benchmarks.
+    raw_data, rel_data = collect_data(benchmarks, args)
+    if gp['speed_cache'] is not None:
+        gp['speed_cache'].save()
+
+    details = {}
+    for bench in raw_data:
+        details[bench] = {'samples': gp['speed_samples'][bench]}
+        if bench in gp['heap_data']:
+            details[bench]['heap'] = gp['heap_data'][bench]
+        if bench in gp['rate_data']:
+            details[bench]['rate'] = gp['rate_data'][bench]
+    results = Results('speed', list(raw_data), raw_data or {},
+                      rel_data or {}, details, bool(raw_data))
+
+    # We can't compute geometric SD on the fly, so we need to collect all the
+    # data and then process it in two passes. We could do the first processing
+    # as we collect the data, but it is clearer to do the three things
+    # separately. Given the size of datasets with which we are concerned the
+    # compute overhead is not significant.
+    if raw_data:
+        if args.save_samples:
+            save_samples(benchmarks, args)
+        if gp['history']:
+            with span('record history', 'history'):
+                record_history(benchmarks, rel_data, args)
+        with span('statistics', 'stats'):
+            results.geomean, results.geosd, results.georange = embench_stats(
+                benchmarks, raw_data, rel_data)
+            results.extra['intervals'] = compute_intervals(
+                benchmarks, raw_data, rel_data, args)
+            if gp['benchmark_info'] is not None:
+                results.extra['sub scores'] = embench_sub_scores(
+                    benchmarks, raw_data, rel_data, gp['benchmark_info'])
+            if gp['rate_data']:
+                results.extra['scaling efficiency'] = scaling_efficiency()
+
+    return results
+
+
+def measure_speed(builddir, target_module, target_args=(), benchmarks=None,
+                  **options):
+    """Measure the speed of the benchmarks in "builddir" using the target
+       module "target_module", for use from other Python programs.
+       "target_args" is a list of the command line arguments of the target
+       module, "benchmarks" lists the benchmarks to run, by default all of
+       them, and "options" gives the value of any other argument, named
+       as in the namespace of arguments (for example cpu_mhz=16 or
+       repeat=5).  Unspecified arguments take their usual defaults, except
+       that nothing is output, recorded in the history or journalled unless
+       "output_format", "history" or "checkpoint" is given.  Logging is left
+       as the caller has set it up.  Return a Results object.  Raise
+       ValueError if the arguments are not valid, or RuntimeError if the
+       benchmarks can't be run."""
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    args, _ = get_common_args(['--target-module', target_module])
+    args.builddir = builddir
+    args.history = False
+    args.checkpoint = False
+    for name, value in options.items():
+        if (name not in vars(args)) or (name == 'ab'):
+            raise TypeError(f'measure_speed () got an unexpected option {name}')
+        setattr(args, name, value)
+
+    try:
+        validate_args(args)
+        args = argparse.Namespace(
+            **vars(args), **vars(get_target_args(list(target_args))))
+    except SystemExit:
+        raise ValueError('Invalid arguments to measure_speed (): see the log '
+                         + 'for details') from None
+    gp['output_format'] = args.output_format
+
+    try:
+        if benchmarks is None:
+            benchmarks = find_benchmarks()
+        else:
+            setup_benchmark_dirs()
+        return measure(benchmarks, args)
+    except SystemExit:
+        raise RuntimeError('Unable to measure speed: see the log for '
+                           + 'details') from None
+
 
 def main():
     """Main program driving measurement of benchmark size"""
@@ -521,6 +1408,8 @@ def main():
     # Establish logging
     setup_logging(args.logdir, 'speed')
     log_args(args)
+    if args.trace:
+        start_trace(args.trace, 'benchmark_speed')
 
     # Check args are OK (have to have logging and build directory set up first)
     validate_args(args)
@@ -529,20 +1418,24 @@ def main():
     args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
 
     # Find the benchmarks
-    benchmarks = find_benchmarks()
+    with span('find benchmarks', 'setup'):
+        benchmarks = find_benchmarks()
     log_benchmarks(benchmarks)
 
-    # Collect the speed data for the benchmarks.
-    raw_data, rel_data = collect_data(benchmarks, args)
+    if args.ab:
+        speedups, overall = ab_compare(benchmarks, args)
+        output_ab(speedups, overall, args)
+        if len(speedups) != len(benchmarks):
+            log.info('ERROR: Failed to compare all benchmarks')
+            sys.exit(1)
+        return 0
 
-    # We can't compute geometric SD on the fly, so we need to collect all the
-    # data and then process it in two passes. We could do the first processing
-    # as we collect the data, but it is clearer to do the three things
-    # separately. Given the size of datasets with which we are concerned the
-    # compute overhead is not significant.
-    if raw_data:
-        generate_stats(benchmarks, raw_data, rel_data, args)
+    results = measure(benchmarks, args)
+    if results.successful:
+        generate_stats(results, args)
     else:
+        if gp['output_format'] == output_format.JSONL:
+            output_jsonl('summary', 'speed', successful=False)
         log.info('ERROR: Failed to compute speed benchmarks')
         sys.exit(1)
 
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+
+# Script to search compiler flags for the best speed and size
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Search a space of compiler flags for the best trade-offs of speed and size.
+
+The flag space is described by a JSON file in the same form as a build matrix
+for sconstruct.py (see pylib/embench_matrix.py): each axis lists alternative
+settings, such as optimization levels, loop unrolling, inlining limits or
+alignment, and every combination of them is a candidate configuration.
+Either every candidate is tried, or a random sample of them.
+
+The candidates are built in parallel by one invocation of scons, each in its
+own subdirectory of the build directory.  The size and speed of each of their
+benchmarks is then measured, and scored by the geometric mean of the results
+relative to the baseline, as computed by embench_stats ().  Results are
+cached, keyed by the content of each executable, so a candidate which has
+not changed since an earlier search is not measured again.
+
+A candidate is Pareto optimal if no other candidate is both at least as fast
+and at least as small, and better in one of them.  The Pareto optimal
+candidates are reported, in order of size.
+"""
+
+import argparse
+import os
+import random
+import sys
+
+from json import dumps
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_core import output_format
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import build_matrix
+from embench_build import run_median
+from embench_cache import FileResultCache
+from embench_elf import ALL_CATEGORIES
+from embench_elf import elf_size_breakdown
+from embench_elf import is_elf
+from embench_matrix import load_matrix
+from embench_report import add_report_args
+from embench_report import setup_report_args
+
+# Build matrix of the candidates, and cache of their results, written in the
+# build directory
+TUNE_MATRIX_FILE = 'tune-matrix.json'
+TUNE_CACHE_FILE = '.embench-tune-cache.json'
+TUNE_CACHE_VERSION = 1
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Search compiler flags for the best speed and size')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons for every candidate, for example '
+        + 'user_libs=-lm',
+    )
+    parser.add_argument(
+        '--space',
+        type=str,
+        required=True,
+        help='JSON file describing the flag space, as a build matrix',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd-tune',
+        help='Directory in which to build the binaries (default "bd-tune")',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser, absolute=False)
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Report every candidate, not just the Pareto optimal ones',
+    )
+    parser.add_argument(
+        '--sample',
+        type=int,
+        default=None,
+        help='Try this many candidates chosen at random, rather than all',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed for choosing candidates at random (default 0)',
+    )
+    parser.add_argument(
+        '--metric',
+        type=str,
+        default=[],
+        nargs='+',
+        choices=ALL_CATEGORIES,
+        action='extend',
+        help=
+        'Section categories to include in metric: one or more of "text", '
+        + '"rodata", "data" or "bss". Default "text"',
+    )
+    parser.add_argument(
+        '--dummy-benchmark',
+        type=str,
+        default='dummy-benchmark',
+        help='Dummy benchmark to subtract from each benchmark size',
+    )
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        required=True,
+        help='Python module with routines to run benchmarks',
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor for benchmarks, passed to scons'
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        default=True,
+        help='Reuse the results of executables which have not changed '
+        + '(the default)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='Measure every executable',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Number of parallel build jobs (default from NUM_CPU)',
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables)
+
+    try:
+        gp['candidates'] = load_matrix(args.space)
+    except (OSError, ValueError) as error:
+        log.error(f'ERROR: Unable to read flag space {args.space}: {error}: '
+                  + 'exiting')
+        sys.exit(1)
+    if (args.sample is not None) and (args.sample < len(gp['candidates'])):
+        if args.sample < 1:
+            log.error('ERROR: --sample must be positive: exiting')
+            sys.exit(1)
+        gp['candidates'] = random.Random(args.seed).sample(gp['candidates'],
+                                                           args.sample)
+
+    # Scores are always relative to the baseline
+    gp['absolute'] = False
+    setup_report_args(args)
+    gp['metric'] = args.metric or ['text']
+    gp['dummy_benchmark'] = args.dummy_benchmark
+
+    if args.cache:
+        gp['tune_cache'] = FileResultCache(
+            os.path.join(gp['bd'], TUNE_CACHE_FILE), TUNE_CACHE_VERSION)
+    else:
+        gp['tune_cache'] = None
+
+    newmodule = import_target_module(args.target_module)
+    globals()['get_target_args'] = newmodule.get_target_args
+    globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def build(args):
+    """Build all the candidates, as one build matrix, carrying on past any
+       which fail to build."""
+    extra_opts = ['-k']
+    if args.jobs:
+        extra_opts.append(f'-j{args.jobs}')
+    if not build_matrix(dict(gp['candidates']),
+                        [*args.variables, f'gsf={args.gsf}'],
+                        TUNE_MATRIX_FILE, args.config_dir, args.scons,
+                        extra_opts):
+        log.warning('Warning: Some candidates failed to build')
+
+
+def speed_cache_key(args):
+    """The arguments on which a speed result depends, other than the
+       executable."""
+    key = {arg: val for arg, val in sorted(vars(args).items())
+           if arg not in ('variables', 'space', 'builddir', 'config_dir',
+                          'logdir', 'baselinedir', 'output_format', 'all',
+                          'sample', 'seed', 'metric', 'dummy_benchmark',
+                          'cache', 'jobs', 'scons', 'file_extension')}
+    return dumps(key, default=str)
+
+
+def measure(appexe, args, speed):
+    """Measure the size in each category, and if "speed" is True the time
+       in milliseconds, of "appexe", using the cache if possible.  Return a
+       dictionary of the results, with a time of None if the run failed."""
+    cache = gp['tune_cache']
+    key = speed_cache_key(args)
+    if cache is not None:
+        res = cache.lookup(appexe, key)
+        if (res is not None) and ((not speed) or (res['time'] is not None)):
+            return res
+
+    res = {'size': elf_size_breakdown(appexe)['categories'], 'time': None}
+    if speed:
+        res['time'] = run_median(run_benchmark, os.path.basename(appexe),
+                                 appexe, args)
+    if cache is not None:
+        cache.store(appexe, res, key)
+
+    return res
+
+
+def score_candidate(name, benchmarks, baseline_size, baseline_speed, args):
+    """Measure candidate "name".  Return its speed and size scores, or None
+       if it could not be built or run."""
+    cfg_bd = os.path.join(gp['bd'], name)
+    dummy_exe = os.path.join(cfg_bd, 'support', gp['dummy_benchmark'],
+                             f'{gp["dummy_benchmark"]}{gp["file_extension"]}')
+    if not is_elf(dummy_exe):
+        log.warning(f'Warning: candidate {name} was not built')
+        return None
+    dummy = measure(dummy_exe, args, False)['size']
+
+    size_data = {}
+    speed_data = {}
+    for bench in benchmarks:
+        appexe = os.path.join(cfg_bd, 'src', bench,
+                              f'{bench}{gp["file_extension"]}')
+        if not is_elf(appexe):
+            log.warning(f'Warning: {bench} of candidate {name} was not built')
+            return None
+        res = measure(appexe, args, True)
+        if res['time'] is None:
+            log.warning(f'Warning: Run of {bench} of candidate {name} failed')
+            return None
+        size = sum(res['size'][metric] - dummy[metric]
+                   for metric in gp['metric'])
+        base = sum(baseline_size[bench][metric] for metric in gp['metric'])
+        size_data[bench] = size / base if base > 0 else 0.0
+        speed_data[bench] = baseline_speed[bench] / res['time'] * args.gsf
+
+    speed, _, _ = embench_stats(benchmarks, speed_data, speed_data)
+    size, _, _ = embench_stats(benchmarks, size_data, size_data)
+    log.debug(f'Candidate {name}: speed {speed:.2f}, size {size:.2f}')
+    return {'speed': speed, 'size': size}
+
+
+def pareto_front(scores):
+    """Return the names of the candidates in "scores" which are Pareto
+       optimal, that is no other candidate is at least as fast and as small
+       and better in one of them."""
+    front = []
+    for name, score in scores.items():
+        dominated = any(
+            (other['speed'] >= score['speed'])
+            and (other['size'] <= score['size'])
+            and ((other['speed'] > score['speed'])
+                 or (other['size'] < score['size']))
+            for other in scores.values())
+        if not dominated:
+            front.append(name)
+
+    return front
+
+
+def output_results(names, scores, front):
+    """Output the scores of the candidates "names"."""
+    variables = dict(gp['candidates'])
+
+    if gp['output_format'] == output_format.JSON:
+        log.info(dumps({'tuning results': [
+            {'name': name,
+             'speed': round(scores[name]['speed'], 2),
+             'size': round(scores[name]['size'], 2),
+             'pareto optimal': name in front,
+             'variables': variables[name]} for name in names]}, indent=2))
+        return
+
+    rows = [(name, f'{scores[name]["speed"]:.2f}',
+             f'{scores[name]["size"]:.2f}', '*' if name in front else '',
+             ' '.join(f'{var}="{val}"' for var, val in variables[name].items()))
+            for name in names]
+    width = max([len('Candidate')] + [len(name) for name in names])
+
+    if gp['output_format'] == output_format.TEXT:
+        log.info(f'{"Candidate":{width}}      Speed       Size  Pareto  '
+                 + 'Variables')
+        log.info(f'{"---------":{width}}      -----       ----  ------  '
+                 + '---------')
+        for name, speed, size, pareto, desc in rows:
+            log.info(f'{name:{width}} {speed:>10} {size:>10}  {pareto:^6}  '
+                     + desc)
+    elif gp['output_format'] == output_format.MD:
+        log.info('| Candidate | Speed | Size | Pareto | Variables |')
+        log.info('| :-------- | ----: | ---: | :----: | :-------- |')
+        for name, speed, size, pareto, desc in rows:
+            log.info(f'| `{name}` | {speed} | {size} | {pareto} | '
+                     + f'`{desc}` |')
+    elif gp['output_format'] == output_format.CSV:
+        log.info('"Candidate","Speed","Size","Pareto","Variables"')
+        for name, speed, size, pareto, desc in rows:
+            desc = desc.replace('"', '""')
+            log.info(f'"{name}","{speed}","{size}","{pareto}","{desc}"')
+
+
+def main():
+    """Main program driving the flag search"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'tune')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    with open(os.path.join(gp['baseline_dir'], 'size.json')) as fileh:
+        baseline_size = loads(fileh.read())
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline_speed = loads(fileh.read())
+
+    build(args)
+    scores = {}
+    for name, _ in gp['candidates']:
+        score = score_candidate(name, benchmarks, baseline_size,
+                                baseline_speed, args)
+        if score is not None:
+            scores[name] = score
+    if gp['tune_cache'] is not None:
+        gp['tune_cache'].save()
+
+    if not scores:
+        log.info('ERROR: No candidate could be measured')
+        sys.exit(1)
+
+    front = pareto_front(scores)
+    names = scores if args.all else front
+    output_results(sorted(names, key=lambda name: scores[name]['size']),
+                   scores, front)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
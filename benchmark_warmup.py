@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# Script to measure the sensitivity of the benchmarks to cache warming
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Measure the speed of each benchmark after warming the caches by different
+amounts.
+
+Before the benchmark is timed, main () calls warm_caches () with the build
+variable warmup_heat, running the benchmark's code that many times.  This
+script builds the programs with several values of warmup_heat, in one
+invocation of scons using a build matrix, and measures the speed of each at
+each.  With a heat of 0 the benchmark runs from cold, which matters on the
+first invocation of code on a cached processor, while a larger heat gives
+its steady state speed.  The ratio of the time at the lowest heat to that at
+the highest is also reported.
+
+Only the time between start_trigger () and stop_trigger () should be
+measured, otherwise the warming runs are timed too.  Targets driven by a
+debugger do this already, and run_native does with --trigger-time.
+"""
+
+import argparse
+import os
+import sys
+
+from json import loads
+
+sys.path.append(
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'pylib'))
+
+from embench_core import check_python_version
+from embench_core import log
+from embench_core import gp
+from embench_core import setup_logging
+from embench_core import log_args
+from embench_core import find_benchmarks
+from embench_core import log_benchmarks
+from embench_core import embench_stats
+from embench_build import check_scons_variables
+from embench_build import import_target_module
+from embench_build import build_matrix
+from embench_build import run_median
+from embench_report import add_report_args
+from embench_report import setup_report_args
+from embench_report import output_results
+
+# Build matrix written in the build directory
+WARMUP_MATRIX_FILE = 'warmup-matrix.json'
+
+
+def build_parser():
+    """Build a parser for all the arguments"""
+    parser = argparse.ArgumentParser(
+        description='Measure speed after different amounts of cache warming')
+
+    parser.add_argument(
+        'variables',
+        nargs='*',
+        metavar='VAR=VALUE',
+        help='Variables passed to scons, for example cflags="-O2"',
+    )
+    parser.add_argument(
+        '--builddir',
+        type=str,
+        default='bd-warmup',
+        help='Directory in which to build the binaries '
+        + '(default "bd-warmup")',
+    )
+    parser.add_argument(
+        '--config-dir',
+        type=str,
+        required=True,
+        help='Directory holding the board configuration',
+    )
+    add_report_args(parser)
+    parser.add_argument(
+        '--target-module',
+        type=str,
+        required=True,
+        help='Python module with routines to run benchmarks',
+    )
+    parser.add_argument(
+        '--heat-values',
+        type=str,
+        default='0,1,4',
+        help='Comma separated values of warmup_heat at which to measure '
+        + '(default "0,1,4")',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Number of runs at each heat, of which the median is used '
+        + '(default 1)',
+    )
+    parser.add_argument(
+        '--gsf',
+        type=int,
+        default=1,
+        help='Global scale factor for benchmarks, passed to scons'
+    )
+    parser.add_argument(
+        '--scons',
+        type=str,
+        default='scons',
+        help='Command to invoke scons (default "scons")',
+    )
+
+    return parser
+
+
+def validate_args(args):
+    """Check that supplied args are all valid. By definition logging is
+       working when we get here.
+
+       Update the gp dictionary with all the useful info"""
+    if os.path.isabs(args.builddir):
+        gp['bd'] = args.builddir
+    else:
+        gp['bd'] = os.path.join(gp['rootdir'], args.builddir)
+
+    check_scons_variables(args.variables, ('gsf', 'warmup_heat'))
+
+    try:
+        gp['heat_values'] = sorted(set(int(heat)
+                                       for heat in args.heat_values.split(',')))
+    except ValueError:
+        gp['heat_values'] = []
+    if (not gp['heat_values']) or (gp['heat_values'][0] < 0):
+        log.error('ERROR: heat values must be non-negative integers: exiting')
+        sys.exit(1)
+    if args.repeat < 1:
+        log.error('ERROR: --repeat must be positive: exiting')
+        sys.exit(1)
+
+    setup_report_args(args)
+
+    newmodule = import_target_module(args.target_module)
+    globals()['get_target_args'] = newmodule.get_target_args
+    globals()['run_benchmark'] = newmodule.run_benchmark
+
+
+def heat_builddir(heat):
+    """The build directory of the programs with warmup_heat "heat"."""
+    return os.path.join(gp['bd'], f'heat-{heat}')
+
+
+def build(args):
+    """Build the benchmarks at each heat, as one build matrix.  Return True
+       if the build succeeded."""
+    configs = {os.path.basename(heat_builddir(heat)): {'warmup_heat': heat}
+               for heat in gp['heat_values']}
+    if not build_matrix(configs, [*args.variables, f'gsf={args.gsf}'],
+                        WARMUP_MATRIX_FILE, args.config_dir, args.scons):
+        log.error('ERROR: Build failed')
+        return False
+
+    return True
+
+
+def run_at(bench, heat, args):
+    """Run benchmark "bench" built with warmup_heat "heat".  Return the
+       median time in milliseconds, or None on failure."""
+    appexe = os.path.join(heat_builddir(heat), 'src', bench,
+                          f'{bench}{gp["file_extension"]}')
+    ms = run_median(run_benchmark, bench, appexe, args, args.repeat)
+    if ms is None:
+        log.warning(f'Warning: Run of {bench} at heat {heat} failed.')
+
+    return ms
+
+
+def collect_data(benchmarks, args):
+    """Measure each benchmark at each heat.  Return a list of (name, raw
+       data, relative data) for each heat, followed in relative mode by the
+       ratio of the time at the lowest heat to that at the highest."""
+    with open(os.path.join(gp['baseline_dir'], 'speed.json')) as fileh:
+        baseline = loads(fileh.read())
+
+    results = []
+    for heat in gp['heat_values']:
+        raw_data = {}
+        rel_data = {}
+        for bench in benchmarks:
+            ms = run_at(bench, heat, args)
+            if ms is not None:
+                raw_data[bench] = ms
+                rel_data[bench] = baseline[bench] / ms * args.gsf
+        results.append((f'heat {heat}', raw_data, rel_data))
+
+    if not gp['absolute'] and (len(results) > 1):
+        cold = results[0][1]
+        steady = results[-1][1]
+        ratio = {bench: cold[bench] / steady[bench] for bench in benchmarks
+                 if (bench in cold) and (bench in steady)}
+        results.append(('cold/steady', ratio, ratio))
+
+    return results
+
+
+def main():
+    """Main program driving the cache warming sweep"""
+    # Establish the root directory of the repository, since we know this file is
+    # in that directory.
+    gp['rootdir'] = os.path.abspath(os.path.dirname(__file__))
+
+    # Parse arguments using standard technology.  Anything left over is for
+    # the target module.
+    parser = build_parser()
+    args, remnant = parser.parse_known_args()
+
+    # Establish logging
+    setup_logging(args.logdir, 'warmup')
+    log_args(args)
+
+    # Check args are OK (have to have logging set up first)
+    validate_args(args)
+
+    # Parse target specific args
+    args = argparse.Namespace(**vars(args), **vars(get_target_args(remnant)))
+
+    # Find the benchmarks
+    benchmarks = find_benchmarks()
+    log_benchmarks(benchmarks)
+
+    if not build(args):
+        sys.exit(1)
+
+    results = collect_data(benchmarks, args)
+    stats = [embench_stats(list(raw_data), raw_data, rel_data)
+             for _, raw_data, rel_data in results]
+    output_results(benchmarks, results, stats)
+
+    if any(len(raw_data) != len(benchmarks) for _, raw_data, _ in results):
+        log.info('ERROR: Failed to measure all benchmarks')
+        sys.exit(1)
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+
+check_python_version(3, 6)
+if __name__ == '__main__':
+    sys.exit(main())
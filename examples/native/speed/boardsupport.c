@@ -8,6 +8,14 @@
 
 #include <support.h>
 
+#include <stdio.h>
+#include <time.h>
+
+/* The time between the triggers is printed, so that the runner can time just
+   the benchmark, rather than the whole process including cache warming. */
+
+static struct timespec start_time;
+
 void
 initialise_board ()
 {
@@ -16,9 +24,32 @@ initialise_board ()
 void __attribute__ ((noinline)) __attribute__ ((externally_visible))
 start_trigger ()
 {
+  clock_gettime (CLOCK_MONOTONIC, &start_time);
 }
 
 void __attribute__ ((noinline)) __attribute__ ((externally_visible))
 stop_trigger ()
 {
+  struct timespec stop_time;
+
+  clock_gettime (CLOCK_MONOTONIC, &stop_time);
+  printf ("TRIGGER_NS=%lld\n",
+	  (long long) (stop_time.tv_sec - start_time.tv_sec) * 1000000000LL
+	  + (stop_time.tv_nsec - start_time.tv_nsec));
+}
+
+#ifdef HEAP_STATS
+/* Natively we can just print the heap statistics for the runner to pick
+   up. */
+
+void
+report_heap_stats_beebs ()
+{
+  printf ("HEAP_STATS peak=%zu allocs=%zu failed=%zu histogram=",
+	  heap_stats_beebs.peak, heap_stats_beebs.allocs,
+	  heap_stats_beebs.failed);
+  for (int i = 0; i < HEAP_STATS_BUCKETS; i++)
+    printf (i == 0 ? "%zu" : ",%zu", heap_stats_beebs.histogram[i]);
+  printf ("\n");
 }
+#endif
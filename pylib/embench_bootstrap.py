@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Bootstrap confidence intervals for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench bootstrap confidence intervals.
+
+When each benchmark is measured several times, the spread of its samples
+shows how much of the Embench score is noise.  These routines estimate a
+confidence interval for the geometric mean over the benchmarks, and for the
+ratio of the geometric means of two sets of measurements, by resampling the
+samples of each benchmark with replacement.  The benchmarks themselves are
+not resampled, since the suite is fixed.
+
+The score of each resample is the geometric mean over the benchmarks of the
+median of each benchmark's resampled values, matching the median reported
+for repeated runs.  NumPy is used to compute all the resamples at once if it
+is installed, and otherwise they are computed one at a time in Python.
+
+A rank sum test is also provided, to tell whether the runs of one benchmark
+from two builds differ by more than noise.
+"""
+
+import math
+import random
+import statistics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# What we export
+
+__all__ = [
+    'BOOTSTRAP_CONFIDENCE',
+    'BOOTSTRAP_RESAMPLES',
+    'sample_score',
+    'geomean_interval',
+    'ratio_interval',
+    'rank_sum_test',
+]
+
+# Default confidence level and number of resamples
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_RESAMPLES = 10000
+
+
+def sample_score(samples):
+    """The geometric mean over the benchmarks of the median of the samples
+       of each.  "samples" is a dictionary of lists of positive values,
+       indexed by benchmark."""
+    logs = [math.log(statistics.median(values))
+            for values in samples.values()]
+    return math.exp(sum(logs) / len(logs))
+
+
+def resampled_log_scores(samples, resamples, seed):
+    """The log of the score of each of "resamples" resamples of "samples".
+       Return a list."""
+    if numpy is not None:
+        rng = numpy.random.default_rng(seed)
+        total = numpy.zeros(resamples)
+        for values in samples.values():
+            values = numpy.asarray(values, dtype=float)
+            picks = rng.integers(0, len(values),
+                                 size=(resamples, len(values)))
+            total += numpy.log(numpy.median(values[picks], axis=1))
+        return (total / len(samples)).tolist()
+
+    rng = random.Random(seed)
+    total = [0.0] * resamples
+    for values in samples.values():
+        if len(values) == 1:
+            total = [tot + math.log(values[0]) for tot in total]
+            continue
+        for i in range(resamples):
+            total[i] += math.log(statistics.median(
+                rng.choices(values, k=len(values))))
+    return [tot / len(samples) for tot in total]
+
+
+def percentile_interval(log_values, confidence):
+    """The central "confidence" interval of the distribution "log_values",
+       as a tuple of the exponentiated lower and upper bounds."""
+    ordered = sorted(log_values)
+    bounds = []
+    for fraction in ((1.0 - confidence) / 2, (1.0 + confidence) / 2):
+        pos = fraction * (len(ordered) - 1)
+        lower = math.floor(pos)
+        upper = min(lower + 1, len(ordered) - 1)
+        bounds.append(math.exp(ordered[lower] + (pos - lower)
+                               * (ordered[upper] - ordered[lower])))
+    return bounds[0], bounds[1]
+
+
+def geomean_interval(samples, confidence=BOOTSTRAP_CONFIDENCE,
+                     resamples=BOOTSTRAP_RESAMPLES, seed=None):
+    """Estimate the "confidence" interval of the score of "samples", a
+       dictionary of lists of positive values indexed by benchmark.  Return
+       a tuple of the lower and upper bounds."""
+    return percentile_interval(resampled_log_scores(samples, resamples, seed),
+                               confidence)
+
+
+def ratio_interval(samples_a, samples_b, confidence=BOOTSTRAP_CONFIDENCE,
+                   resamples=BOOTSTRAP_RESAMPLES, seed=None):
+    """Estimate the "confidence" interval of the ratio of the score of
+       "samples_a" to that of "samples_b", over the benchmarks in both.
+       The two are resampled independently.  Return a tuple of the ratio and
+       the lower and upper bounds."""
+    common = [bench for bench in samples_a if bench in samples_b]
+    samples_a = {bench: samples_a[bench] for bench in common}
+    samples_b = {bench: samples_b[bench] for bench in common}
+
+    log_a = resampled_log_scores(samples_a, resamples, seed)
+    log_b = resampled_log_scores(samples_b, resamples,
+                                None if seed is None else seed + 1)
+    low, high = percentile_interval(
+        [lscore_a - lscore_b for lscore_a, lscore_b in zip(log_a, log_b)],
+        confidence)
+    return sample_score(samples_a) / sample_score(samples_b), low, high
+
+
+def rank_sum_test(sample_a, sample_b):
+    """Two sided Mann-Whitney U test of whether the values of "sample_a"
+       and "sample_b" come from the same distribution, using the normal
+       approximation with corrections for ties and continuity.  This makes
+       no assumption about the shape of the distributions, which for times
+       are usually skewed.  Return the p-value."""
+    pooled = sorted([(value, 0) for value in sample_a]
+                    + [(value, 1) for value in sample_b])
+    count = len(pooled)
+
+    # Rank the values, giving tied values the mean of their ranks
+    rank_a = 0.0
+    ties = 0
+    first = 0
+    while first < count:
+        last = first
+        while (last + 1 < count) and (pooled[last + 1][0] == pooled[first][0]):
+            last += 1
+        rank = (first + last) / 2 + 1
+        rank_a += rank * sum(1 for _, side in pooled[first:last + 1]
+                             if side == 0)
+        ties += (last - first + 1) ** 3 - (last - first + 1)
+        first = last + 1
+
+    n_a = len(sample_a)
+    n_b = len(sample_b)
+    u_a = rank_a - n_a * (n_a + 1) / 2
+    variance = n_a * n_b / 12 * ((count + 1) - ties / (count * (count - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = max(abs(u_a - n_a * n_b / 2) - 0.5, 0.0) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# Build and run procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench builds and runs.
+
+The procedures shared by the scripts which build the benchmarks themselves,
+in one or more configurations, and then time them with a target module:
+checking the scons variables given on the command line, importing the
+target module, running scons, optionally on a build matrix written for the
+purpose, and taking the median time of repeated runs of a benchmark.
+"""
+
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+
+from json import dumps
+
+from embench_core import log
+from embench_core import gp
+
+
+# What we export
+
+__all__ = [
+    'check_scons_variables',
+    'import_target_module',
+    'run_scons',
+    'build_matrix',
+    'run_median',
+]
+
+
+def check_scons_variables(variables, reserved=()):
+    """Check that each of the scons variables "variables" is of the form
+       VAR=VALUE, and that none of them is one of "reserved", which the
+       calling script sets itself.  Log an error and exit if not."""
+    for var in variables:
+        if '=' not in var:
+            log.error(f'ERROR: scons variable "{var}" is not of the form '
+                      + 'VAR=VALUE: exiting')
+            sys.exit(1)
+        if var.split('=', 1)[0] in reserved:
+            log.error(f'ERROR: scons variable "{var.split("=", 1)[0]}" is '
+                      + 'set by this script: exiting')
+            sys.exit(1)
+
+
+def import_target_module(name):
+    """Import the target module "name" and return it.  Log an error and exit
+       if it can't be imported."""
+    try:
+        return importlib.import_module(name)
+    except ImportError as error:
+        log.error(
+            f'ERROR: Target module import failure: {error}: exiting'
+        )
+        sys.exit(1)
+
+
+def run_scons(bd, config_dir, variables, scons='scons', extra_opts=(),
+              output=None):
+    """Build the benchmarks in build directory "bd" for the board in
+       "config_dir", with the scons variables "variables" and any further
+       scons options "extra_opts".  "output", if given, is called with each
+       line of the output of scons as soon as it is written, rather than the
+       line being logged.  Return True if the build succeeded."""
+    cmd = [
+        scons, '-Q', '-f', os.path.join(gp['rootdir'], 'sconstruct.py'),
+        f'--build-dir={bd}', f'--config-dir={config_dir}', *extra_opts,
+        *variables,
+    ]
+    log.debug(' '.join(cmd))
+    with subprocess.Popen(cmd, cwd=gp['rootdir'], stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT,
+                          universal_newlines=True) as proc:
+        for line in proc.stdout:
+            (output or log.debug)(line.rstrip('\n'))
+
+    return proc.returncode == 0
+
+
+def build_matrix(configs, variables, matrix_file, config_dir, scons='scons',
+                 extra_opts=()):
+    """Build the configurations "configs", a dictionary of the build
+       variables of each indexed by name, as one build matrix in a
+       subdirectory of gp['bd'] for each.  The matrix is written to
+       "matrix_file" in gp['bd'], and "variables" are scons variables for
+       every configuration.  Return True if the build succeeded."""
+    os.makedirs(gp['bd'], exist_ok=True)
+    matrix_file = os.path.join(gp['bd'], matrix_file)
+    with open(matrix_file, 'w') as fileh:
+        fileh.write(dumps({'configs': configs}, indent=2) + '\n')
+
+    return run_scons(gp['bd'], config_dir, variables, scons,
+                     [*extra_opts, f'--matrix={matrix_file}'])
+
+
+def run_median(run_benchmark, bench, appexe, args, repeat=1):
+    """Run benchmark "bench" from "appexe" "repeat" times with the target
+       module function "run_benchmark".  Return the median time in
+       milliseconds, or None if any run failed."""
+    times = []
+    for _ in range(repeat):
+        res = run_benchmark(bench, appexe, args)
+        if isinstance(res, dict):
+            res = res['time']
+        if not res:
+            return None
+        times.append(float(res))
+
+    return statistics.median(times)
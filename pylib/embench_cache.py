@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Result caching procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench result caching.
+
+Results derived from a file (for example the section sizes of an
+executable) are kept in a JSON file, keyed by the path of the file and
+validated against its size, modification time and a hash of its content,
+together with an optional key for anything else the result depends on.
+"""
+
+import hashlib
+import json
+import os
+
+from embench_core import log
+
+
+# What we export
+
+__all__ = [
+    'file_digest',
+    'FileResultCache',
+]
+
+
+def file_digest(path):
+    """Return the SHA-256 hash of the contents of "path" as a hex string."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fileh:
+        for block in iter(lambda: fileh.read(1 << 16), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class FileResultCache:
+    """A persistent cache of results derived from files.
+
+       The cache is held in the JSON file "cachefile".  "version" identifies
+       the form of the results, and a cache written with a different version
+       is discarded."""
+
+    def __init__(self, cachefile, version):
+        self.cachefile = cachefile
+        self.version = version
+        self.entries = {}
+        self.dirty = False
+
+        try:
+            with open(cachefile, 'r') as fileh:
+                contents = json.load(fileh)
+            if contents.get('version') == version:
+                self.entries = contents.get('entries', {})
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, path, key=None):
+        """Return the cached result for "path", or None if there is no
+           result or the file has changed.  The size and modification time
+           are checked first, and only if they differ is the content hashed,
+           so that a file rewritten with identical content is still a
+           hit.  "key" identifies anything else the result depends on (for
+           example the arguments used to produce it), and must match the key
+           the result was stored with."""
+        entry = self.entries.get(os.path.abspath(path))
+        if (entry is None) or (entry.get('key') != key):
+            return None
+
+        stat = os.stat(path)
+        if (entry['size'] == stat.st_size
+                and entry['mtime_ns'] == stat.st_mtime_ns):
+            return entry['result']
+
+        if entry['size'] == stat.st_size and entry['sha256'] == file_digest(path):
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self.dirty = True
+            return entry['result']
+
+        return None
+
+    def store(self, path, result, key=None):
+        """Record "result" for the current contents of "path" and "key"."""
+        stat = os.stat(path)
+        self.entries[os.path.abspath(path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_digest(path),
+            'key': key,
+            'result': result,
+        }
+        self.dirty = True
+
+    def save(self):
+        """Write the cache back if it has changed, dropping entries for files
+           which no longer exist.  Failure to write is not an error."""
+        if not self.dirty:
+            return
+
+        entries = {path: entry for path, entry in self.entries.items()
+                   if os.path.exists(path)}
+        tmpfile = f'{self.cachefile}.tmp{os.getpid()}'
+        try:
+            with open(tmpfile, 'w') as fileh:
+                json.dump({'version': self.version, 'entries': entries},
+                          fileh)
+            os.replace(tmpfile, self.cachefile)
+            self.dirty = False
+        except OSError as error:
+            log.debug(f'Warning: unable to write cache {self.cachefile}: '
+                      + f'{error}')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Checkpoint journal for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench checkpoint journal.
+
+A run of benchmark_size.py or benchmark_speed.py appends the result of each
+benchmark to a journal as soon as it is complete, so that a run which dies
+part way through can be resumed without repeating the benchmarks already
+done.  The journal is a file of JSON lines.  The first line holds a
+fingerprint of the arguments and build directory the results depend on,
+and each following line the result of one benchmark with a hash of its
+executable.  On resumption the journal is only used if the fingerprint
+matches, and each result only if the executable has not changed.
+
+Unlike the result caches, which are only written at the end of a run, each
+line is flushed to disk as soon as it is written.  A line left incomplete
+by a crash is ignored.
+"""
+
+import json
+import os
+
+from embench_cache import file_digest
+from embench_core import log
+
+
+# What we export
+
+__all__ = [
+    'Checkpoint',
+]
+
+
+class Checkpoint:
+    """A journal of the results of a run, held in the file "journal".
+
+       "fingerprint" is a JSON string identifying everything the results
+       depend on.  If "resume" is true, the results of an earlier run with
+       the same fingerprint are kept, otherwise the journal is started
+       afresh."""
+
+    def __init__(self, journal, fingerprint, resume):
+        self.journal = journal
+        self.fingerprint = fingerprint
+        self.entries = {}
+
+        if resume:
+            self.entries = self.load()
+            log.debug(f'Resuming with {len(self.entries)} results from '
+                      + f'{journal}')
+
+        # Rewrite the journal, so that it only holds what is kept
+        try:
+            with open(journal, 'w') as fileh:
+                fileh.write(json.dumps({'fingerprint': fingerprint}) + '\n')
+                for bench, entry in self.entries.items():
+                    fileh.write(json.dumps({'benchmark': bench, **entry})
+                                + '\n')
+        except OSError as error:
+            log.warning(f'Warning: Unable to write checkpoint {journal}: '
+                        + f'{error}')
+            self.journal = None
+
+    def load(self):
+        """Read the entries of the journal, indexed by benchmark, if it was
+           written with the same fingerprint."""
+        try:
+            with open(self.journal, 'r') as fileh:
+                lines = fileh.readlines()
+        except OSError:
+            log.warning(f'Warning: No checkpoint {self.journal} to resume '
+                        + 'from: starting from the beginning')
+            return {}
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+        if (not records) or (records[0].get('fingerprint')
+                             != self.fingerprint):
+            log.warning(f'Warning: Checkpoint {self.journal} was written '
+                        + 'with different arguments: starting from the '
+                        + 'beginning')
+            return {}
+
+        return {rec['benchmark']: {'sha256': rec['sha256'],
+                                   'result': rec['result']}
+                for rec in records[1:] if 'benchmark' in rec}
+
+    def lookup(self, bench, path):
+        """Return the journalled result of benchmark "bench", or None if
+           there is none or its executable "path" has changed."""
+        entry = self.entries.get(bench)
+        if (entry is None) or (not os.path.isfile(path)):
+            return None
+        if entry['sha256'] != file_digest(path):
+            return None
+        return entry['result']
+
+    def record(self, bench, path, result):
+        """Append "result" for benchmark "bench", with executable "path", to
+           the journal and make sure it is on disk.  Failure to write is not
+           an error, but no more results are written."""
+        entry = {'sha256': file_digest(path), 'result': result}
+        self.entries[bench] = entry
+        if self.journal is None:
+            return
+
+        try:
+            with open(self.journal, 'a') as fileh:
+                fileh.write(json.dumps({'benchmark': bench, **entry}) + '\n')
+                fileh.flush()
+                os.fsync(fileh.fileno())
+        except OSError as error:
+            log.warning(f'Warning: Unable to write checkpoint {self.journal}: '
+                        + f'{error}')
+            self.journal = None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Compile time measurement procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench compile time measurement.
+
+When the benchmarks are built with compile_times=1, sconstruct.py runs each
+compilation and link through this script, as
+
+    python3 embench_compile.py RECORD COMMAND...
+
+which runs COMMAND and writes a JSON record to RECORD of its elapsed time,
+the processor time used by it and all the processes it ran (the compiler
+driver runs the compiler proper, assembler and linker), and the peak
+resident set size of any of them.  The record is written beside the file
+built, with the suffix ".time".
+
+The remaining functions read the records back for benchmark_compile.py.
+"""
+
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where only the elapsed time is recorded
+    resource = None
+
+
+# What we export
+
+__all__ = [
+    'COMPILE_TIME_SUFFIX',
+    'COMPILE_METRICS',
+    'run_timed',
+    'read_time_record',
+    'benchmark_compile_time',
+]
+
+# Suffix of the record written beside each file built
+COMPILE_TIME_SUFFIX = '.time'
+
+# The measurements of each benchmark: processor time in milliseconds to
+# compile its objects and to link it, and the peak memory used in kilobytes
+COMPILE_METRICS = ['compile', 'link', 'memory']
+
+
+def run_timed(record, cmd):
+    """Run "cmd", writing its time and memory use to "record".  Return the
+       exit code of "cmd"."""
+    start = time.perf_counter()
+    res = subprocess.run(cmd)
+    elapsed = time.perf_counter() - start
+
+    data = {'elapsed': elapsed, 'cpu': elapsed, 'maxrss': None}
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        data['cpu'] = usage.ru_utime + usage.ru_stime
+        # Bytes on macOS, kilobytes elsewhere
+        if sys.platform == 'darwin':
+            data['maxrss'] = usage.ru_maxrss // 1024
+        else:
+            data['maxrss'] = usage.ru_maxrss
+
+    if res.returncode == 0:
+        with open(record, 'w') as fileh:
+            json.dump(data, fileh)
+    elif os.path.exists(record):
+        os.remove(record)
+
+    return res.returncode
+
+
+def read_time_record(record):
+    """Read the time record "record".  Return a dictionary of its elapsed
+       and processor time in seconds and peak memory in kilobytes, or None if
+       it can't be read."""
+    try:
+        with open(record, 'r') as fileh:
+            return json.load(fileh)
+    except (OSError, ValueError):
+        return None
+
+
+def benchmark_compile_time(bench_dir, appexe, elapsed=False):
+    """Sum the time to compile the objects in "bench_dir" and to link them
+       to "appexe", either the processor time or if "elapsed" is True the
+       elapsed time.  Return a dictionary of the times in milliseconds and
+       the peak memory in kilobytes, or None if there are no records."""
+    key = 'elapsed' if elapsed else 'cpu'
+    link = read_time_record(appexe + COMPILE_TIME_SUFFIX)
+    objects = [read_time_record(record) for record in sorted(
+        glob.glob(os.path.join(bench_dir, '*' + COMPILE_TIME_SUFFIX)))
+               if record != appexe + COMPILE_TIME_SUFFIX]
+    if (link is None) or (not objects) or (None in objects):
+        return None
+
+    records = objects + [link]
+    memory = [r['maxrss'] for r in records if r['maxrss'] is not None]
+    return {
+        'compile': 1000.0 * sum(r[key] for r in objects),
+        'link': 1000.0 * link[key],
+        'memory': max(memory) if memory else 0,
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(f'Usage: {sys.argv[0]} RECORD COMMAND...', file=sys.stderr)
+        sys.exit(2)
+    sys.exit(run_timed(sys.argv[1], sys.argv[2:]))
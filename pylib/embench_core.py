@@ -18,6 +18,7 @@ This version is suitable when using a version of GDB which can launch a GDB
 server to use as a target.
 """
 
+import json
 import logging
 import math
 import os
@@ -38,7 +39,10 @@ __all__ = [
     'log_args',
     'log_benchmarks',
     'embench_stats',
+    'read_benchmark_info',
+    'embench_sub_scores',
     'arglist_to_str',
+    'Results',
 ]
 
 # Handle for the logger
@@ -54,6 +58,7 @@ class output_format(Enum):
     MD = 3
     CSV = 4
     BASELINE = 5
+    JSONL = 6
 
 
 # Make sure we have new enough python
@@ -124,14 +129,20 @@ def log_args(args):
     log.debug('')
 
 
+def setup_benchmark_dirs():
+    """Set up global parameters for the source benchmark directory, and for
+       the benchmark directory of the build directory gp['bd']."""
+    gp['benchdir'] = os.path.join(gp['rootdir'], 'src')
+    gp['bd_benchdir'] = os.path.join(gp['bd'], 'src')
+
+
 def find_benchmarks():
     """Enumerate all the benchmarks in alphabetical order.  The benchmarks are
        found in the 'src' subdirectory of the root directory.  Set up global
        parameters for the source and build benchmark directories.
 
        Return the list of benchmarks."""
-    gp['benchdir'] = os.path.join(gp['rootdir'], 'src')
-    gp['bd_benchdir'] = os.path.join(gp['bd'], 'src')
+    setup_benchmark_dirs()
     dirlist = os.listdir(gp['benchdir'])
 
     benchmarks = []
@@ -234,6 +245,121 @@ def embench_stats(benchmarks, raw_data, rel_data):
     return geomean, geosd, georange
 
 
+class Results:
+    """The results of measuring a set of benchmarks, as returned by
+       measure_size () in benchmark_size.py and measure_speed () in
+       benchmark_speed.py.
+
+       "kind" is "size" or "speed".  "benchmarks" lists the benchmarks
+       measured successfully, "raw" holds the absolute result of each (bytes
+       or milliseconds), "relative" the result of each relative to the
+       baseline (empty if absolute results were requested) and "details"
+       anything else measured for each, such as section sizes or the times
+       of repeated runs.  "geomean", "geosd" and "georange" summarize the
+       relative results, or the absolute ones if they were requested, and
+       are None if any benchmark failed, in which case "successful" is
+       false.  "extra" holds any other summary results."""
+
+    def __init__(self, kind, benchmarks, raw, relative, details, successful):
+        self.kind = kind
+        self.benchmarks = benchmarks
+        self.raw = raw
+        self.relative = relative
+        self.details = details
+        self.successful = successful
+        self.geomean = None
+        self.geosd = None
+        self.georange = None
+        self.extra = {}
+
+    def as_dict(self):
+        """The results as a dictionary, suitable for conversion to JSON."""
+        return {
+            'kind': self.kind,
+            'successful': self.successful,
+            'benchmarks': self.benchmarks,
+            'raw': self.raw,
+            'relative': self.relative,
+            'details': self.details,
+            'geometric mean': self.geomean,
+            'geometric standard deviation': self.geosd,
+            'geometric range': self.georange,
+            **self.extra,
+        }
+
+
+def read_benchmark_info(info_file):
+    """Read the JSON file "info_file" describing the benchmarks: a
+       dictionary indexed by benchmark of dictionaries, each with an
+       optional "category" name and "weight", a non-negative number.
+       Return the dictionary, or raise ValueError if the file is not of
+       this form or OSError if it can't be read."""
+    with open(info_file, 'r') as fileh:
+        info = json.load(fileh)
+
+    if not isinstance(info, dict):
+        raise ValueError('not a dictionary of benchmarks')
+    for bench, entry in info.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f'entry for {bench} is not a dictionary')
+        weight = entry.get('weight', 1)
+        # bool is a subclass of int, but true is not a weight
+        if (isinstance(weight, bool) or not isinstance(weight, (int, float))
+                or (weight < 0)):
+            raise ValueError(f'weight of {bench} is not a non-negative '
+                             + 'number')
+
+    return info
+
+
+def compute_weighted_geomean(benchmarks, raw_data, rel_data, weights):
+    """Compute the geometric mean of the supplied benchmarks, raw and
+       optionally relative data, with each benchmark's logarithm weighted
+       by "weights".  Zero values and weights are ignored.  Return the
+       geometric mean, or None if there are no data."""
+    data = raw_data if gp['absolute'] else rel_data
+    total = 0.0
+    lnsum = 0.0
+    for bench in benchmarks:
+        if (bench in data) and (data[bench] > 0) and (weights[bench] > 0):
+            total += weights[bench]
+            lnsum += weights[bench] * math.log(data[bench])
+
+    if total == 0.0:
+        return None
+
+    return math.exp(lnsum / total)
+
+
+def embench_sub_scores(benchmarks, raw_data, rel_data, info):
+    """Compute the scores of a workload mix, using the categories and
+       weights of the benchmarks in "info", as read by
+       read_benchmark_info ().  Benchmarks not in "info" have weight 1 and
+       no category.  Return a dictionary with the weighted geometric mean
+       of all the benchmarks as "weighted", and a dictionary of the
+       weighted geometric mean of the benchmarks in each category as
+       "categories"."""
+    weights = {bench: info.get(bench, {}).get('weight', 1)
+               for bench in benchmarks}
+    categories = {}
+    for bench in benchmarks:
+        category = info.get(bench, {}).get('category')
+        if category is not None:
+            categories.setdefault(category, []).append(bench)
+
+    sub_scores = {
+        'weighted': compute_weighted_geomean(benchmarks, raw_data, rel_data,
+                                             weights),
+        'categories': {},
+    }
+    for category, members in sorted(categories.items()):
+        score = compute_weighted_geomean(members, raw_data, rel_data, weights)
+        if score is not None:
+            sub_scores['categories'][category] = score
+
+    return sub_scores
+
+
 def arglist_to_str(arglist):
     """Make arglist into a string"""
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+# Common ELF procedures for use across Embench.
+
+# Copyright (C) 2017, 2019, 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench ELF procedures.
+
+Classification of ELF sections into the categories used for size
+measurement, and reading of relocatable objects (including members of static
+archives) so that references between input sections can be followed.
+"""
+
+import io
+import os
+
+from elftools.common.exceptions import ELFError
+from elftools.elf import elffile as elf
+from elftools.elf.constants import SH_FLAGS as FLAGS
+
+
+# What we export
+
+__all__ = [
+    'DEFAULT_FLAGS_ELF',
+    'ALL_CATEGORIES',
+    'section_category',
+    'read_archive_member',
+    'read_object',
+    'object_references',
+    'file_category_map',
+    'elf_size_breakdown',
+    'entry_address',
+    'is_elf',
+]
+
+# The default section flags and types used to associate a section with a
+# category.
+DEFAULT_FLAGS_ELF = {
+    'text': ({int(FLAGS.SHF_ALLOC | FLAGS.SHF_EXECINSTR)}, 'SHT_PROGBITS'),
+    'rodata': ({int(FLAGS.SHF_ALLOC)}, 'SHT_PROGBITS'),
+    'data': ({
+        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE),
+        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE | FLAGS.SHF_EXECINSTR)
+    }, 'SHT_PROGBITS'),
+    'bss': ({
+        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE),
+        int(FLAGS.SHF_ALLOC | FLAGS.SHF_WRITE | FLAGS.SHF_EXECINSTR)
+    }, 'SHT_NOBITS'),
+}
+
+ALL_CATEGORIES = ['text', 'rodata', 'data', 'bss']
+
+# Sections whose relocations do not represent a use of the code or data they
+# refer to.  Unwind tables and debug information refer to every function.
+NON_REFERENCING_PREFIXES = (
+    '.eh_frame', '.debug', '.zdebug', '.ARM.exidx', '.ARM.extab',
+    '.comment', '.note', '.stab', '.riscv.attributes', '.ARM.attributes',
+)
+
+
+def section_category(section):
+    """Return the size category ("text", "rodata", "data" or "bss") of an
+       ELF section, or None if it doesn't count towards any category."""
+    for category in ALL_CATEGORIES:
+        flags_list, sh_type = DEFAULT_FLAGS_ELF[category]
+        if ((section['sh_flags'] in flags_list)
+                and (section['sh_type'] == sh_type)):
+            return category
+
+    return None
+
+
+def read_archive_member(archive, member):
+    """Return the contents of "member" from the static archive "archive" as
+       bytes, or None if it can't be found.  Both the GNU and BSD conventions
+       for long member names are understood."""
+    try:
+        with open(archive, 'rb') as fileh:
+            data = fileh.read()
+    except OSError:
+        return None
+
+    if not data.startswith(b'!<arch>\n'):
+        return None
+
+    longnames = b''
+    pos = 8
+    while pos + 60 <= len(data):
+        header = data[pos:pos + 60]
+        name = header[0:16].decode('ascii', 'replace').rstrip()
+        size = int(header[48:58].decode('ascii').strip() or 0)
+        body = data[pos + 60:pos + 60 + size]
+
+        if name == '//':
+            longnames = body
+        elif name.startswith('#1/'):
+            # BSD: the name is at the start of the body
+            namelen = int(name[3:])
+            name = body[:namelen].decode('utf-8', 'replace').rstrip('\0')
+            body = body[namelen:]
+        elif name.startswith('/') and name[1:].isdigit():
+            # GNU: offset into the long name table
+            offset = int(name[1:])
+            end = longnames.find(b'\n', offset)
+            name = longnames[offset:end].decode('utf-8', 'replace')
+
+        if name not in ('/', '//', '/SYM64/', '__.SYMDEF', '__.SYMDEF SORTED'):
+            if name.rstrip('/') == member:
+                return body
+
+        # Members are aligned to an even boundary
+        pos += 60 + size + (size & 1)
+
+    return None
+
+
+def read_object(path, member=None):
+    """Return the pyelftools ELFFile for the relocatable object "path" (or
+       "member" of the archive "path"), or None if it can't be read."""
+    if member:
+        data = read_archive_member(path, member)
+    else:
+        try:
+            with open(path, 'rb') as fileh:
+                data = fileh.read()
+        except OSError:
+            data = None
+
+    if not data or not data.startswith(b'\x7fELF'):
+        return None
+
+    try:
+        return elf.ELFFile(io.BytesIO(data))
+    except ELFError:
+        return None
+
+
+def object_references(obj):
+    """Analyse the relocatable ELF object "obj".
+
+       Return a tuple of three items:
+       - the set of names of sections in the object;
+       - a dictionary of the global symbols it defines, mapping each symbol
+         name to the name of its section; and
+       - a dictionary mapping each section name to the set of things its
+         relocations refer to.  Each reference is either ('section', name)
+         for a section of this object, or ('symbol', name) for a global
+         symbol which must be resolved against all the objects linked."""
+    sections = {}
+    for index, section in enumerate(obj.iter_sections()):
+        sections[index] = section.name
+
+    symtab = obj.get_section_by_name('.symtab')
+    defined = {}
+    if symtab is not None:
+        for sym in symtab.iter_symbols():
+            if ((sym['st_info']['bind'] in ('STB_GLOBAL', 'STB_WEAK'))
+                    and isinstance(sym['st_shndx'], int)):
+                # A strong definition takes precedence over a weak one
+                if ((sym.name not in defined)
+                        or (sym['st_info']['bind'] == 'STB_GLOBAL')):
+                    defined[sym.name] = sections[sym['st_shndx']]
+
+    references = {}
+    for section in obj.iter_sections():
+        if section['sh_type'] not in ('SHT_REL', 'SHT_RELA'):
+            continue
+        target = sections.get(section['sh_info'])
+        if (target is None) or target.startswith(NON_REFERENCING_PREFIXES):
+            continue
+        relsymtab = obj.get_section(section['sh_link'])
+        refs = references.setdefault(target, set())
+        for reloc in section.iter_relocations():
+            if reloc['r_info_sym'] == 0:
+                continue
+            sym = relsymtab.get_symbol(reloc['r_info_sym'])
+            if ((sym['st_info']['bind'] == 'STB_LOCAL')
+                    and isinstance(sym['st_shndx'], int)):
+                refs.add(('section', sections[sym['st_shndx']]))
+            elif sym.name:
+                refs.add(('symbol', sym.name))
+
+    return set(sections.values()), defined, references
+
+
+def file_category_map(path):
+    """Return a dictionary mapping the name of every section in the ELF
+       executable "path" to its size category (or None)."""
+    with open(path, 'rb') as fileh:
+        binary = elf.ELFFile(fileh)
+        return {sec.name: section_category(sec)
+                for sec in binary.iter_sections()}
+
+
+def elf_size_breakdown(appexe):
+    """Compute the total size of each category of section in the ELF file
+       "appexe", and the size of each function and data object within each
+       category.  Returns a dictionary with the category sizes under
+       "categories" and a dictionary of symbol sizes for each category under
+       "symbols"."""
+    categories = {category: 0 for category in ALL_CATEGORIES}
+    symbols = {category: {} for category in ALL_CATEGORIES}
+
+    with open(appexe, 'rb') as fileh:
+        binary = elf.ELFFile(fileh)
+        sec_categories = []
+        for section in binary.iter_sections():
+            category = section_category(section)
+            sec_categories.append(category)
+            if category:
+                categories[category] += section['sh_size']
+
+        symtab = binary.get_section_by_name('.symtab')
+        if symtab is not None:
+            for sym in symtab.iter_symbols():
+                if ((sym['st_size'] == 0)
+                        or not isinstance(sym['st_shndx'], int)
+                        or (sym['st_info']['type'] not in ('STT_FUNC',
+                                                           'STT_OBJECT'))):
+                    continue
+                category = sec_categories[sym['st_shndx']]
+                if category:
+                    cat_syms = symbols[category]
+                    cat_syms[sym.name] = (cat_syms.get(sym.name, 0)
+                                          + sym['st_size'])
+
+    return {'categories': categories, 'symbols': symbols}
+
+
+def entry_address(path):
+    """Return the entry point address of the ELF executable "path"."""
+    with open(path, 'rb') as fileh:
+        return elf.ELFFile(fileh).header['e_entry']
+
+
+def is_elf(path):
+    """Return True if "path" starts with the ELF magic identifier."""
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as fileh:
+        return fileh.read(4) == b'\x7fELF'
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+# History of results for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench history of results.
+
+Each run of benchmark_size.py and benchmark_speed.py is recorded in an SQLite
+database, with the commit of the repository, how the programs were built (as
+recorded by sconstruct.py in build-info.json in the build directory), the
+arguments and the result of each benchmark.  Speed results are recorded as
+the time in milliseconds divided by the scale factor, with the time of every
+run if there were several, so that results with different scale factors are
+comparable.  Size results are recorded in bytes.  In both, larger is worse.
+
+Runs are grouped into series: those of the same kind, built with the same
+compiler command and flags and measured in the same way.  A series may
+contain results from different versions of the compiler and of Embench,
+which is the point: change_points () finds where the results of each
+benchmark in a series step up or down, for benchmark_history.py to report.
+"""
+
+import datetime
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+
+from embench_core import log
+
+
+# What we export
+
+__all__ = [
+    'HISTORY_FILE',
+    'CHANGE_THRESHOLD',
+    'record_run',
+    'load_series',
+    'change_points',
+]
+
+# Default name of the database, in the log directory
+HISTORY_FILE = 'history.db'
+
+# Default smallest step, as a fraction, which is reported as a change
+CHANGE_THRESHOLD = 0.02
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    series TEXT NOT NULL,
+    commit_id TEXT,
+    compiler TEXT,
+    flags TEXT,
+    target_module TEXT,
+    builddir TEXT,
+    arguments TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    benchmark TEXT NOT NULL,
+    value REAL NOT NULL,
+    relative REAL,
+    PRIMARY KEY (run_id, benchmark)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    benchmark TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, benchmark, seq)
+);
+'''
+
+
+def commit_id():
+    """The commit of the Embench repository, marked if it has been modified,
+       or None if it is not a git repository."""
+    rootdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        res = subprocess.run(['git', 'describe', '--always', '--dirty',
+                              '--abbrev=40'], cwd=rootdir,
+                             capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return res.stdout.strip() if res.returncode == 0 else None
+
+
+def build_info(bd):
+    """How the programs in build directory "bd" were built, as written by
+       sconstruct.py, or an empty dictionary if not known."""
+    try:
+        with open(os.path.join(bd, 'build-info.json'), 'r') as fileh:
+            return json.load(fileh)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_run(dbfile, kind, bd, config, results, samples=None,
+               arguments=None):
+    """Record a run of kind "kind" ("size" or "speed") of the programs in
+       build directory "bd" in the database "dbfile".  "config" is a
+       dictionary of how the results were measured, which with how the
+       programs were built identifies the series.  "results" is a dictionary
+       of (value, relative value) tuples, and "samples" an optional
+       dictionary of lists of values, indexed by benchmark.  "arguments" is
+       the namespace of arguments.  Failure to record is not an error."""
+    info = build_info(bd)
+    flags = {var: info.get(var, '') for var in ('cflags', 'ldflags',
+                                                 'user_libs')}
+    series = json.dumps({'kind': kind, 'cc': info.get('cc', ''), **flags,
+                         **config}, sort_keys=True, default=str)
+    arguments = json.dumps(vars(arguments) if arguments else {},
+                           sort_keys=True, default=str)
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(dbfile)), exist_ok=True)
+        conn = sqlite3.connect(dbfile)
+    except (OSError, sqlite3.Error) as error:
+        log.warning(f'Warning: Unable to record results in {dbfile}: {error}')
+        return
+
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+            cur = conn.execute(
+                'INSERT INTO runs (time, kind, series, commit_id, compiler, '
+                + 'flags, target_module, builddir, arguments) '
+                + 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (datetime.datetime.now(datetime.timezone.utc).isoformat(
+                    timespec='seconds'), kind, series, commit_id(),
+                 info.get('compiler'), json.dumps(flags, sort_keys=True),
+                 config.get('target_module'), os.path.abspath(bd), arguments))
+            run_id = cur.lastrowid
+            conn.executemany(
+                'INSERT INTO results (run_id, benchmark, value, relative) '
+                + 'VALUES (?, ?, ?, ?)',
+                [(run_id, bench, value, relative)
+                 for bench, (value, relative) in results.items()])
+            conn.executemany(
+                'INSERT INTO samples (run_id, benchmark, seq, value) '
+                + 'VALUES (?, ?, ?, ?)',
+                [(run_id, bench, seq, value)
+                 for bench, values in (samples or {}).items()
+                 for seq, value in enumerate(values)])
+    except sqlite3.Error as error:
+        log.warning(f'Warning: Unable to record results in {dbfile}: {error}')
+        return
+    finally:
+        conn.close()
+
+    log.debug(f'Results recorded in {dbfile} as run {run_id}')
+
+
+def load_series(dbfile, kind):
+    """Load the results of kind "kind" from the database "dbfile".  Return a
+       dictionary indexed by series and then benchmark of the list of
+       results in the order they were recorded, each a dictionary of the run
+       "id", "time", "commit", "compiler" and result "value".  Raise
+       sqlite3.Error if the database can't be read."""
+    conn = sqlite3.connect(f'file:{dbfile}?mode=ro', uri=True)
+    try:
+        rows = conn.execute(
+            'SELECT runs.id, runs.time, runs.series, runs.commit_id, '
+            + 'runs.compiler, results.benchmark, results.value '
+            + 'FROM runs JOIN results ON results.run_id = runs.id '
+            + 'WHERE runs.kind = ? ORDER BY runs.id', (kind,)).fetchall()
+    finally:
+        conn.close()
+
+    series = {}
+    for run_id, time, key, commit, compiler, bench, value in rows:
+        series.setdefault(key, {}).setdefault(bench, []).append(
+            {'id': run_id, 'time': time, 'commit': commit,
+             'compiler': compiler, 'value': value})
+    return series
+
+
+def change_points(values, threshold=CHANGE_THRESHOLD, min_segment=1,
+                  offset=0.0):
+    """Find the step changes in the series of positive "values", by binary
+       segmentation of their logarithms, after adding "offset" to each, so
+       that a series including zero may be used with an offset of 1.  A
+       segment is split where that most reduces the sum of squared
+       deviations from the segment means, if the reduction is significant
+       compared to the noise (using the Bayesian information criterion),
+       the step is at least "threshold" as a fraction, and each part has at
+       least "min_segment" values.  The noise is estimated from the
+       differences between successive values, which a few steps hardly
+       affect, but is taken to be at least half the threshold, since
+       results which are mostly identical, such as sizes, would otherwise
+       make any step significant.  Return a sorted list of the indices at
+       which new segments start."""
+    logs = [math.log(value + offset) for value in values]
+    count = len(logs)
+    if count < 2 * min_segment:
+        return []
+
+    diffs = [abs(later - earlier) for earlier, later in zip(logs, logs[1:])]
+    sigma = max(statistics.median(diffs) / (0.6745 * math.sqrt(2)),
+                math.log1p(threshold) / 2)
+    penalty = 2 * sigma * sigma * math.log(count)
+
+    prefix = [0.0]
+    for value in logs:
+        prefix.append(prefix[-1] + value)
+
+    points = []
+    segments = [(0, count)]
+    while segments:
+        start, end = segments.pop()
+        best = None
+        for split in range(start + min_segment, end - min_segment + 1):
+            left = (prefix[split] - prefix[start]) / (split - start)
+            right = (prefix[end] - prefix[split]) / (end - split)
+            gain = ((split - start) * (end - split) / (end - start)
+                    * (right - left) ** 2)
+            if (best is None) or (gain > best[0]):
+                best = (gain, split, right - left)
+        if ((best is not None) and (best[0] > penalty)
+                and (abs(best[2]) >= math.log1p(threshold))):
+            points.append(best[1])
+            segments.append((start, best[1]))
+            segments.append((best[1], end))
+
+    return sorted(points)
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+
+# Instruction mix procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench static instruction mix analysis.
+
+Disassemble the functions of an ELF executable, either with objdump or with
+a built in decoder for RISC-V, find the functions reachable by direct calls
+and jumps from a root function and classify their instructions.
+"""
+
+import re
+import subprocess
+
+from elftools.elf import elffile as elf
+from elftools.elf.constants import SH_FLAGS as FLAGS
+
+from embench_core import log
+
+
+# What we export
+
+__all__ = [
+    'INSN_CLASSES',
+    'elf_machine',
+    'disassemble_objdump',
+    'disassemble_riscv',
+    'reachable_functions',
+    'instruction_mix',
+]
+
+# The instruction classes reported, in reporting order.
+INSN_CLASSES = [
+    'load',
+    'store',
+    'branch',
+    'jump',
+    'muldiv',
+    'alu',
+    'fp',
+    'vector',
+    'bitmanip',
+    'atomic',
+    'system',
+    'other',
+]
+
+OBJDUMP_FUNC_RE = re.compile(r'^([0-9a-fA-F]+) <(.+)>:\s*$')
+OBJDUMP_INSN_RE = re.compile(
+    r'^\s*([0-9a-fA-F]+):\s+((?:[0-9a-fA-F]{2,8} )*[0-9a-fA-F]{2,8})\s*(?:\t\s*(\S+)\s*(.*))?$')
+OBJDUMP_REF_RE = re.compile(r'<([^+>]+)(\+0x[0-9a-fA-F]+)?>')
+
+# RISC-V mnemonics, as printed by objdump with aliases enabled (the default).
+RISCV_BRANCH = {
+    'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu', 'beqz', 'bnez', 'blez',
+    'bgez', 'bltz', 'bgtz', 'bgt', 'ble', 'bgtu', 'bleu',
+}
+RISCV_JUMP = {'j', 'jal', 'jalr', 'jr', 'ret', 'call', 'tail'}
+RISCV_MULDIV = {
+    'mul', 'mulh', 'mulhsu', 'mulhu', 'mulw', 'div', 'divu', 'rem', 'remu',
+    'divw', 'divuw', 'remw', 'remuw',
+}
+RISCV_BITMANIP = {
+    'sh1add', 'sh2add', 'sh3add', 'add.uw', 'sh1add.uw', 'sh2add.uw',
+    'sh3add.uw', 'slli.uw', 'zext.w', 'andn', 'orn', 'xnor', 'clz', 'ctz',
+    'cpop', 'clzw', 'ctzw', 'cpopw', 'max', 'maxu', 'min', 'minu', 'sext.b',
+    'sext.h', 'zext.h', 'rol', 'ror', 'rori', 'rolw', 'rorw', 'roriw',
+    'orc.b', 'rev8', 'brev8', 'clmul', 'clmulh', 'clmulr', 'bclr', 'bclri',
+    'bext', 'bexti', 'binv', 'binvi', 'bset', 'bseti', 'pack', 'packh',
+    'packw', 'zip', 'unzip',
+}
+RISCV_SYSTEM = {
+    'ecall', 'ebreak', 'fence', 'fence.i', 'wfi', 'mret', 'sret', 'uret',
+    'sfence.vma', 'unimp',
+}
+
+# Arm mnemonics (with any ".w" or ".n" suffix removed).
+ARM_CONDS = {
+    'eq', 'ne', 'cs', 'cc', 'hs', 'lo', 'mi', 'pl', 'vs', 'vc', 'hi', 'ls',
+    'ge', 'lt', 'gt', 'le',
+}
+ARM_MULDIV = ('mul', 'mla', 'mls', 'umull', 'smull', 'umlal', 'smlal', 'sdiv',
+              'udiv', 'smul', 'smla', 'smmul', 'smmla')
+ARM_BITMANIP = ('clz', 'rbit', 'rev', 'bfi', 'bfc', 'ubfx', 'sbfx', 'uxt',
+                'sxt')
+ARM_SYSTEM = ('svc', 'mrs', 'msr', 'cps', 'dmb', 'dsb', 'isb', 'wfi', 'wfe',
+              'bkpt', 'sev')
+
+
+def elf_machine(path):
+    """Return a tuple of the ELF machine (e.g. "EM_RISCV") and the word size
+       in bits of the executable "path"."""
+    with open(path, 'rb') as fileh:
+        binary = elf.ELFFile(fileh)
+        return binary['e_machine'], binary.elfclass
+
+
+def classify_riscv(mnemonic):
+    """Classify a RISC-V mnemonic as printed by objdump."""
+    if mnemonic in RISCV_BRANCH:
+        return 'branch'
+    if mnemonic in RISCV_JUMP:
+        return 'jump'
+    if mnemonic in RISCV_MULDIV:
+        return 'muldiv'
+    if mnemonic in RISCV_BITMANIP:
+        return 'bitmanip'
+    if mnemonic in RISCV_SYSTEM or mnemonic.startswith('csr'):
+        return 'system'
+    if mnemonic.startswith(('lr.', 'sc.', 'amo')):
+        return 'atomic'
+    if mnemonic.startswith('v'):
+        return 'vector'
+    if (re.match(r'^f?l[bhwdq]u?$', mnemonic)
+            or mnemonic in ('c.lw', 'c.ld', 'c.lwsp', 'c.ldsp', 'c.lbu',
+                            'c.lhu', 'c.lh')):
+        return 'load'
+    if (re.match(r'^f?s[bhwdq]$', mnemonic)
+            or mnemonic in ('c.sw', 'c.sd', 'c.swsp', 'c.sdsp', 'c.sb',
+                            'c.sh')):
+        return 'store'
+    if mnemonic.startswith('f'):
+        return 'fp'
+
+    return 'alu'
+
+
+def classify_arm(mnemonic):
+    """Classify an Arm (A32, T32 or A64) mnemonic as printed by objdump."""
+    mnemonic = re.sub(r'\.[wn]$', '', mnemonic)
+    if mnemonic.startswith(('ldr', 'ldm', 'ldp', 'ldur', 'pop', 'vldr', 'vld',
+                            'vpop', 'ldrex', 'lda')):
+        return 'load'
+    if mnemonic.startswith(('str', 'stm', 'stp', 'stur', 'push', 'vstr',
+                            'vst', 'vpush', 'strex', 'stl')):
+        return 'store'
+    if ((mnemonic.startswith('b.') or (mnemonic[:1] == 'b'
+                                       and mnemonic[1:] in ARM_CONDS))
+            or mnemonic in ('cbz', 'cbnz', 'tbz', 'tbnz', 'tbb', 'tbh')):
+        return 'branch'
+    if mnemonic in ('b', 'bl', 'bx', 'blx', 'br', 'blr', 'ret'):
+        return 'jump'
+    if mnemonic.startswith(ARM_MULDIV):
+        return 'muldiv'
+    if mnemonic.startswith(ARM_BITMANIP):
+        return 'bitmanip'
+    if mnemonic.startswith(ARM_SYSTEM):
+        return 'system'
+    if mnemonic.startswith('v'):
+        return 'fp'
+
+    return 'alu'
+
+
+def classify_mnemonic(machine, mnemonic):
+    """Classify "mnemonic" for the ELF machine "machine".  Instructions of
+       machines we don't know about are all "other"."""
+    if machine == 'EM_RISCV':
+        return classify_riscv(mnemonic)
+    if machine in ('EM_ARM', 'EM_AARCH64'):
+        return classify_arm(mnemonic)
+
+    return 'other'
+
+
+def compressed_size(machine):
+    """Return the size in bytes of the short encoding of "machine" (the C
+       extension for RISC-V, 16 bit Thumb for Arm), or None."""
+    if machine in ('EM_RISCV', 'EM_ARM'):
+        return 2
+
+    return None
+
+
+def disassemble_objdump(objdump, path, machine):
+    """Disassemble the executable "path" with the "objdump" command.  Return
+       a dictionary indexed by function name of a tuple of a list of
+       (size, class) for each instruction, and a set of the functions it
+       calls or jumps to.  Return None if objdump can't be run."""
+    try:
+        res = subprocess.run([objdump, '-d', '-w', path],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             check=True)
+    except (OSError, subprocess.CalledProcessError) as error:
+        log.warning(f'Warning: unable to run {objdump}: {error}')
+        return None
+
+    functions = {}
+    insns = None
+    callees = None
+    func = None
+    for line in res.stdout.decode('utf-8', 'replace').splitlines():
+        match = OBJDUMP_FUNC_RE.match(line)
+        if match:
+            func = match.group(2)
+            insns, callees = functions.setdefault(func, ([], set()))
+            continue
+        match = OBJDUMP_INSN_RE.match(line)
+        if (not match) or (insns is None):
+            continue
+
+        nbytes = len(match.group(2).replace(' ', '')) // 2
+        if match.group(3) is None:
+            # A continuation of the bytes of the previous instruction
+            if insns:
+                size, iclass = insns[-1]
+                insns[-1] = (size + nbytes, iclass)
+            continue
+
+        insns.append((nbytes, classify_mnemonic(machine, match.group(3))))
+        for ref in OBJDUMP_REF_RE.finditer(match.group(4)):
+            if ref.group(1) != func:
+                callees.add(ref.group(1))
+
+    return functions
+
+
+def sign_extend(value, bits):
+    """Sign extend the "bits" bit value "value"."""
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+def decode_riscv16(insn, xlen):
+    """Classify a 16 bit RISC-V instruction.  Return a tuple of its class and
+       the offset of a jump target, or None."""
+    quadrant = insn & 0x3
+    funct3 = (insn >> 13) & 0x7
+
+    if quadrant == 0:
+        if funct3 == 0:
+            return 'alu', None
+        if funct3 == 4:
+            # Zcb byte and halfword loads and stores: bit 11 separates the
+            # stores (c.sb and c.sh) from the loads
+            return ('store' if insn & 0x0800 else 'load'), None
+        return ('load' if funct3 < 4 else 'store'), None
+
+    if quadrant == 1:
+        if (funct3 == 5) or ((funct3 == 1) and (xlen == 32)):
+            # c.j and c.jal
+            offset = (((insn >> 1) & 0x800) | ((insn >> 7) & 0x10)
+                      | ((insn >> 1) & 0x300) | ((insn << 2) & 0x400)
+                      | ((insn >> 1) & 0x40) | ((insn << 1) & 0x80)
+                      | ((insn >> 2) & 0xe) | ((insn << 3) & 0x20))
+            return 'jump', sign_extend(offset, 12)
+        if funct3 in (6, 7):
+            return 'branch', None
+        if (funct3 == 4) and ((insn >> 10) & 0x3f) == 0x27 \
+                and ((insn >> 5) & 0x3) == 2:
+            # Zcb c.mul
+            return 'muldiv', None
+        return 'alu', None
+
+    # Quadrant 2
+    if funct3 == 4:
+        rs1 = (insn >> 7) & 0x1f
+        rs2 = (insn >> 2) & 0x1f
+        if rs2 == 0:
+            if (insn & 0x1000) and rs1 == 0:
+                return 'system', None
+            return 'jump', None
+        return 'alu', None
+    if funct3 == 0:
+        return 'alu', None
+    return ('load' if funct3 < 4 else 'store'), None
+
+
+def decode_riscv32(insn):
+    """Classify a 32 bit RISC-V instruction.  Return a tuple of its class and
+       the offset of a jump target, or None."""
+    opcode = insn & 0x7f
+    funct3 = (insn >> 12) & 0x7
+    funct7 = insn >> 25
+
+    if opcode == 0x03:
+        return 'load', None
+    if opcode in (0x07, 0x27):
+        # Floating point loads and stores share encodings with vector
+        if funct3 in (1, 2, 3, 4):
+            return ('load' if opcode == 0x07 else 'store'), None
+        return 'vector', None
+    if opcode == 0x23:
+        return 'store', None
+    if opcode == 0x63:
+        return 'branch', None
+    if opcode == 0x6f:
+        offset = (((insn >> 11) & 0x100000) | (insn & 0xff000)
+                  | ((insn >> 9) & 0x800) | ((insn >> 20) & 0x7fe))
+        return 'jump', sign_extend(offset, 21)
+    if opcode == 0x67:
+        return 'jump', None
+    if opcode in (0x33, 0x3b):
+        if funct7 == 0x01:
+            return 'muldiv', None
+        if ((funct7 in (0x05, 0x30, 0x14, 0x24, 0x34))
+                or ((funct7 == 0x20) and funct3 in (4, 6, 7))
+                or ((funct7 == 0x10) and funct3 in (2, 4, 6))
+                or ((funct7 == 0x04) and funct3 in (0, 4, 7))):
+            return 'bitmanip', None
+        return 'alu', None
+    if opcode in (0x13, 0x1b):
+        imm_hi = funct7
+        if ((funct3 == 1) and (imm_hi in (0x30, 0x14, 0x24, 0x34)
+                               or (imm_hi >> 1) == 0x02)):
+            return 'bitmanip', None
+        if (funct3 == 5) and (imm_hi in (0x30, 0x14, 0x24, 0x34, 0x35)
+                              or (imm_hi >> 1) == 0x18):
+            return 'bitmanip', None
+        return 'alu', None
+    if opcode in (0x37, 0x17):
+        return 'alu', None
+    if opcode == 0x2f:
+        return 'atomic', None
+    if opcode in (0x73, 0x0f):
+        return 'system', None
+    if opcode in (0x53, 0x43, 0x47, 0x4b, 0x4f):
+        return 'fp', None
+    if opcode == 0x57:
+        return 'vector', None
+
+    return 'other', None
+
+
+def disassemble_riscv(path):
+    """Disassemble the RISC-V executable "path" with the built in decoder.
+       Return a dictionary in the same form as disassemble_objdump."""
+    with open(path, 'rb') as fileh:
+        binary = elf.ELFFile(fileh)
+        xlen = binary.elfclass
+
+        # The start address of every function, and the bytes of each
+        # executable section.
+        code = []
+        for section in binary.iter_sections():
+            if ((section['sh_flags'] & FLAGS.SHF_EXECINSTR)
+                    and section['sh_type'] == 'SHT_PROGBITS'):
+                code.append((section['sh_addr'], section.data()))
+
+        symbols = []
+        symtab = binary.get_section_by_name('.symtab')
+        if symtab is not None:
+            for sym in symtab.iter_symbols():
+                if ((sym['st_info']['type'] == 'STT_FUNC')
+                        and isinstance(sym['st_shndx'], int)):
+                    symbols.append((sym['st_value'], sym['st_size'],
+                                    sym.name))
+
+    symbols.sort()
+    by_addr = {addr: name for addr, _, name in symbols}
+    functions = {}
+
+    for index, (start, size, name) in enumerate(symbols):
+        if size == 0:
+            if index + 1 < len(symbols):
+                size = symbols[index + 1][0] - start
+        data = None
+        for sec_addr, sec_data in code:
+            if sec_addr <= start < sec_addr + len(sec_data):
+                data = sec_data[start - sec_addr:start - sec_addr + size]
+                break
+        if data is None:
+            continue
+
+        insns = []
+        callees = set()
+        auipc = {}
+        pos = 0
+        while pos + 2 <= len(data):
+            pc = start + pos
+            half = int.from_bytes(data[pos:pos + 2], 'little')
+            if (half & 0x3) != 0x3:
+                iclass, offset = decode_riscv16(half, xlen)
+                nbytes = 2
+            elif pos + 4 <= len(data):
+                insn = int.from_bytes(data[pos:pos + 4], 'little')
+                iclass, offset = decode_riscv32(insn)
+                nbytes = 4
+                rd = (insn >> 7) & 0x1f
+                if (insn & 0x7f) == 0x17:
+                    # Remember auipc results, to resolve auipc/jalr pairs
+                    auipc[rd] = pc + sign_extend(insn & 0xfffff000, 32)
+                elif (insn & 0x7f) == 0x67 and ((insn >> 15) & 0x1f) in auipc:
+                    target = (auipc[(insn >> 15) & 0x1f]
+                              + sign_extend(insn >> 20, 12))
+                    if target in by_addr:
+                        callees.add(by_addr[target])
+                elif rd in auipc:
+                    del auipc[rd]
+            else:
+                break
+
+            if offset is not None:
+                target = pc + offset
+                if (target in by_addr) and (by_addr[target] != name):
+                    callees.add(by_addr[target])
+
+            insns.append((nbytes, iclass))
+            pos += nbytes
+
+        functions[name] = (insns, callees)
+
+    return functions
+
+
+def reachable_functions(functions, root):
+    """Return the set of functions reachable from "root" by direct calls and
+       jumps in "functions", as returned by one of the disassemblers."""
+    reached = set()
+    worklist = [root]
+
+    while worklist:
+        func = worklist.pop()
+        if (func in reached) or (func not in functions):
+            continue
+        reached.add(func)
+        worklist.extend(functions[func][1])
+
+    return reached
+
+
+def instruction_mix(functions, machine, root='benchmark'):
+    """Count the static instructions of the functions reachable from "root"
+       by class.  Return a dictionary of counts by class, together with the
+       total under "total" and the number of compressed (short encoding)
+       instructions under "compressed"."""
+    counts = {iclass: 0 for iclass in INSN_CLASSES}
+    counts['total'] = 0
+    counts['compressed'] = 0
+    short = compressed_size(machine)
+
+    for func in sorted(reachable_functions(functions, root)):
+        for size, iclass in functions[func][0]:
+            counts[iclass] += 1
+            counts['total'] += 1
+            if size == short:
+                counts['compressed'] += 1
+
+    return counts
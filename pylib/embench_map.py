@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+# Linker map file procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench linker map file procedures.
+
+Parse the map files written by GNU ld (-Map) and LLVM lld (-Map), attribute
+the bytes of each input section to the part of the build which contributed
+it, and find retained input sections which nothing reachable refers to.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from embench_core import log
+from embench_elf import read_object
+from embench_elf import object_references
+
+
+# What we export
+
+__all__ = [
+    'CONTRIBUTORS',
+    'InputSection',
+    'parse_map_file',
+    'classify_input',
+    'attribute_sizes',
+    'unreferenced_sections',
+]
+
+# The parts of the build to which bytes are attributed, in reporting order.
+CONTRIBUTORS = [
+    'benchmark',
+    'support',
+    'boardsupport',
+    'libc',
+    'libgcc',
+    'libm',
+    'other',
+    'padding',
+]
+
+# Static libraries recognized by name (without any "lib" prefix or ".a"
+# suffix).
+LIBRARY_CONTRIBUTORS = {
+    'c': 'libc',
+    'c_nano': 'libc',
+    'g': 'libc',
+    'g_nano': 'libc',
+    'c_nonshared': 'libc',
+    'picolibc': 'libc',
+    'gcc': 'libgcc',
+    'gcc_eh': 'libgcc',
+    'clang_rt.builtins': 'libgcc',
+    'm': 'libm',
+    'm_nano': 'libm',
+}
+
+# Input sections which the linker always keeps, or which it creates itself.
+# These are the roots from which references are followed.
+KEEP_PREFIXES = (
+    '.init', '.fini', '.ctors', '.dtors', '.preinit_array', '.jcr',
+    '.vectors', '.isr_vector', '.interp', '.plt', '.got', '.dynamic',
+    '.eh_frame', '.gcc_except_table', '.tm_clone_table', '.ARM.exidx',
+    '.ARM.extab', '.note', '.rela', '.rel.',
+)
+
+# An input section: "output" is the name of the output section it was placed
+# in, "file" the object (or archive) it came from, and "member" the archive
+# member, if any.
+InputSection = namedtuple(
+    'InputSection', ['output', 'name', 'address', 'size', 'file', 'member'])
+
+ARCHIVE_RE = re.compile(r'^(.*)\(([^()]+)\)$')
+GNU_OUTPUT_RE = re.compile(r'^(\S+)\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)')
+GNU_INPUT_RE = re.compile(
+    r'^ (\S+)\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)\s*(.*)$')
+GNU_CONT_RE = re.compile(r'^\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)\s*(.*)$')
+LLD_HEADER_RE = re.compile(r'^\s*VMA\s+(LMA\s+)?Size\s+Align\s+Out\s+In\s+Symbol')
+LLD_INPUT_RE = re.compile(r'^(.*):\(([^()]*)\)$')
+
+
+def split_archive(filename):
+    """Split an input file name of the form "archive(member)" into its
+       parts.  Return the file name and member (None if not an archive)."""
+    match = ARCHIVE_RE.match(filename)
+    if match:
+        return match.group(1), match.group(2)
+    return filename, None
+
+
+def parse_gnu_map(lines):
+    """Parse the memory map of a GNU ld map file.  Return a list of input
+       sections."""
+    input_sections = []
+    in_map = False
+    output = None
+    pending = None
+
+    for line in lines:
+        line = line.rstrip('\n')
+        if not in_map:
+            in_map = line.startswith('Linker script and memory map')
+            continue
+        if line.startswith('Cross Reference Table'):
+            break
+        if not line.strip():
+            pending = None
+            continue
+
+        if pending is not None:
+            # The name was too long, so the rest is on this line
+            match = GNU_CONT_RE.match(line)
+            if match:
+                kind, name = pending
+                pending = None
+                if kind == 'output':
+                    output = name
+                    continue
+                addr, size, filename = match.groups()
+                line = f' {name} 0x{addr} 0x{size} {filename}'
+            else:
+                kind, name = pending
+                pending = None
+                if kind == 'output':
+                    # An empty output section
+                    output = name
+
+        if not line[0].isspace():
+            if line.startswith(('LOAD ', 'OUTPUT(', 'START GROUP',
+                                'END GROUP')):
+                continue
+            match = GNU_OUTPUT_RE.match(line)
+            if match:
+                output = match.group(1)
+            elif len(line.split()) == 1:
+                pending = ('output', line.strip())
+            continue
+
+        if line.startswith(' *fill*'):
+            match = GNU_CONT_RE.match(line[len(' *fill*'):])
+            if match and output:
+                input_sections.append(InputSection(
+                    output, '*fill*', int(match.group(1), 16),
+                    int(match.group(2), 16), None, None))
+            continue
+
+        if (line[1] == '*') or line[1].isspace():
+            # Input section descriptions, symbols and assignments
+            continue
+
+        match = GNU_INPUT_RE.match(line)
+        if match:
+            name, addr, size, filename = match.groups()
+            if filename and output:
+                filename, member = split_archive(filename.strip())
+                input_sections.append(InputSection(
+                    output, name, int(addr, 16), int(size, 16), filename,
+                    member))
+        elif len(line.split()) == 1:
+            pending = ('input', line.strip())
+
+    return input_sections
+
+
+def parse_lld_map(lines):
+    """Parse an LLVM lld map file.  Return a list of input sections."""
+    input_sections = []
+    in_col = None
+    sym_col = None
+    num_fields = 0
+    output = None
+
+    for line in lines:
+        line = line.rstrip('\n')
+        if in_col is None:
+            match = LLD_HEADER_RE.match(line)
+            if match:
+                in_col = line.index(' In ') + 1
+                sym_col = line.index(' Symbol') + 1
+                num_fields = 4 if match.group(1) else 3
+            continue
+
+        fields = line.split(None, num_fields)
+        if len(fields) <= num_fields:
+            continue
+        try:
+            addr = int(fields[0], 16)
+            size = int(fields[num_fields - 2], 16)
+        except ValueError:
+            continue
+
+        # The depth of indentation distinguishes output sections, input
+        # sections and symbols.
+        rest = fields[num_fields]
+        col = len(line) - len(rest)
+        if col < in_col:
+            output = rest.strip()
+        elif col < sym_col:
+            match = LLD_INPUT_RE.match(rest.strip())
+            if match and output:
+                filename, member = split_archive(match.group(1))
+                input_sections.append(InputSection(
+                    output, match.group(2), addr, size, filename, member))
+            elif rest.strip().startswith('<internal>'):
+                input_sections.append(InputSection(
+                    output, rest.strip(), addr, size, None, None))
+
+    return input_sections
+
+
+def parse_map_file(mapfile):
+    """Parse the GNU ld or LLVM lld map file "mapfile".  Return a list of
+       input sections, or None if the file can't be read."""
+    try:
+        with open(mapfile, 'r', errors='replace') as fileh:
+            lines = fileh.readlines()
+    except OSError:
+        return None
+
+    for line in lines[:5]:
+        if LLD_HEADER_RE.match(line):
+            return parse_lld_map(lines)
+
+    return parse_gnu_map(lines)
+
+
+def classify_input(isec, bd):
+    """Work out which part of the build in build directory "bd" contributed
+       the input section "isec".  Return one of CONTRIBUTORS."""
+    if isec.file is None:
+        return 'padding' if isec.name == '*fill*' else 'other'
+
+    if isec.member is not None:
+        libname = os.path.basename(isec.file)
+        libname = re.sub(r'^lib', '', re.sub(r'\.a$', '', libname))
+        return LIBRARY_CONTRIBUTORS.get(libname, 'other')
+
+    path = os.path.abspath(isec.file)
+    support_dir = os.path.join(bd, 'support')
+    if (path.startswith(os.path.join(bd, 'src') + os.sep)
+            or path.startswith(os.path.join(support_dir, 'dummy-benchmark')
+                               + os.sep)):
+        return 'benchmark'
+    if path.startswith(support_dir + os.sep):
+        return 'support'
+    if path.startswith(os.path.join(bd, 'config') + os.sep):
+        return 'boardsupport'
+
+    return 'other'
+
+
+def attribute_sizes(input_sections, categories, metrics, bd):
+    """Sum the sizes of "input_sections" by contributor.  "categories" maps
+       output section names to their size category, and only output sections
+       in one of the categories in "metrics" are counted.  Return a
+       dictionary of sizes indexed by contributor."""
+    sizes = {contrib: 0 for contrib in CONTRIBUTORS}
+
+    for isec in input_sections:
+        if categories.get(isec.output) in metrics:
+            sizes[classify_input(isec, bd)] += isec.size
+
+    return sizes
+
+
+def load_objects(input_sections):
+    """Read the references of every object which contributed to
+       "input_sections".  Return a dictionary indexed by (file, member) of
+       the result of object_references, or None if the object can't be
+       read."""
+    objects = {}
+
+    for isec in input_sections:
+        if isec.file is None:
+            continue
+        key = (isec.file, isec.member)
+        if key not in objects:
+            obj = read_object(isec.file, isec.member)
+            if obj is None:
+                log.debug(f'Warning: unable to read {isec.file} '
+                          + f'{isec.member or ""}')
+                objects[key] = None
+            else:
+                objects[key] = object_references(obj)
+
+    return objects
+
+
+def unreferenced_sections(input_sections, categories, entry):
+    """Find the input sections which the linker kept, but which can't be
+       reached by following references from the entry point at address
+       "entry" and the sections the linker always keeps.  "categories" maps
+       output section names to their size category, and only sections in
+       some category are considered.  Return a list of input sections."""
+    retained = [isec for isec in input_sections if isec.file is not None]
+    objects = load_objects(retained)
+
+    # Resolve global symbols to the section which defines them.
+    global_defs = {}
+    for key, info in objects.items():
+        if info is not None:
+            for sym, secname in info[1].items():
+                global_defs.setdefault(sym, (key, secname))
+
+    roots = []
+    for isec in retained:
+        key = (isec.file, isec.member)
+        info = objects[key]
+        if ((info is None) or (isec.name not in info[0])
+                or isec.name.startswith(KEEP_PREFIXES)
+                or (isec.address <= entry < isec.address + isec.size)):
+            # Unreadable objects and linker created sections are assumed to
+            # be needed.
+            roots.append((key, isec.name))
+
+    reached = set(roots)
+    worklist = list(roots)
+    while worklist:
+        key, secname = worklist.pop()
+        info = objects.get(key)
+        if info is None:
+            continue
+        for kind, name in info[2].get(secname, ()):
+            if kind == 'section':
+                target = (key, name)
+            elif name in global_defs:
+                target = global_defs[name]
+            else:
+                continue
+            if target not in reached:
+                reached.add(target)
+                worklist.append(target)
+
+    return [isec for isec in retained
+            if (isec.size > 0) and categories.get(isec.output)
+            and ((isec.file, isec.member), isec.name) not in reached]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Build matrix procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench build matrix.
+
+A build matrix describes several build configurations in one JSON file, so
+that they can all be built by a single invocation of scons.  The file holds
+an object with any of the following members.
+
+- "common": build variables used by every configuration.
+- "axes": an object whose members are the axes of the matrix.  Each axis is
+  an object mapping the name of each of its values to the build variables
+  for that value.  One configuration is generated for every combination of
+  values, named by joining the value names with "-".
+- "configs": an object mapping the names of additional configurations to
+  their build variables.
+
+The build variables are those of sconstruct.py (for example "cc", "cflags",
+"ldflags", "user_libs" or "gsf"), together with "config_dir" for the board
+configuration directory.  Where several sources give the same variable,
+the flag variables are concatenated and any other variable is replaced.
+"""
+
+import itertools
+import json
+import os
+
+
+# What we export
+
+__all__ = [
+    'FLAG_VARIABLES',
+    'merge_variables',
+    'load_matrix',
+]
+
+# Build variables which accumulate, rather than being replaced.
+FLAG_VARIABLES = ('cflags', 'ldflags', 'user_libs')
+
+
+def merge_variables(*var_dicts):
+    """Merge dictionaries of build variables, later ones taking precedence,
+       except that flag variables are concatenated.  Return the merged
+       dictionary."""
+    merged = {}
+
+    for var_dict in var_dicts:
+        for var, value in var_dict.items():
+            if (var in FLAG_VARIABLES) and merged.get(var):
+                merged[var] = f'{merged[var]} {value}'.strip()
+            else:
+                merged[var] = value
+
+    return merged
+
+
+def check_variables(name, var_dict):
+    """Check that the build variables "var_dict" of the configuration or
+       axis value "name" are an object.  Raise ValueError if not."""
+    if not isinstance(var_dict, dict):
+        raise ValueError(f'build variables for "{name}" must be an object')
+
+
+def load_matrix(matrix_file):
+    """Read the build matrix "matrix_file".  Return a list of (name,
+       variables) tuples, one for each configuration, in a stable order.
+       Raise ValueError if the file is not a valid build matrix, and OSError
+       if it can't be read."""
+    with open(matrix_file, 'r') as fileh:
+        matrix = json.load(fileh)
+
+    if not isinstance(matrix, dict):
+        raise ValueError(f'{matrix_file}: build matrix must be an object')
+
+    common = matrix.get('common', {})
+    check_variables('common', common)
+    configs = []
+
+    axes = matrix.get('axes', {})
+    if not isinstance(axes, dict):
+        raise ValueError(f'{matrix_file}: "axes" must be an object')
+    if axes:
+        for axis, values in axes.items():
+            if not isinstance(values, dict) or not values:
+                raise ValueError(
+                    f'{matrix_file}: axis "{axis}" must be a non-empty object')
+            for value, var_dict in values.items():
+                check_variables(value, var_dict)
+        for combination in itertools.product(
+                *[list(values.items()) for values in axes.values()]):
+            name = '-'.join(value for value, _ in combination)
+            configs.append((name, merge_variables(
+                common, *[var_dict for _, var_dict in combination])))
+
+    extra = matrix.get('configs', {})
+    if not isinstance(extra, dict):
+        raise ValueError(f'{matrix_file}: "configs" must be an object')
+    for name, var_dict in extra.items():
+        check_variables(name, var_dict)
+        configs.append((name, merge_variables(common, var_dict)))
+
+    names = set()
+    for name, _ in configs:
+        if (not name) or (os.sep in name) or (name in ('.', '..')):
+            raise ValueError(f'{matrix_file}: invalid configuration name '
+                             + f'"{name}"')
+        if name in names:
+            raise ValueError(f'{matrix_file}: duplicate configuration '
+                             + f'"{name}"')
+        names.add(name)
+
+    if not configs:
+        raise ValueError(f'{matrix_file}: no configurations')
+
+    return configs
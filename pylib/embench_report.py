@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+# Reporting procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench reporting.
+
+Output a table with a column for each of several sets of results for the
+same benchmarks, such as size and speed, or speed before and after a change,
+in any of the Embench output formats.  The table itself may also be output
+from rows of values already formatted, for results of other kinds.
+
+Also output records in JSON Lines format, one line of JSON for each
+benchmark as soon as it has been measured, so that long runs can be
+monitored and their results consumed as they arrive.
+
+The command line arguments shared by the scripts which report results in
+these formats, such as the output format itself, are added to their parsers
+and recorded in gp here.
+"""
+
+import datetime
+import os
+import platform
+
+from json import dumps
+
+from embench_core import log
+from embench_core import gp
+from embench_core import output_format
+
+
+# What we export
+
+__all__ = [
+    'add_report_args',
+    'setup_report_args',
+    'output_results',
+    'output_table',
+    'output_jsonl',
+]
+
+
+def result_value(raw_data, rel_data, bench):
+    """The value to report for benchmark "bench", or None if there is
+       none."""
+    if bench not in raw_data:
+        return None
+    if gp['absolute']:
+        return round(raw_data[bench])
+
+    return round(rel_data[bench], 2)
+
+
+def format_value(value):
+    """Format a result value for a table."""
+    if value is None:
+        return 'n/a'
+    if isinstance(value, int):
+        return f'{value:,}'
+
+    return f'{value:.2f}'
+
+
+def add_report_args(parser, baselinedir=True, absolute=True,
+                    file_extension=True):
+    """Add the arguments shared by the scripts reporting results to
+       "parser": the log directory and the output format, and if wanted the
+       baseline directory, whether results are absolute or relative and the
+       file extension of the binaries."""
+    parser.add_argument(
+        '--logdir',
+        type=str,
+        default='logs',
+        help='Directory in which to store logs',
+    )
+    if baselinedir:
+        parser.add_argument(
+            '--baselinedir',
+            type=str,
+            default='baseline-data',
+            help='Directory which contains baseline data',
+        )
+    if absolute:
+        parser.add_argument(
+            '--absolute',
+            action='store_true',
+            help='Specify to show absolute results',
+        )
+        parser.add_argument(
+            '--relative',
+            dest='absolute',
+            action='store_false',
+            help='Specify to show relative results (the default)',
+        )
+    parser.add_argument(
+        '--json-output',
+        dest='output_format',
+        action='store_const',
+        const=output_format.JSON,
+        help='Specify to output in JSON format',
+    )
+    parser.add_argument(
+        '--text-output',
+        dest='output_format',
+        action='store_const',
+        const=output_format.TEXT,
+        help='Specify to output as plain text (the default)',
+    )
+    parser.add_argument(
+        '--md-output',
+        dest='output_format',
+        action='store_const',
+        const=output_format.MD,
+        help='Specify to output as MarkDown',
+    )
+    parser.add_argument(
+        '--csv-output',
+        dest='output_format',
+        action='store_const',
+        const=output_format.CSV,
+        help='Specify to output as CSV',
+    )
+    if file_extension:
+        parser.add_argument(
+            '--file-extension',
+            type=str,
+            default=None,
+            help='Optional file extension to append to benchmark names when '
+            + 'searching for binaries',
+        )
+
+
+def setup_report_args(args):
+    """Record the arguments added by add_report_args in gp: the output
+       format, plain text by default, and where they were added the
+       baseline directory, relative to the root directory, whether results
+       are absolute, and the file extension, by default that of the
+       host."""
+    gp['output_format'] = args.output_format or output_format.TEXT
+    if 'baselinedir' in vars(args):
+        if os.path.isabs(args.baselinedir):
+            gp['baseline_dir'] = args.baselinedir
+        else:
+            gp['baseline_dir'] = os.path.join(gp['rootdir'],
+                                              args.baselinedir)
+    if 'absolute' in vars(args):
+        gp['absolute'] = args.absolute
+    if 'file_extension' in vars(args):
+        if args.file_extension is None:
+            gp['file_extension'] = ('.exe' if platform.system() == 'Windows'
+                                    else '')
+        else:
+            gp['file_extension'] = args.file_extension
+
+
+def output_results(benchmarks, results, stats):
+    """Output the results.  "results" is a list of (name, raw data, relative
+       data) for each measurement, and "stats" a list of (geomean, geosd,
+       georange) for each."""
+    names = [name for name, _, _ in results]
+
+    if gp['output_format'] == output_format.JSON:
+        res = {}
+        for (name, raw_data, rel_data), (geomean, geosd, georange) in zip(
+                results, stats):
+            res[f'{name} results'] = {
+                f'detailed {name} results': {
+                    bench: result_value(raw_data, rel_data, bench)
+                    for bench in benchmarks
+                },
+                f'{name} geometric mean': round(geomean, 2),
+                f'{name} geometric standard deviation': round(geosd, 2),
+                f'{name} geometric range': round(georange, 2),
+            }
+        log.info(dumps(res, indent=2))
+        return
+
+    rows = [(bench, [format_value(result_value(raw_data, rel_data, bench))
+                     for _, raw_data, rel_data in results])
+            for bench in benchmarks]
+    summary = [(label, [f'{stat[index]:.2f}' for stat in stats])
+               for label, index in (('Geometric mean', 0), ('Geometric SD', 1),
+                                    ('Geometric range', 2))]
+    output_table(names, rows, summary)
+
+
+def output_table(names, rows, summary=()):
+    """Output a table in plain text, MarkDown or CSV format, with a column
+       for each of "names" after the benchmark name.  "rows" is a list of
+       (benchmark, values) and "summary" a list of (label, values) for the
+       rows which follow, such as the geometric mean, with the values
+       already formatted as strings."""
+    # Columns are wide enough for their names
+    widths = [max(10, len(n)) for n in names]
+    if gp['output_format'] == output_format.TEXT:
+        log.info('Benchmark       ' + ''.join(f' {n:>{w}}'
+                                              for n, w in zip(names, widths)))
+        log.info('---------       ' + ''.join(f' {"-" * len(n):>{w}}'
+                                              for n, w in zip(names, widths)))
+        for label, values in rows:
+            log.info(f'{label:15} ' + ''.join(f' {v:>{w}}'
+                                              for v, w in zip(values, widths)))
+        if summary:
+            log.info('---------       ' + ''.join(f' {"-" * w}'
+                                                  for w in widths))
+        for label, values in summary:
+            log.info(f'{label:15} ' + ''.join(f' {v:>{w}}'
+                                              for v, w in zip(values, widths)))
+    elif gp['output_format'] == output_format.MD:
+        log.info('| Benchmark         |' + ''.join(
+            f' {n:>{w}} |' for n, w in zip(names, widths)))
+        log.info('| :---------------- |' + ''.join(f' {"-" * (w - 1)}: |'
+                                                   for w in widths))
+        for label, values in rows:
+            label = '`' + label + '`'
+            log.info(f'| {label:17} |' + ''.join(
+                f' {v:>{w}} |' for v, w in zip(values, widths)))
+        for label, values in summary:
+            log.info(f'| {label:17} |' + ''.join(
+                f' {v:>{w}} |' for v, w in zip(values, widths)))
+    elif gp['output_format'] == output_format.CSV:
+        log.info('"Benchmark",' + ','.join(f'"{n}"' for n in names))
+        for label, values in list(rows) + list(summary):
+            log.info(f'"{label}",' + ','.join(f'"{v}"' for v in values))
+
+
+def output_jsonl(record_type, kind, **fields):
+    """Output one record in JSON Lines format: a "result" for one benchmark,
+       or a "summary" at the end.  "kind" is the kind of measurement, such
+       as "speed", and "fields" the rest of the record.  Each record says
+       what it is and when it was output, so it can be understood alone."""
+    record = {
+        'record': record_type,
+        'kind': kind,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec='seconds'),
+        **fields,
+    }
+    log.info(dumps(record))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Static stack usage procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench static stack usage analysis.
+
+The frame size of each function comes from the ".su" files written by the
+compiler with -fstack-usage.  The call graph comes from the ".ci" files
+written by GCC with -fcallgraph-info=su where they exist, and otherwise is
+recovered from the relocations in the objects.  A call to a function in the
+same section is resolved by the assembler and leaves no relocation, so a
+call graph recovered from relocations may be missing calls, and a depth
+which relies on it is only a lower bound.  The worst case stack depth is the
+largest sum of frame sizes along any path through the call graph.
+"""
+
+import os
+import re
+
+from embench_core import log
+from embench_elf import read_object
+
+
+# What we export
+
+__all__ = [
+    'read_stack_objects',
+    'worst_case_stack',
+]
+
+SU_RE = re.compile(r'^(.*):(\d+):(\d+):(\S+)\t(\d+)\t(\S+)\s*$')
+CI_NODE_RE = re.compile(r'^node: \{ title: "([^"]*)" label: "([^"]*)"')
+CI_EDGE_RE = re.compile(
+    r'^edge: \{ sourcename: "([^"]*)" targetname: "([^"]*)"')
+
+
+def read_su_file(su_file):
+    """Read the stack usage file "su_file".  Return a dictionary mapping
+       function name to a tuple of frame size in bytes and the qualifier
+       ("static", "dynamic" or "dynamic,bounded")."""
+    frames = {}
+
+    try:
+        with open(su_file, 'r') as fileh:
+            for line in fileh:
+                match = SU_RE.match(line)
+                if match:
+                    frames[match.group(4)] = (int(match.group(5)),
+                                              match.group(6))
+    except OSError:
+        pass
+
+    return frames
+
+
+def read_ci_file(ci_file):
+    """Read the GCC call graph file "ci_file".  Return a list of (caller,
+       callee) name pairs, or None if there is no such file.  Static
+       functions are named "file:function" in the call graph, and the file
+       part is stripped.  Calls to built in functions, which may never be
+       real calls, are ignored."""
+    if not os.path.isfile(ci_file):
+        return None
+
+    builtins = set()
+    edges = []
+    with open(ci_file, 'r') as fileh:
+        for line in fileh:
+            match = CI_NODE_RE.match(line)
+            if match:
+                if '<built-in>' in match.group(2):
+                    builtins.add(match.group(1))
+                continue
+            match = CI_EDGE_RE.match(line)
+            if match and match.group(2) not in builtins:
+                edges.append((match.group(1).split(':')[-1],
+                              match.group(2).split(':')[-1]))
+
+    return edges
+
+
+def relocation_edges(obj, functions):
+    """Recover the calls made by each function in the ELF object "obj" from
+       its relocations.  "functions" maps section index to a list of (start,
+       size, name) for the functions in the section.  Return a list of
+       (caller, callee) name pairs.  Every reference to a function, not just
+       a call, is treated as a call, but calls within a section leave no
+       relocation and are missed, so the edges are not the whole call
+       graph."""
+    edges = []
+
+    for section in obj.iter_sections():
+        if section['sh_type'] not in ('SHT_REL', 'SHT_RELA'):
+            continue
+        callers = functions.get(section['sh_info'])
+        if not callers:
+            continue
+        symtab = obj.get_section(section['sh_link'])
+        for reloc in section.iter_relocations():
+            caller = None
+            for start, size, name in callers:
+                if start <= reloc['r_offset'] < start + size:
+                    caller = name
+                    break
+            if (caller is None) or (reloc['r_info_sym'] == 0):
+                continue
+
+            sym = symtab.get_symbol(reloc['r_info_sym'])
+            if sym['st_info']['type'] == 'STT_FUNC':
+                edges.append((caller, sym.name))
+            elif ((sym['st_info']['type'] == 'STT_SECTION')
+                  and (sym['st_shndx'] in functions)):
+                # A reference relative to the start of a section.  Use the
+                # function containing the addend, or failing that the first.
+                offset = max(reloc.entry.get('r_addend', 0), 0)
+                targets = functions[sym['st_shndx']]
+                callee = targets[0][2]
+                for start, size, name in targets:
+                    if start <= offset < start + size:
+                        callee = name
+                        break
+                edges.append((caller, callee))
+            elif ((sym['st_info']['type'] == 'STT_NOTYPE')
+                  and (sym['st_shndx'] == 'SHN_UNDEF') and sym.name):
+                # An undefined function in another object.  Defined symbols
+                # without a type are local labels, such as ".LC0", not
+                # functions.
+                edges.append((caller, sym.name))
+
+    return edges
+
+
+def read_stack_objects(objfiles):
+    """Read the stack usage and call graph information for each of the
+       objects in "objfiles".  Return a tuple of a dictionary of frames, a
+       dictionary of callees, both indexed by function, and the set of
+       functions whose callees were recovered from relocations, and so may
+       be incomplete.  Global functions are identified by name, and static
+       functions by (object, name)."""
+    frames = {}
+    calls = {}
+    partial = set()
+    data_syms = set()
+
+    for objfile in objfiles:
+        stem = os.path.splitext(objfile)[0]
+        obj = read_object(objfile)
+        if obj is None:
+            log.debug(f'Warning: unable to read {objfile}')
+            continue
+
+        # Work out which functions are static, and where they all are.
+        symtab = obj.get_section_by_name('.symtab')
+        local_funcs = set()
+        functions = {}
+        if symtab is not None:
+            for sym in symtab.iter_symbols():
+                if not isinstance(sym['st_shndx'], int):
+                    continue
+                if sym['st_info']['type'] == 'STT_OBJECT':
+                    data_syms.add(sym.name)
+                elif sym['st_info']['type'] == 'STT_FUNC':
+                    if sym['st_info']['bind'] == 'STB_LOCAL':
+                        local_funcs.add(sym.name)
+                    functions.setdefault(sym['st_shndx'], []).append(
+                        (sym['st_value'], sym['st_size'], sym.name))
+
+        def key(name):
+            return (objfile, name) if name in local_funcs else name
+
+        for name, frame in read_su_file(f'{stem}.su').items():
+            frames[key(name)] = frame
+        for funcs in functions.values():
+            for _, _, name in funcs:
+                frames.setdefault(key(name), None)
+
+        edges = read_ci_file(f'{stem}.ci')
+        if edges is None:
+            edges = relocation_edges(obj, functions)
+            for funcs in functions.values():
+                partial.update(key(name) for _, _, name in funcs)
+        for caller, callee in edges:
+            calls.setdefault(key(caller), set()).add(key(callee))
+
+    # References to data in other objects are not calls
+    for callees in calls.values():
+        callees.difference_update(data_syms)
+
+    return frames, calls, partial
+
+
+def worst_case_stack(frames, calls, partial, root='main',
+                     through='benchmark'):
+    """Compute the worst case stack depth in bytes from the function "root"
+       through the function "through", using the frames, calls and partially
+       known functions from read_stack_objects.
+
+       Return a tuple of the depth and a set of reasons why the depth is
+       only a lower bound: "dynamic" if a frame has unbounded dynamic
+       allocation, "recursive" if there is recursion, "unknown" if a
+       function without stack usage information (typically a library
+       function) is called, and "no call graph" if the calls of a function
+       were recovered from relocations, which miss calls within a section.
+       An empty set means the depth is exact."""
+    flags = set()
+    memo = {}
+    active = set()
+
+    def depth(func):
+        if func in memo:
+            return memo[func]
+        if func in active:
+            flags.add('recursive')
+            return 0
+
+        frame = frames.get(func)
+        if frame is None:
+            flags.add('unknown')
+            own = 0
+        else:
+            own = frame[0]
+            if frame[1] == 'dynamic':
+                flags.add('dynamic')
+        if func in partial:
+            flags.add('no call graph')
+
+        active.add(func)
+        deepest = 0
+        for callee in calls.get(func, ()):
+            if callee != func:
+                deepest = max(deepest, depth(callee))
+            else:
+                flags.add('recursive')
+        active.discard(func)
+
+        memo[func] = own + deepest
+        return memo[func]
+
+    root_frame = frames.get(root)
+    if (root_frame is None) or (through not in frames):
+        return None, {'unknown'}
+
+    # The root's frame plus the deepest path from the function called
+    if root in partial:
+        flags.add('no call graph')
+    return root_frame[0] + depth(through), flags
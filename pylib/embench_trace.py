@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+# Timeline tracing procedures for use across Embench.
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Embench timeline tracing.
+
+With --trace, the scripts record where their time goes as spans (complete
+events) in the Chrome trace event format, which can be viewed with
+chrome://tracing or https://ui.perfetto.dev.  Each span has a name, a
+category, a start time and a duration, with the thread which ran it, and
+spans within spans are shown nested.  sconstruct.py records each command it
+runs, and the benchmark scripts record finding the benchmarks, parsing each
+ELF file, each run of a benchmark and computing the statistics.
+
+Times are taken from the system wide monotonic clock, so that traces written
+by different processes can be combined with
+
+    python3 embench_trace.py OUTPUT TRACE...
+
+Tracing is off unless start_trace () is called, and then costs little more
+than reading the clock.
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+
+# What we export
+
+__all__ = [
+    'GDB_PHASES',
+    'start_trace',
+    'span',
+    'merge_trace',
+    'run_traced',
+    'traced_spawn',
+]
+
+# The phases of a run under GDB, marked by the first line of GDB's output
+# matching each pattern.  Time before the first is GDB and target startup.
+GDB_PHASES = [
+    (re.compile(r'^Loading section'), 'load'),
+    (re.compile(r'^Start address'), 'start'),
+    (re.compile(r'Breakpoint \d+, .*start_trigger'), 'measured region'),
+    (re.compile(r'Breakpoint \d+, .*stop_trigger'), 'exit'),
+]
+
+# The trace being recorded, if any
+_trace = None
+
+
+def now_us():
+    """The time on the system wide monotonic clock in microseconds."""
+    return time.monotonic_ns() / 1000.0
+
+
+class Trace:
+    """The events of the trace to be written to "tracefile" by the process
+       named "process"."""
+
+    def __init__(self, tracefile, process):
+        self.tracefile = tracefile
+        self.process = process
+        self.pid = os.getpid()
+        self.start = now_us()
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.events = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                        'tid': 0, 'args': {'name': process}}]
+
+    def tid(self):
+        """A small number identifying the current thread, naming it in the
+           trace the first time it is seen."""
+        ident = threading.get_ident()
+        with self.lock:
+            if ident not in self.threads:
+                self.threads[ident] = len(self.threads) + 1
+                self.events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                    'tid': self.threads[ident],
+                    'args': {'name': threading.current_thread().name}})
+            return self.threads[ident]
+
+    def add(self, name, cat, start, dur, fields):
+        """Add a span "name" of category "cat", starting at "start" and
+           lasting "dur" microseconds, with the dictionary "fields" shown as
+           its arguments."""
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start,
+                 'dur': dur, 'pid': self.pid, 'tid': self.tid()}
+        if fields:
+            event['args'] = fields
+        with self.lock:
+            self.events.append(event)
+
+    def write(self):
+        """Write the trace, with a span for the whole of the process so
+           far.  Failure to write is not an error."""
+        self.add(self.process, 'process', self.start, now_us() - self.start,
+                 {'command': ' '.join(sys.argv)})
+        tmpfile = f'{self.tracefile}.tmp{self.pid}'
+        try:
+            with open(tmpfile, 'w') as fileh:
+                json.dump({'traceEvents': self.events,
+                           'displayTimeUnit': 'ms'}, fileh)
+            os.replace(tmpfile, self.tracefile)
+        except OSError as error:
+            print(f'Warning: Unable to write trace {self.tracefile}: {error}',
+                  file=sys.stderr)
+
+
+def start_trace(tracefile, process):
+    """Start recording a trace, to be written to "tracefile" when the
+       program exits.  "process" names the program in the trace."""
+    global _trace
+    _trace = Trace(tracefile, process)
+    atexit.register(_trace.write)
+
+
+@contextlib.contextmanager
+def span(name, cat, **fields):
+    """Record the time spent in the body of the "with" statement as a span
+       "name" of category "cat", if tracing.  The dictionary of "fields" is
+       yielded, and any fields added to it are shown with the span."""
+    if _trace is None:
+        yield fields
+        return
+
+    start = now_us()
+    try:
+        yield fields
+    finally:
+        _trace.add(name, cat, start, now_us() - start, fields)
+
+
+def merge_trace(tracefile):
+    """Add the events of the trace in "tracefile", written by another
+       process, to the trace being recorded.  Failure to read is not an
+       error."""
+    if _trace is None:
+        return
+    try:
+        with open(tracefile, 'r') as fileh:
+            events = json.load(fileh)['traceEvents']
+    except (OSError, ValueError, KeyError):
+        return
+    with _trace.lock:
+        _trace.events.extend(events)
+
+
+def run_traced(name, cmd, timeout, phases=()):
+    """Run "cmd", capturing its output, as subprocess.run would, and if
+       tracing record it as a span "name".  "phases" is a list of tuples of
+       a regular expression and the name of a phase of the run which starts
+       when a line of standard output first matches it, for example
+       GDB_PHASES, and each phase is recorded as a span within the run.  A
+       phase only starts when the output reaches this program, so a program
+       which buffers its output shows phases late.  Return a
+       subprocess.CompletedProcess, or raise subprocess.TimeoutExpired if
+       the command does not finish within "timeout" seconds."""
+    if _trace is None:
+        return subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, timeout=timeout)
+
+    if not phases:
+        with span(name, 'runner', command=' '.join(cmd)):
+            return subprocess.run(cmd, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, timeout=timeout)
+
+    start = now_us()
+    marks = [(start, 'startup')]
+    stdout = []
+    stderr = []
+    expired = threading.Event()
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE) as proc:
+        def kill():
+            expired.set()
+            proc.kill()
+
+        # Standard error is read separately, so that neither pipe fills
+        reader = threading.Thread(target=lambda: stderr.append(
+            proc.stderr.read()))
+        reader.start()
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+
+        remaining = list(phases)
+        for line in proc.stdout:
+            stdout.append(line)
+            text = line.decode('utf-8', errors='replace')
+            for i, (pattern, phase) in enumerate(remaining):
+                if pattern.search(text):
+                    marks.append((now_us(), phase))
+                    remaining = remaining[i + 1:]
+                    break
+
+        proc.wait()
+        timer.cancel()
+        reader.join()
+
+    end = now_us()
+    for (mark, phase), (next_mark, _) in zip(marks,
+                                             marks[1:] + [(end, None)]):
+        _trace.add(phase, 'runner', mark, next_mark - mark, {})
+    _trace.add(name, 'runner', start, end - start,
+               {'command': ' '.join(cmd), 'timed out': expired.is_set()})
+
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return subprocess.CompletedProcess(cmd, proc.returncode, b''.join(stdout),
+                                       stderr[0] if stderr else b'')
+
+
+def traced_spawn(spawn):
+    """Wrap the SCons SPAWN function "spawn", so that each command it runs is
+       recorded as a span named by the file it builds."""
+    def spawn_traced(sh, escape, cmd, args, env):
+        target = args[args.index('-o') + 1] if '-o' in args[:-1] else cmd
+        with span(os.path.basename(target.strip('"\'')),
+                  'compile' if '-c' in args else 'link',
+                  command=' '.join(args)):
+            return spawn(sh, escape, cmd, args, env)
+
+    return spawn_traced
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(f'Usage: {sys.argv[0]} OUTPUT TRACE...', file=sys.stderr)
+        sys.exit(2)
+    merged = []
+    for infile in sys.argv[2:]:
+        with open(infile, 'r') as fileh:
+            merged.extend(json.load(fileh)['traceEvents'])
+    with open(sys.argv[1], 'w') as fileh:
+        json.dump({'traceEvents': merged, 'displayTimeUnit': 'ms'}, fileh)
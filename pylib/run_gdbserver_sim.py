@@ -21,6 +21,8 @@ import re
 import subprocess
 
 from embench_core import log
+from embench_trace import GDB_PHASES
+from embench_trace import run_traced
 
 
 def get_target_args(remnant):
@@ -73,6 +75,7 @@ def build_benchmark_cmd(path, args):
         'monitor cyclecount',
         'continue',
         'print $a0',
+        'print heap_stats_beebs',
         'detach',
         'quit',
     ]
@@ -83,6 +86,33 @@ def build_benchmark_cmd(path, args):
     return cmd
 
 
+def decode_heap_stats(stdout_str):
+    """Extract the heap usage printed by GDB from the structure
+       heap_stats_beebs.  Return a dictionary, or None if the program was
+       not built to record heap usage."""
+    heap = re.search(
+        r'\$2 = \{peak = (\d+), allocs = (\d+), failed = (\d+), '
+        + r'histogram = \{([^}]*)\}\}', stdout_str)
+    if not heap:
+        return None
+
+    # GDB abbreviates repeated values as "0 <repeats 12 times>"
+    histogram = []
+    for item in heap.group(4).split(','):
+        repeats = re.match(r'\s*(\d+) <repeats (\d+) times>', item)
+        if repeats:
+            histogram.extend([int(repeats.group(1))] * int(repeats.group(2)))
+        else:
+            histogram.append(int(item))
+
+    return {
+        'peak': int(heap.group(1)),
+        'allocs': int(heap.group(2)),
+        'failed': int(heap.group(3)),
+        'histogram': histogram,
+    }
+
+
 def decode_results(stdout_str, stderr_str):
     """Extract the results from the output string of the run. Return the
        elapsed time in milliseconds or zero if the run failed."""
@@ -99,6 +129,11 @@ def decode_results(stdout_str, stderr_str):
     times = re.search('(\d+)\D+(\d+)', stderr_str, re.S)
     if times:
         ms_elapsed = float(int(times.group(2)) - int(times.group(1))) / 1000.0
+
+        # Programs built with heap_stats=1 have their heap usage in memory
+        heap = decode_heap_stats(stdout_str)
+        if heap:
+            return {'time': ms_elapsed, 'heap': heap}
         return ms_elapsed
 
     # We must have failed to find a time
@@ -110,15 +145,16 @@ def run_benchmark(bench, path, args):
        with target specific arguments. This function will be called
        in parallel unless if the number of tasks is limited via
        command line. "run_benchmark" should return the result in
-       milliseconds.
+       milliseconds, or a dictionary with the result in milliseconds as
+       "time" and the heap usage as "heap" if the program records it.
     """
     arglist = build_benchmark_cmd(path, args)
     try:
-        res = subprocess.run(
+        res = run_traced(
+            bench,
             arglist,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             timeout=50,
+            phases=GDB_PHASES,
         )
     except subprocess.TimeoutExpired:
         log.warning(f'Warning: Run of {bench} timed out.')
@@ -17,22 +17,52 @@ This version is suitable for running programs natively.
 """
 
 import argparse
+import os
 import subprocess
 import re
 
 from embench_core import log
+from embench_trace import run_traced
+from embench_trace import span
 
 
 def get_target_args(remnant):
     """Parse left over arguments"""
     parser = argparse.ArgumentParser(description='Get target specific args')
 
-    # No target arguments
-    return parser.parse_args(remnant)
-
-def decode_results(stdout_str, stderr_str):
+    parser.add_argument(
+        '--trigger-time',
+        action='store_true',
+        help='Time only the benchmark, between start_trigger and '
+        + 'stop_trigger, as reported by the program, rather than the whole '
+        + 'process',
+    )
+    parser.add_argument(
+        '--copies',
+        type=int,
+        default=1,
+        help='Number of copies of each benchmark to run at once, each pinned '
+        + 'to its own core, to measure throughput (default 1)',
+    )
+
+    args = parser.parse_args(remnant)
+    if args.copies < 1:
+        parser.error('--copies must be positive')
+    if args.copies > 1:
+        if not hasattr(os, 'sched_setaffinity'):
+            parser.error('--copies needs a host which can pin processes to '
+                         + 'cores')
+        if args.copies > len(os.sched_getaffinity(0)):
+            parser.error(f'--copies {args.copies} is more than the '
+                         + f'{len(os.sched_getaffinity(0))} cores available')
+
+    return args
+
+def decode_results(stdout_str, stderr_str, trigger_time=False):
     """Extract the results from the output string of the run. Return the
-       elapsed time in milliseconds or zero if the run failed."""
+       elapsed time in milliseconds or zero if the run failed.  If
+       "trigger_time" is True, the time between the triggers reported by the
+       program is used instead of the time of the whole process."""
     # See above in build_benchmark_cmd how we record the return value and
     # execution time. Return code is in standard output. Execution time is in
     # standard error.
@@ -43,31 +73,123 @@ def decode_results(stdout_str, stderr_str):
         log.debug('Warning: Failed to find return code')
         return None
 
-    # Match "real s.mm?m?"
-    time = re.search('^real (\d+)[.](\d+)', stderr_str, re.S)
+    # Match "real s.mm?m?", or "TRIGGER_NS=ns" from the native board
+    if trigger_time:
+        time = re.search('^TRIGGER_NS=(\d+)', stdout_str, re.M)
+        if not time:
+            log.debug('Warning: Failed to find trigger time')
+    else:
+        time = re.search('^real (\d+)[.](\d+)', stderr_str, re.S)
     if time:
-        ms_elapsed = int(time.group(1)) * 1000 + \
-                     int(time.group(2).ljust(3,'0')) # 0-pad
+        if trigger_time:
+            ms_elapsed = int(time.group(1)) / 1000000.0
+        else:
+            ms_elapsed = int(time.group(1)) * 1000 + \
+                         int(time.group(2).ljust(3,'0')) # 0-pad
         # Return value cannot be zero (will be interpreted as error)
-        return max(float(ms_elapsed), 0.001)
+        ms_elapsed = max(float(ms_elapsed), 0.001)
+
+        # Programs built with heap_stats=1 also print their heap usage
+        heap = re.search(
+            '^HEAP_STATS peak=(\d+) allocs=(\d+) failed=(\d+) histogram=([\d,]+)',
+            stdout_str, re.M)
+        if heap:
+            return {
+                'time': ms_elapsed,
+                'heap': {
+                    'peak': int(heap.group(1)),
+                    'allocs': int(heap.group(2)),
+                    'failed': int(heap.group(3)),
+                    'histogram': [int(n) for n in heap.group(4).split(',')],
+                },
+            }
+        return ms_elapsed
 
     # We must have failed to find a time
     log.debug('Warning: Failed to find timing')
     return None
 
+def run_copies(bench, path, copies, args):
+    """Run "copies" copies of the benchmark "bench" at "path" at once, each
+       pinned to its own core.  Return the result of each copy, as from
+       decode_results, or None if any copy failed or timed out."""
+    cores = sorted(os.sched_getaffinity(0))[:copies]
+    cmd = ['sh', '-c', 'time -p ' + path + '; echo RET=$?']
+    procs = []
+    with span(f'{bench} x{copies}', 'runner', command=' '.join(cmd)):
+        for core in cores:
+            procs.append(subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                preexec_fn=lambda core=core: os.sched_setaffinity(0, {core})))
+        outputs = []
+        for proc in procs:
+            try:
+                outputs.append(proc.communicate(timeout=50))
+            except subprocess.TimeoutExpired:
+                for other in procs:
+                    other.kill()
+                    other.communicate()
+                log.warning(f'Warning: Run of {bench} timed out.')
+                return None
+            if proc.returncode != 0:
+                outputs[-1] = None
+
+    if None in outputs:
+        return None
+    return [decode_results(stdout.decode('utf-8'), stderr.decode('utf-8'),
+                           args.trigger_time) for stdout, stderr in outputs]
+
+
+def run_rate(bench, path, args):
+    """Run the benchmark "bench" at "path" alone and then as "args.copies"
+       copies at once.  The time of the copies is that of the slowest, and
+       the result is a dictionary with that time divided by the number of
+       copies as "time", so that the relative speed is the throughput of all
+       the copies, and the number of copies, the times of one copy and of
+       all of them and the scaling efficiency as "rate".  The scaling
+       efficiency is the throughput of the copies over that of one copy
+       times the number of copies, which is one if they do not contend for
+       shared caches and memory bandwidth.  Return None on failure."""
+    results = run_copies(bench, path, 1, args)
+    if not results or not results[0]:
+        return None
+    single = results[0]
+    results = run_copies(bench, path, args.copies, args)
+    if not results or not all(results):
+        return None
+
+    def ms(res):
+        return res['time'] if isinstance(res, dict) else res
+
+    elapsed = max(ms(res) for res in results)
+    rate = {
+        'copies': args.copies,
+        'single time': ms(single),
+        'time': elapsed,
+        'efficiency': ms(single) / elapsed,
+    }
+    res = {'time': elapsed / args.copies, 'rate': rate}
+    if isinstance(single, dict):
+        res['heap'] = single['heap']
+    return res
+
+
 def run_benchmark(bench, path, args):
     """Runs the benchmark "bench" at "path". "args" is a namespace
        with target specific arguments. This function will be called
        in parallel unless if the number of tasks is limited via
        command line. "run_benchmark" should return the result in
-       milliseconds.
+       milliseconds, or a dictionary with the result in milliseconds as
+       "time" and the heap usage as "heap" if the program reports it.
+       With --copies, a dictionary is returned as by run_rate.
     """
+    if args.copies > 1:
+        return run_rate(bench, path, args)
 
     try:
-        res = subprocess.run(
+        res = run_traced(
+            bench,
             ['sh', '-c', 'time -p ' + path + '; echo RET=$?'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             timeout=50,
         )
     except subprocess.TimeoutExpired:
@@ -75,4 +197,5 @@ def run_benchmark(bench, path, args):
         return None
     if res.returncode != 0:
         return None
-    return decode_results(res.stdout.decode('utf-8'), res.stderr.decode('utf-8'))
+    return decode_results(res.stdout.decode('utf-8'), res.stderr.decode('utf-8'),
+                          args.trigger_time)
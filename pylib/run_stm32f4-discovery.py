@@ -26,6 +26,8 @@ import subprocess
 import re
 
 from embench_core import log
+from embench_trace import GDB_PHASES
+from embench_trace import run_traced
 
 cpu_mhz = 1
 
@@ -111,11 +113,11 @@ def run_benchmark(bench, path, args):
     """
     arglist = build_benchmark_cmd(path, args)
     try:
-        res = subprocess.run(
+        res = run_traced(
+            bench,
             arglist,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             timeout=50,
+            phases=GDB_PHASES,
         )
     except subprocess.TimeoutExpired:
         log.warning(f'Warning: Run of {bench} timed out.')
@@ -23,6 +23,7 @@ import configparser
 import re
 
 from embench_core import log
+from embench_trace import run_traced
 
 cpu_mhz = 1
 
@@ -91,10 +92,9 @@ def run_benchmark(bench, path, args):
     """
     arglist = build_benchmark_cmd(path, args)
     try:
-        res = subprocess.run(
+        res = run_traced(
+            bench,
             arglist,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             timeout=50,
         )
     except subprocess.TimeoutExpired:
@@ -11,7 +11,23 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from pathlib import Path
+import atexit
+import json
 import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+import SCons.CacheDir
+import SCons.Util
+
+sys.path.append(str(Path('pylib').absolute()))
+
+from embench_matrix import load_matrix
+from embench_matrix import merge_variables
+from embench_trace import start_trace
+from embench_trace import traced_spawn
 
 def find_benchmarks(bd, env):
     dir_iter = Path('src').iterdir()
@@ -22,11 +38,24 @@ def parse_options():
     SetOption('num_jobs', num_cpu)
     AddOption('--build-dir', nargs=1, type='string', default='bd')
     AddOption('--config-dir', nargs=1, type='string', default='config2')
-    config_dir = Path(GetOption('config_dir')).absolute()
-    bd = Path(GetOption('build_dir')).absolute()
-
-    vars = Variables(None, ARGUMENTS)
+    AddOption('--matrix', nargs=1, type='string', default=None,
+              help='JSON file describing several configurations to build')
+    AddOption('--report-links', action='store_true', default=False,
+              help='Print a line as soon as each benchmark is linked')
+    AddOption('--object-cache', nargs=1, type='string', default=None,
+              help='Directory of a cache of objects and executables, which '
+              + 'may be shared between build directories')
+    AddOption('--object-cache-size', nargs=1, type='int', default=0,
+              help='Maximum size of the object cache in MB, the least '
+              + 'recently used files being removed after the build '
+              + '(default 0, unlimited)')
+    AddOption('--trace', nargs=1, type='string', default=None,
+              help='File in which to write a timeline of the commands run, '
+              + 'in Chrome trace event format')
     print(ARGUMENTS)
+
+def build_variables(bd, args):
+    vars = Variables(None, args)
     vars.Add('cc', default=env['CC'])
     vars.Add('cflags', default=env['CCFLAGS'])
     vars.Add('ld', default=env['LINK'])
@@ -35,16 +64,63 @@ def parse_options():
     vars.Add('warmup_heat', default=1,
              help='Number of iterations to warm up caches before measurements')
     vars.Add('gsf', default=1, help='Global scale factor')
+    vars.Add('gsf_file', default='',
+             help='JSON file of global scale factors for individual benchmarks')
     vars.Add('dummy_benchmark', default=(bd / 'support/dummy-benchmark'))
+    vars.Add(BoolVariable('map_file', default=False,
+                          help='Write a linker map file beside each executable'))
+    vars.Add(BoolVariable('stack_usage', default=False,
+                          help='Write stack usage (.su) files beside each object'))
+    vars.Add(BoolVariable('heap_stats', default=False,
+                          help='Record heap usage statistics in the BEEBS allocator'))
+    vars.Add(EnumVariable('pgo', default='none',
+                          allowed_values=('none', 'generate', 'use'),
+                          help='Profile guided optimization: build instrumented '
+                          + 'programs, or use the profiles they recorded'))
+    vars.Add(BoolVariable('compile_times', default=False,
+                          help='Record the time and memory used to build each '
+                          + 'object and executable'))
     return vars
 
+def matrix_configurations(matrix_file, bd, config_dir):
+    """Expand the build matrix into a list of (build dir, config dir,
+       variables), with the command line variables as common to all."""
+    try:
+        configs = load_matrix(matrix_file)
+    except (OSError, ValueError) as error:
+        print(f'ERROR: Unable to read build matrix {matrix_file}: {error}')
+        Exit(1)
+
+    result = []
+    for name, config_vars in configs:
+        config_vars = merge_variables(ARGUMENTS, config_vars)
+        cfg_dir = Path(config_vars.pop('config_dir', config_dir)).absolute()
+        # Variables expects strings, as they would be on the command line
+        args = {var: (('1' if value else '0') if isinstance(value, bool)
+                      else str(value))
+                for var, value in config_vars.items()}
+        result.append((bd / name, cfg_dir, args))
+    return result
+
+def benchmark_scale_factors(gsf_file):
+    """Read the global scale factors of individual benchmarks, as written by
+       benchmark_calibrate.py."""
+    if not gsf_file:
+        return {}
+    try:
+        with open(gsf_file, 'r') as fileh:
+            factors = json.load(fileh)
+    except (OSError, ValueError) as error:
+        print(f'ERROR: Unable to read scale factors {gsf_file}: {error}')
+        Exit(1)
+    return {bench: str(gsf) for bench, gsf in factors.items()}
+
 def setup_directories(bd, config_dir):
     VariantDir(bd / "src", "src")
     VariantDir(bd / "support", "support")
     VariantDir(bd / "config", config_dir)
-    SConsignFile(bd / ".sconsign.dblite")
 
-def populate_build_env(env, vars):
+def populate_build_env(env, vars, config_dir):
     vars.Update(env)
     env.Append(CPPDEFINES={ 'WARMUP_HEAT' : '${warmup_heat}',
                             'GLOBAL_SCALE_FACTOR' : '${gsf}'})
@@ -53,10 +129,33 @@ def populate_build_env(env, vars):
     env.Replace(LINKFLAGS = "${ldflags}")
     env.Replace(CC = "${cc}")
     env.Replace(LINK = "${ld}")
+    if env['map_file']:
+        env.Append(LINKFLAGS = ['-Wl,-Map=${TARGET}.map'])
+    if env['stack_usage']:
+        env.Append(CCFLAGS = ['-fstack-usage'])
+        # The call graph, without which the stack depth is only a lower bound
+        if compiler_accepts(env.subst('$CC'), '-fcallgraph-info=su'):
+            env.Append(CCFLAGS = ['-fcallgraph-info=su'])
+    if env['heap_stats']:
+        env.Append(CPPDEFINES = ['HEAP_STATS'])
+    if env['pgo'] == 'generate':
+        env.Append(CCFLAGS = ['-fprofile-generate'])
+        env.Append(LINKFLAGS = ['-fprofile-generate'])
+    elif env['pgo'] == 'use':
+        # Programs which were never run, such as the dummy benchmark, have
+        # no profile
+        env.Append(CCFLAGS = ['-fprofile-use', '-Wno-missing-profile'])
+        env.Append(LINKFLAGS = ['-fprofile-use'])
+    if env['compile_times']:
+        # See pylib/embench_compile.py
+        timer = (f'"{sys.executable}" '
+                 + f'"{Path("pylib/embench_compile.py").absolute()}"')
+        env.Replace(CCCOM = f'{timer} ${{TARGET}}.time ' + env['CCCOM'])
+        env.Replace(LINKCOM = f'{timer} ${{TARGET}}.time ' + env['LINKCOM'])
     print(f"{env['user_libs']}".split())
     env.Prepend(LIBS = f"{env['user_libs']}".split())
 
-def build_support_objects(env):
+def build_support_objects(env, bd):
     support_objects = []
     support_objects += env.Object(str(bd / 'support/main.c'))
     support_objects += env.Object(str(bd / 'support/beebsc.c'))
@@ -64,34 +163,262 @@ def build_support_objects(env):
     env.Default(support_objects)
     return support_objects
 
+def clean_stack_usage(env, objects):
+    for obj in objects:
+        for ext in ['.su', '.ci']:
+            env.Clean(obj, obj.abspath[:-len(obj.suffix)] + ext)
+    # A file retrieved from the object cache has no stack usage or call graph
+    env.NoCache(objects)
+
+def clean_compile_times(env, nodes):
+    for node in nodes:
+        env.Clean(node, node.abspath + '.time')
+    # A file retrieved from the object cache has no time record
+    env.NoCache(nodes)
+
+def pgo_profiles(env, objects):
+    # The profile of each object is written beside it when the instrumented
+    # program is run, and read from there when the same object is rebuilt.
+    # It is not in the source directory, so is tracked by a signature of its
+    # content, rather than as a file in the variant directory.
+    for obj in objects:
+        gcda = obj.abspath[:-len(obj.suffix)] + '.gcda'
+        if env['pgo'] == 'generate':
+            env.Clean(obj, gcda)
+        elif os.path.exists(gcda):
+            env.Depends(obj, env.Value(SCons.Util.hash_file_signature(gcda)))
+
+def report_link(target, source, env):
+    # Read by benchmark_pipeline.py, which measures each benchmark as soon as
+    # it is linked
+    print(f'embench: linked {target[0].abspath}', flush=True)
+
+compiler_versions = {}
+
+def compiler_version(cc):
+    """The output of the compiler command "cc" with --version."""
+    if cc not in compiler_versions:
+        try:
+            res = subprocess.run(shlex.split(cc) + ['--version'],
+                                 capture_output=True, text=True, timeout=30)
+            compiler_versions[cc] = res.stdout
+        except (OSError, subprocess.TimeoutExpired):
+            compiler_versions[cc] = ''
+    return compiler_versions[cc]
+
+def compiler_accepts(cc, flag):
+    """Whether the compiler command "cc" accepts the option "flag" when
+       compiling C.  It is run in a scratch directory, since some options
+       write files beside the output."""
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            res = subprocess.run(
+                shlex.split(cc) + [flag, '-x', 'c', '-S', '-o', 'probe.s', '-'],
+                input='int x;\n', capture_output=True, text=True, timeout=30,
+                cwd=scratch)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return res.returncode == 0
+
+def compiler_identity(cc):
+    """Identify the compiler command "cc" by its resolved path and the
+       output of --version, so that cached files are not shared between
+       different compilers installed under the same name."""
+    cmd = shlex.split(cc)
+    exe = WhereIs(cmd[0]) if cmd else None
+    return (f'{cc}\n{os.path.realpath(exe) if exe else ""}'
+            + f'\n{compiler_version(cc)}')
+
+def build_info(env):
+    """Describe how the programs are built, as JSON."""
+    info = {var: env.subst(f'${{{var}}}')
+            for var in ('cc', 'cflags', 'ld', 'ldflags', 'user_libs',
+                        'warmup_heat', 'gsf', 'gsf_file', 'pgo')}
+    info['config_dir'] = str(env['CONFIG_DIR'])
+    version = compiler_version(env.subst('$CC')).splitlines()
+    info['compiler'] = version[0] if version else ''
+    return json.dumps(info, indent=2) + '\n'
+
+def write_build_info(target, source, env):
+    # Read by pylib/embench_history.py, to record how the programs measured
+    # were built
+    with open(target[0].abspath, 'w') as fileh:
+        fileh.write(source[0].read())
+
+def prune_object_cache(cache_dir, max_bytes):
+    """Remove the least recently used files from the object cache until it
+       is no larger than "max_bytes"."""
+    entries = []
+    for dirpath, _, files in os.walk(cache_dir):
+        for name in files:
+            if dirpath == str(cache_dir) and name == 'config':
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+object_cache_signatures = {}
+
+def object_cache_signature(node):
+    """The key of "node" in the object cache: its sources and included
+       headers by content, its command line with the build directory elided,
+       and its path within the build directory."""
+    if node in object_cache_signatures:
+        return object_cache_signatures[node]
+
+    # Computed before the node is built, while it still has an executor
+    bd = str(node.get_build_env()['BUILD_DIR'])
+    contents = node.get_executor().get_contents()
+    contents = contents.replace(bd.encode(), b'$BUILD_DIR')
+    sigs = [n.get_cachedir_csig() for n in node.children()]
+    sigs.append(SCons.Util.hash_signature(contents))
+    sigs.append(os.path.relpath(node.get_abspath(), bd))
+    object_cache_signatures[node] = SCons.Util.hash_collect(sigs)
+    return object_cache_signatures[node]
+
+class ObjectCache(SCons.CacheDir.CacheDir):
+    """A cache of objects and executables, which unlike the standard SCons
+       cache is keyed independently of the build directory, so that it may be
+       shared between build directories."""
+
+    def cachepath(self, node):
+        if not self.is_enabled():
+            return None, None
+
+        sig = object_cache_signature(node)
+        subdir = sig[:self.config['prefix_len']].upper()
+        cachedir = os.path.join(self.path, subdir)
+        return cachedir, os.path.join(cachedir, sig)
+
+    def retrieve(self, node):
+        retrieved = super().retrieve(node)
+        if retrieved:
+            # Mark as recently used, for pruning
+            _, cachefile = self.cachepath(node)
+            try:
+                os.utime(cachefile)
+            except OSError:
+                pass
+        return retrieved
+
+def setup_object_cache(env):
+    """Use the object cache named on the command line, if any."""
+    cache_dir = GetOption('object_cache')
+    if not cache_dir:
+        return
+    cache_dir = Path(cache_dir).absolute()
+    env.CacheDir(str(cache_dir), ObjectCache)
+    if GetOption('object_cache_size') > 0:
+        atexit.register(prune_object_cache, cache_dir,
+                        GetOption('object_cache_size') * 1024 * 1024)
+
+def setup_trace(env):
+    """Record each command run in the trace named on the command line, if
+       any."""
+    trace_file = GetOption('trace')
+    if not trace_file:
+        return
+    start_trace(str(Path(trace_file).absolute()), 'scons')
+    env['SPAWN'] = traced_spawn(env['SPAWN'])
+
+def build_configuration(env, vars, bd, config_dir):
+    """Build all the benchmarks for one configuration in build directory
+       "bd"."""
+    setup_directories(bd, config_dir)
+    env.Replace(BUILD_DIR=bd)
+    env.Replace(CONFIG_DIR=config_dir)
+    populate_build_env(env, vars, config_dir)
+
+    support_objects = build_support_objects(env, bd)
+    env.Default(env.Command(str(bd / 'build-info.json'),
+                            env.Value(build_info(env)),
+                            Action(write_build_info, None)))
+    benchmark_paths = find_benchmarks(bd, env)
+
+    factors = benchmark_scale_factors(env['gsf_file'])
+    benchmark_objects = {
+        (bd / bench / bench.name): (
+            env.Clone(gsf=factors[bench.name]) if bench.name in factors
+            else env).Object(Glob(str(bd / bench / "*.c")))
+
+        for bench in benchmark_paths
+    }
+    env.Default(benchmark_objects.values())
+
+    if GetOption('object_cache'):
+        # The command line alone does not say which compiler "cc" is
+        identity = env.Value(compiler_identity(env.subst('$CC')))
+        env.Depends(support_objects, identity)
+        for objects in benchmark_objects.values():
+            env.Depends(objects, identity)
+        link_identity = env.Value(compiler_identity(env.subst('$LINK')))
+
+    if env['stack_usage']:
+        clean_stack_usage(env, support_objects)
+        for objects in benchmark_objects.values():
+            clean_stack_usage(env, objects)
+
+    if env['compile_times']:
+        clean_compile_times(env, support_objects)
+        for objects in benchmark_objects.values():
+            clean_compile_times(env, objects)
+
+    if env['pgo'] != 'none':
+        pgo_profiles(env, support_objects)
+        for objects in benchmark_objects.values():
+            pgo_profiles(env, objects)
+
+    for benchname, objects in benchmark_objects.items():
+        bench_exe = env.Program(str(benchname), objects + support_objects)
+        if env['map_file']:
+            env.SideEffect(f'{benchname}.map', bench_exe)
+            env.Clean(bench_exe, f'{benchname}.map')
+            # A file retrieved from the object cache has no map
+            env.NoCache(bench_exe)
+        if GetOption('report_links'):
+            env.AddPostAction(bench_exe, Action(report_link, None))
+        if GetOption('object_cache'):
+            env.Depends(bench_exe, link_identity)
+        if env['compile_times']:
+            clean_compile_times(env, bench_exe)
+        env.Default(bench_exe)
+
 
 # MAIN BUILD SCRIPT
 #env = DefaultEnvironment()
 env = Environment(ENV=os.environ.copy())
-vars = parse_options()
+parse_options()
 
 bd = Path(GetOption('build_dir')).absolute()
 config_dir = Path(GetOption('config_dir')).absolute()
+vars = build_variables(bd, ARGUMENTS)
 
-setup_directories(bd, config_dir)
-env.Replace(BUILD_DIR=bd)
-env.Replace(CONFIG_DIR=config_dir)
-populate_build_env(env, vars)
+SConsignFile(bd / ".sconsign.dblite")
+setup_object_cache(env)
+setup_trace(env)
 
 # Setup Help Text
 env.Help("\nCustomizable Variables:", append=True)
 env.Help(vars.GenerateHelpText(env), append=True)
 
-support_objects = build_support_objects(env)
-benchmark_paths = find_benchmarks(bd, env)
-
-benchmark_objects = {
-    (bd / bench / bench.name): env.Object(Glob(str(bd / bench / "*.c")))
-
-    for bench in benchmark_paths
-}
-env.Default(benchmark_objects.values())
-
-for benchname, objects in benchmark_objects.items():
-    bench_exe = env.Program(str(benchname), objects + support_objects)
-    env.Default(bench_exe)
+if GetOption('matrix'):
+    # One variant directory per configuration, all in one dependency graph
+    for cfg_bd, cfg_dir, args in matrix_configurations(GetOption('matrix'),
+                                                       bd, config_dir):
+        build_configuration(env.Clone(), build_variables(cfg_bd, args),
+                            cfg_bd, cfg_dir)
+else:
+    build_configuration(env, vars, bd, config_dir)
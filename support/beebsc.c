@@ -30,6 +30,13 @@ static void *heap_ptr = NULL;
 static void *heap_end = NULL;
 static size_t heap_requested = 0;
 
+#ifdef HEAP_STATS
+/* Heap usage statistics, which are visible to a debugger as well as to
+   report_heap_stats_beebs. */
+
+struct heap_stats_beebs heap_stats_beebs __attribute__ ((used));
+#endif
+
 
 /* Yield a sequence of random numbers in the range [0, 2^15-1].
 
@@ -57,7 +64,9 @@ srand_beebs (unsigned int new_seed)
 
 
 /* Initialize the BEEBS heap pointers. Note that the actual memory block is
-   in the caller code. */
+   in the caller code.  Benchmarks do this at the start of each iteration, so
+   the heap statistics, if any, are also cleared, leaving those of one
+   iteration, whatever the scale factors. */
 
 void
 init_heap_beebs (void *heap, size_t heap_size)
@@ -66,6 +75,9 @@ init_heap_beebs (void *heap, size_t heap_size)
   heap_ptr = (void *) heap;
   heap_end = (void *) ((char *) heap_ptr + heap_size);
   heap_requested = 0;
+#ifdef HEAP_STATS
+  reset_heap_stats_beebs ();
+#endif
 }
 
 
@@ -81,6 +93,54 @@ check_heap_beebs (void *heap)
 }
 
 
+#ifdef HEAP_STATS
+/* Clear the heap statistics.  This is called by init_heap_beebs, and once
+   the caches have been warmed, so that a benchmark which does not use the
+   heap reports nothing. */
+
+void
+reset_heap_stats_beebs (void)
+{
+  memset (&heap_stats_beebs, 0, sizeof (heap_stats_beebs));
+}
+
+
+/* Record an allocation request of "size" bytes, which succeeded if "ok" is
+   non-zero. */
+
+static void
+record_heap_stats_beebs (size_t size, int ok)
+{
+  unsigned int bucket = 0;
+
+  if (!ok)
+    {
+      heap_stats_beebs.failed++;
+      return;
+    }
+
+  while ((size >>= 1) != 0 && bucket < HEAP_STATS_BUCKETS - 1)
+    bucket++;
+
+  heap_stats_beebs.allocs++;
+  heap_stats_beebs.histogram[bucket]++;
+
+  if (heap_requested > heap_stats_beebs.peak)
+    heap_stats_beebs.peak = heap_requested;
+}
+
+
+/* Report the heap statistics at the end of the run.  By default they are just
+   left in memory for a debugger to read, but a board with some means of
+   output may override this. */
+
+void __attribute__ ((weak))
+report_heap_stats_beebs (void)
+{
+}
+#endif /* HEAP_STATS */
+
+
 /* BEEBS version of malloc.
 
    This is primarily to reduce library and OS dependencies. Malloc is
@@ -116,11 +176,20 @@ malloc_beebs (size_t size)
 
   /* Check if we can "allocate" enough space */
   if (next_heap_ptr > heap_end)
-    return NULL;
+    {
+#ifdef HEAP_STATS
+      record_heap_stats_beebs (size, 0);
+#endif
+      return NULL;
+    }
 
   void *new_ptr = heap_ptr;
   heap_ptr = next_heap_ptr;
 
+#ifdef HEAP_STATS
+  record_heap_stats_beebs (size, 1);
+#endif
+
   return new_ptr;
 }
 
@@ -54,6 +54,28 @@ void *malloc_beebs (size_t size);
 void *calloc_beebs (size_t nmemb, size_t size);
 void *realloc_beebs (void *ptr, size_t size);
 void free_beebs (void *ptr);
+
+/* Optional instrumentation of the BEEBS heap, enabled by defining HEAP_STATS
+   (scons variable heap_stats=1).  Bucket n of the histogram counts
+   allocations of between 2^n and 2^(n+1)-1 bytes, with the last bucket
+   counting everything larger. */
+
+#ifdef HEAP_STATS
+#define HEAP_STATS_BUCKETS 16
+
+struct heap_stats_beebs
+{
+  size_t peak;			/* Most bytes in use, including padding */
+  size_t allocs;		/* Number of successful allocations */
+  size_t failed;		/* Number of failed allocations */
+  size_t histogram[HEAP_STATS_BUCKETS];
+};
+
+extern struct heap_stats_beebs heap_stats_beebs;
+
+void reset_heap_stats_beebs (void);
+void report_heap_stats_beebs (void);
+#endif /* HEAP_STATS */
 #endif /* BEEBSC_H */
 
 
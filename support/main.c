@@ -25,6 +25,9 @@ main (int argc __attribute__ ((unused)),
   initialise_board ();
   initialise_benchmark ();
   warm_caches (WARMUP_HEAT);
+#ifdef HEAP_STATS
+  reset_heap_stats_beebs ();
+#endif
 
   start_trigger ();
   result = benchmark ();
@@ -33,6 +36,9 @@ main (int argc __attribute__ ((unused)),
   /* bmarks that use arrays will check a global array rather than int result */
 
   correct = verify_benchmark (result);
+#ifdef HEAP_STATS
+  report_heap_stats_beebs ();
+#endif
 
   return (!correct);
 
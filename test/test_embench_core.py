@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# Tests of the reading of benchmark information
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Tests of read_benchmark_info in embench_core.py.
+
+Run from the top of the repository with
+
+    python3 -m unittest discover -s test
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'pylib'))
+
+from embench_core import read_benchmark_info
+
+
+class TestReadBenchmarkInfo(unittest.TestCase):
+    """Categories and weights of benchmarks."""
+
+    def read(self, info):
+        with tempfile.NamedTemporaryFile('w', suffix='.json',
+                                         delete=False) as fileh:
+            json.dump(info, fileh)
+        self.addCleanup(os.remove, fileh.name)
+        return read_benchmark_info(fileh.name)
+
+    def test_valid(self):
+        info = {'crc32': {'category': 'checksum', 'weight': 2},
+                'md5sum': {'weight': 0.5}, 'nettle-aes': {}}
+        self.assertEqual(self.read(info), info)
+
+    def test_invalid_weights(self):
+        for weight in (-1, '2', None, True, False):
+            with self.subTest(weight=weight):
+                with self.assertRaises(ValueError):
+                    self.read({'crc32': {'weight': weight}})
+
+    def test_not_dictionaries(self):
+        for info in ([], {'crc32': 1}):
+            with self.subTest(info=info):
+                with self.assertRaises(ValueError):
+                    self.read(info)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Tests of the change point detection in the history of results
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Tests of change_points in embench_history.py.
+
+Run from the top of the repository with
+
+    python3 -m unittest discover -s test
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'pylib'))
+
+from embench_history import change_points
+
+
+class TestChangePoints(unittest.TestCase):
+    """Step changes in series of results."""
+
+    def test_constant(self):
+        """An exact, unchanging series has no changes."""
+        self.assertEqual(change_points([1234] * 20), [])
+
+    def test_single_step(self):
+        """An exact series which changed once, wherever that was."""
+        for point in (1, 5, 10, 19):
+            with self.subTest(point=point):
+                values = [1000] * point + [1100] * (20 - point)
+                self.assertEqual(change_points(values), [point])
+
+    def test_step_below_threshold(self):
+        """A step smaller than the threshold is not a change, even though
+           there is no other variation."""
+        self.assertEqual(change_points([1000] * 10 + [1010] * 10), [])
+
+    def test_noise_floor(self):
+        """A step just over the threshold in the last of many identical
+           results is not significant, but a larger one is."""
+        self.assertEqual(change_points([1000] * 19 + [1021]), [])
+        self.assertEqual(change_points([1000] * 19 + [1030]), [19])
+
+    def test_noisy_step(self):
+        """A step in noisy results, with enough runs either side."""
+        noise = [1.0, 1.01, 0.99, 1.005, 0.995, 1.0, 1.01, 0.99]
+        values = [100 * n for n in noise] + [120 * n for n in noise]
+        self.assertEqual(change_points(values, min_segment=3), [8])
+
+    def test_step_from_zero(self):
+        """A series including zero, with an offset."""
+        self.assertEqual(change_points([0] * 5 + [64] * 5, offset=1.0), [5])
+
+
+if __name__ == '__main__':
+    unittest.main()
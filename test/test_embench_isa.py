@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+# Tests of the instruction classification for the static instruction mix
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Tests of the instruction decoders and classification in embench_isa.py.
+
+Run from the top of the repository with
+
+    python3 -m unittest discover -s test
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'pylib'))
+
+from embench_isa import classify_mnemonic
+from embench_isa import decode_riscv16
+from embench_isa import decode_riscv32
+
+
+class TestDecodeRiscv32(unittest.TestCase):
+    """Classification of 32 bit RISC-V instructions."""
+
+    def check(self, cases):
+        for insn, expected in cases:
+            with self.subTest(insn=hex(insn)):
+                self.assertEqual(decode_riscv32(insn), expected)
+
+    def test_base(self):
+        """RV32I and RV64I."""
+        self.check((
+            (0x00150513, ('alu', None)),        # addi a0, a0, 1
+            (0x40b50533, ('alu', None)),        # sub a0, a0, a1
+            (0x40355513, ('alu', None)),        # srai a0, a0, 3
+            (0x12345537, ('alu', None)),        # lui a0, 0x12345
+            (0x0005a503, ('load', None)),       # lw a0, 0(a1)
+            (0x00a5a023, ('store', None)),      # sw a0, 0(a1)
+            (0x00b50463, ('branch', None)),     # beq a0, a1, .+8
+            (0x010000ef, ('jump', 16)),         # jal ra, .+16
+            (0xffdff06f, ('jump', -4)),         # j .-4
+            (0x00008067, ('jump', None)),       # ret
+            (0x00000073, ('system', None)),     # ecall
+            (0x0ff0000f, ('system', None)),     # fence
+            (0xb0002573, ('system', None)),     # csrr a0, mcycle
+        ))
+
+    def test_extensions(self):
+        """M, A, F, D, Zba, Zbb and V."""
+        self.check((
+            (0x02b50533, ('muldiv', None)),     # mul a0, a0, a1
+            (0x02b55533, ('muldiv', None)),     # divu a0, a0, a1
+            (0x02b5653b, ('muldiv', None)),     # remw a0, a0, a1
+            (0x00b6252f, ('atomic', None)),     # amoadd.w a0, a1, (a2)
+            (0x00052507, ('load', None)),       # flw fa0, 0(a0)
+            (0x00a53027, ('store', None)),      # fsd fa0, 0(a0)
+            (0x00b57553, ('fp', None)),         # fadd.s fa0, fa0, fa1
+            (0x20b52533, ('bitmanip', None)),   # sh1add a0, a0, a1
+            (0x40b57533, ('bitmanip', None)),   # andn a0, a0, a1
+            (0x60051513, ('bitmanip', None)),   # clz a0, a0
+            (0x022180d7, ('vector', None)),     # vadd.vv v1, v2, v3
+        ))
+
+
+class TestDecodeRiscv16(unittest.TestCase):
+    """Classification of 16 bit RISC-V instructions."""
+
+    def test_c_extension(self):
+        """The C extension, for RV32 and RV64 where they differ."""
+        for insn, xlen, expected in (
+                (0x0028, 32, ('alu', None)),       # c.addi4spn a0, sp, 8
+                (0x0505, 32, ('alu', None)),       # c.addi a0, 1
+                (0x4501, 32, ('alu', None)),       # c.li a0, 0
+                (0x852e, 32, ('alu', None)),       # c.mv a0, a1
+                (0x6188, 64, ('load', None)),      # c.ld a0, 0(a1)
+                (0xe188, 64, ('store', None)),     # c.sd a0, 0(a1)
+                (0x4502, 32, ('load', None)),      # c.lwsp a0, 0(sp)
+                (0xc02a, 32, ('store', None)),     # c.swsp a0, 0(sp)
+                (0xc101, 32, ('branch', None)),    # c.beqz a0, .
+                (0xe101, 32, ('branch', None)),    # c.bnez a0, .
+                (0xbffd, 32, ('jump', -2)),        # c.j .-2
+                (0x2001, 32, ('jump', 0)),         # c.jal .
+                (0x2001, 64, ('alu', None)),       # c.addiw zero, 0
+                (0x8082, 32, ('jump', None)),      # c.jr ra
+                (0x9502, 32, ('jump', None)),      # c.jalr a0
+                (0x9002, 32, ('system', None)),    # c.ebreak
+                (0x9d4d, 32, ('muldiv', None)),    # c.mul a0, a1
+                (0x8d6d, 32, ('alu', None)),       # c.and a0, a1
+        ):
+            with self.subTest(insn=hex(insn), xlen=xlen):
+                self.assertEqual(decode_riscv16(insn, xlen), expected)
+
+    def test_zcb_loads_and_stores(self):
+        """Zcb byte and halfword loads and stores, with a0 and 0(a1)."""
+        for insn, iclass in (
+                (0x8188, 'load'),     # c.lbu a0, 0(a1)
+                (0x8588, 'load'),     # c.lhu a0, 0(a1)
+                (0x85c8, 'load'),     # c.lh a0, 0(a1)
+                (0x8988, 'store'),    # c.sb a0, 0(a1)
+                (0x8d88, 'store'),    # c.sh a0, 0(a1)
+                (0x833c, 'load'),     # c.lbu a5, 2(a4)
+        ):
+            for xlen in (32, 64):
+                with self.subTest(insn=hex(insn), xlen=xlen):
+                    self.assertEqual(decode_riscv16(insn, xlen),
+                                     (iclass, None))
+
+    def test_rvc_loads_and_stores(self):
+        """The base compressed loads and stores either side of Zcb."""
+        self.assertEqual(decode_riscv16(0x4188, 32), ('load', None))
+        self.assertEqual(decode_riscv16(0xc188, 32), ('store', None))
+
+
+class TestClassifyMnemonic(unittest.TestCase):
+    """Classification of mnemonics printed by objdump."""
+
+    def test_riscv(self):
+        for mnemonic, iclass in (
+                ('addi', 'alu'), ('lw', 'load'), ('fld', 'load'),
+                ('c.lbu', 'load'), ('sd', 'store'), ('fsw', 'store'),
+                ('c.sh', 'store'), ('beqz', 'branch'), ('ret', 'jump'),
+                ('mulw', 'muldiv'), ('sh2add', 'bitmanip'),
+                ('sext.b', 'bitmanip'), ('csrrw', 'system'),
+                ('lr.w', 'atomic'), ('amoswap.w', 'atomic'),
+                ('vadd.vv', 'vector'), ('fmadd.s', 'fp'),
+        ):
+            with self.subTest(mnemonic=mnemonic):
+                self.assertEqual(classify_mnemonic('EM_RISCV', mnemonic),
+                                 iclass)
+
+    def test_unknown_machine(self):
+        self.assertEqual(classify_mnemonic('EM_XTENSA', 'l32i'), 'other')
+
+
+if __name__ == '__main__':
+    unittest.main()
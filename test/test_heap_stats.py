@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Tests of the heap statistics of the BEEBS allocator
+
+# Copyright (C) 2024 Embecosm Limited
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Tests of the HEAP_STATS instrumentation in support/beebsc.c, which are
+compiled with the host C compiler.
+
+Run from the top of the repository with
+
+    python3 -m unittest discover -s test
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A benchmark body which, like those of the benchmarks using the heap,
+# initializes the heap at the start of each iteration
+DRIVER = r'''
+#include <stdio.h>
+#include <stdlib.h>
+#include "beebsc.h"
+
+static char heap[1024] __attribute__ ((aligned));
+
+int
+main (int argc, char *argv[])
+{
+  int iterations = atoi (argv[1]);
+  reset_heap_stats_beebs ();
+  for (int i = 0; i < iterations; i++)
+    {
+      init_heap_beebs ((void *) heap, sizeof (heap));
+      malloc_beebs (8);
+      malloc_beebs (100);
+      malloc_beebs (4096);
+    }
+  printf ("%zu %zu %zu", heap_stats_beebs.peak, heap_stats_beebs.allocs,
+	  heap_stats_beebs.failed);
+  for (int i = 0; i < HEAP_STATS_BUCKETS; i++)
+    printf (" %zu", heap_stats_beebs.histogram[i]);
+  printf ("\n");
+  return 0;
+}
+
+void
+report_heap_stats_beebs (void)
+{
+}
+'''
+
+
+@unittest.skipIf(shutil.which('cc') is None, 'no host C compiler')
+class TestHeapStats(unittest.TestCase):
+    """Heap statistics of one iteration of a benchmark."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        driver = os.path.join(cls.tmpdir.name, 'driver.c')
+        with open(driver, 'w') as fileh:
+            fileh.write(DRIVER)
+        cls.exe = os.path.join(cls.tmpdir.name, 'driver')
+        subprocess.run(
+            ['cc', '-DHEAP_STATS', '-I', os.path.join(ROOTDIR, 'support'),
+             '-o', cls.exe, driver,
+             os.path.join(ROOTDIR, 'support', 'beebsc.c')],
+            check=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def stats(self, iterations):
+        res = subprocess.run([self.exe, str(iterations)], check=True,
+                             stdout=subprocess.PIPE, universal_newlines=True)
+        return [int(field) for field in res.stdout.split()]
+
+    def test_one_iteration(self):
+        peak, allocs, failed, *histogram = self.stats(1)
+        self.assertEqual((allocs, failed), (2, 1))
+        self.assertGreaterEqual(peak, 108)
+        self.assertEqual(histogram[3], 1)
+        self.assertEqual(histogram[6], 1)
+        self.assertEqual(sum(histogram), 2)
+
+    def test_independent_of_scale_factor(self):
+        self.assertEqual(self.stats(1), self.stats(5))
+
+
+if __name__ == '__main__':
+    unittest.main()